@@ -1,20 +1,48 @@
 # agent_actions.py
 from typing import Dict, List
-from rag import rag_search_context  # เรียกฟังก์ชันจาก rag.py
-from ddgs import DDGS
+from rag import rag_search_compact, rag_search_context  # เรียกฟังก์ชันจาก rag.py
+from tool_cache import ClientPool, run_in_tool_executor, tool_cache
 
-def search_context(query: str, top_k: int = 1) -> List[Dict[str, str]]:
+
+def _new_ddgs():
+    # import ddgs เมื่อค้นหาเว็บครั้งแรกเท่านั้น
+    from ddgs import DDGS
+
+    return DDGS()
+
+
+# DDGS client ที่ใช้ซ้ำต่อ thread แทนการเปิด session ใหม่ทุกครั้ง
+ddgs_pool = ClientPool(_new_ddgs)
+
+def search_context(query: str, top_k: int = 1, mode: str = "bm25", compact: bool = True) -> List[Dict[str, str]]:
     """
     Action: ค้นหาข้อมูลจาก Mock RAG Knowledge Base
     - query: คำถามหรือ keyword ของผู้ใช้
     - top_k: จำนวน document ที่ต้องการคืนค่า
+    - mode: โหมดการค้นหา "bm25" (keyword) หรือ "tfidf" (vector, ต้องใช้ NumPy)
+    - compact: True (ค่าเริ่มต้น) คืนค่าเฉพาะ passage ที่เกี่ยวข้องที่สุดของแต่ละ document
+      ภายในงบ rag.passage_char_budget() แทน content ทั้ง section (observation สั้นลง)
     Return:
         list ของ document ที่เกี่ยวข้อง [{'title': ..., 'content': ...}]
     Note:
         ฟังก์ชันนี้ใช้ RAG system (mock) เพื่อจำลอง retrieval
     """
-    # เรียกใช้ฟังก์ชันค้นหาจาก RAG system และส่งคืนผลลัพธ์
-    return rag_search_context(query, top_k=top_k)
+    # เรียกใช้ฟังก์ชันค้นหาจาก RAG system ผ่าน cache กลาง และส่งคืนผลลัพธ์
+    if compact:
+        return tool_cache.get_or_call("search_passages", rag_search_compact, query, top_k=top_k, mode=mode)
+    return tool_cache.get_or_call("search_context", rag_search_context, query, top_k=top_k, mode=mode)
+
+
+def ddgs_text_search(query: str, max_results: int) -> List[Dict[str, str]]:
+    """
+    ค้นหาเว็บด้วย DDGS client จาก pool (ไม่ผ่าน cache)
+    - ถ้าเกิดข้อผิดพลาดจะทิ้ง client นั้นเพื่อสร้างใหม่ในครั้งถัดไป แล้วส่ง exception ต่อ
+    """
+    try:
+        return list(ddgs_pool.get().text(query, max_results=max_results))
+    except Exception:
+        ddgs_pool.reset()
+        raise
 
 
 def call_web_search(query: str, max_results: int = 2) -> str:
@@ -25,11 +53,9 @@ def call_web_search(query: str, max_results: int = 2) -> str:
     Return: plain text summary combining top results
     """
     try:
-        # ใช้ DuckDuckGo API เพื่อค้นหาข้อมูลจากอินเทอร์เน็ต
-        with DDGS() as ddgs:
-            # ค้นหาและแปลงผลลัพธ์เป็น list
-            results = list(ddgs.text(query, max_results=max_results))
-        
+        # ใช้ DuckDuckGo API เพื่อค้นหาข้อมูลจากอินเทอร์เน็ต (ผ่าน cache กลาง)
+        results = tool_cache.get_or_call("web_search", ddgs_text_search, query, max_results=max_results)
+
         # ตรวจสอบว่าพบข้อมูลหรือไม่
         if not results:
             return "No relevant information found on the web."
@@ -39,4 +65,18 @@ def call_web_search(query: str, max_results: int = 2) -> str:
         return combined
     except Exception as e:
         # จัดการข้อผิดพลาดที่อาจเกิดขึ้นระหว่างการค้นหา
-        return f"Error during web search: {e}"
\ No newline at end of file
+        return f"Error during web search: {e}"
+
+
+async def asearch_context(query: str, top_k: int = 1, mode: str = "bm25", compact: bool = True) -> List[Dict[str, str]]:
+    """
+    Action (async): search_context ที่รันบน tool executor
+    """
+    return await run_in_tool_executor(search_context, query, top_k=top_k, mode=mode, compact=compact)
+
+
+async def acall_web_search(query: str, max_results: int = 2) -> str:
+    """
+    Action (async): call_web_search ที่รันบน tool executor
+    """
+    return await run_in_tool_executor(call_web_search, query, max_results=max_results)
@@ -0,0 +1,232 @@
+# agent_logging.py
+"""
+Logging แบบมีโครงสร้างที่ไม่ block agent สำหรับทั้ง react_agent และ langgraph_version
+
+- RunLog.log() สร้าง record (dict) แล้วใส่ queue ทันที ไม่เขียนไฟล์หรือ print บน thread ของ agent
+- LogWriter เป็น thread เบื้องหลังที่เขียน record เป็น JSONL แบ่งเป็น segment หมุนเวียน
+  (ไฟล์ละไม่เกิน segment_bytes เก็บไว้ไม่เกิน max_segments ไฟล์) และ print ไปที่ console ถ้าเปิด
+- queue มีขนาดจำกัด ถ้าเต็ม record จะถูกทิ้งและนับไว้ใน dropped (ไม่รอ)
+- level: บันทึกเฉพาะ record ที่ระดับไม่ต่ำกว่าที่กำหนด ("debug", "info", "warning", "error")
+- sample_rate: สุ่มเลือก run ที่จะบันทึก (ทั้ง run หรือไม่บันทึกเลย)
+  record ระดับ warning ขึ้นไปถูกบันทึกเสมอ
+- ข้อความของ run ล่าสุดเก็บในหน่วยความจำไม่เกิน max_lines บรรทัด
+
+ทุก record มี ts, level, agent, run_id, msg และ trace_id (ถ้ามี trace ทำงานอยู่)
+พร้อม field เพิ่มเติมที่ส่งให้ log() เช่น step หรือ action
+"""
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+from tracing import current_trace_id
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+DEFAULT_LOG_DIR = os.getenv("AGENT_LOG_DIR", "data/debug")
+
+
+class LogWriter:
+    """
+    Thread เบื้องหลังที่เขียน log record เป็นไฟล์ JSONL แบบหมุนเวียน
+    - directory: โฟลเดอร์ของไฟล์ log
+    - prefix: ชื่อนำหน้าไฟล์ (<prefix>-<pid>-<ลำดับ>.jsonl)
+    - max_queue: จำนวน record สูงสุดที่รอเขียน (เกินแล้วทิ้ง)
+    - segment_bytes: ขนาดสูงสุดของไฟล์หนึ่งไฟล์ก่อนเปิดไฟล์ใหม่
+    - max_segments: จำนวนไฟล์ที่เก็บไว้ (ลบไฟล์เก่าที่สุดของ process นี้เมื่อเกิน)
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_LOG_DIR,
+        prefix: str = "agent_log",
+        max_queue: int = 10_000,
+        segment_bytes: int = 8 * 1024 * 1024,
+        max_segments: int = 10,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._segments: Deque[str] = deque()
+        self._file = None
+        self._size = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, record: Dict[str, Any], console: bool = False) -> bool:
+        """ใส่ record ลง queue โดยไม่รอ คืนค่า False ถ้า queue เต็มและ record ถูกทิ้ง"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((record, console))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """รอจนเขียน record ที่อยู่ใน queue หมดแล้ว (คืนค่า False ถ้าหมดเวลา)"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((done, False), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="agent-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _loop(self) -> None:
+        while True:
+            item, console = self._queue.get()
+            batch = [(item, console)]
+            # เขียนทุก record ที่รออยู่ในครั้งเดียว
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                print(f"agent_logging: cannot write log: {e}")
+            finally:
+                for item, _ in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+
+    def _write_batch(self, batch) -> None:
+        for record, console in batch:
+            if isinstance(record, threading.Event):
+                continue
+            if console:
+                print(record["msg"])
+            line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            self._segment().write(line)
+            self._size += len(line)
+            self.written += 1
+        if self._file is not None:
+            self._file.flush()
+
+    def _segment(self):
+        # เปิดไฟล์ใหม่เมื่อยังไม่มีไฟล์หรือไฟล์ปัจจุบันเกิน segment_bytes
+        if self._file is not None and self._size < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        path = os.path.join(self.directory, f"{self.prefix}-{os.getpid()}-{self._seq:05d}.jsonl")
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._segments.append(path)
+        while len(self._segments) > self.max_segments:
+            old = self._segments.popleft()
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return self._file
+
+
+# writer ที่ใช้ร่วมกันทั้ง process (thread เริ่มทำงานเมื่อมี record แรก)
+log_writer = LogWriter()
+
+
+class RunLog:
+    """
+    log ของการทำงานหนึ่ง run
+    - lines: ข้อความล่าสุดไม่เกิน max_lines บรรทัด (เฉพาะ record ที่ผ่าน level และ sampling)
+    สร้างผ่าน AgentLogger.start_run()
+    """
+
+    def __init__(self, logger: "AgentLogger", run_id: str, sampled: bool):
+        self.logger = logger
+        self.run_id = run_id
+        self.sampled = sampled
+        self.lines: Deque[str] = deque(maxlen=logger.max_lines)
+
+    def log(self, message: str, level: str = "info", **fields) -> None:
+        """บันทึกข้อความ (ไม่ block) field เพิ่มเติมจะถูกเก็บใน record"""
+        logger = self.logger
+        severity = LEVELS[level]
+        if severity < logger.min_level:
+            return
+        if not self.sampled and severity < LEVELS["warning"]:
+            return
+        self.lines.append(message)
+        record = {
+            "ts": round(time.time(), 6),
+            "level": level,
+            "agent": logger.agent,
+            "run_id": self.run_id,
+            "msg": message,
+        }
+        trace_id = current_trace_id()
+        if trace_id:
+            record["trace_id"] = trace_id
+        if fields:
+            record.update(fields)
+        logger.writer.submit(record, console=logger.console)
+
+
+class AgentLogger:
+    """
+    ตั้งค่า logging ของ agent หนึ่งตัว
+    - agent: ชื่อ agent ที่ใส่ในทุก record
+    - level: ระดับต่ำสุดที่บันทึก
+    - sample_rate: สัดส่วนของ run ที่บันทึก (0.0 - 1.0)
+    - max_lines: จำนวนข้อความของ run ที่เก็บในหน่วยความจำ
+    - console: print ข้อความไปที่ console ด้วย (ทำใน thread ของ writer)
+    - writer: LogWriter ที่ใช้ (None = log_writer ที่ใช้ร่วมกันทั้ง process)
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        level: str = "info",
+        sample_rate: float = 1.0,
+        max_lines: int = 1000,
+        console: bool = True,
+        writer: Optional[LogWriter] = None,
+    ):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level {level!r}, expected one of {list(LEVELS)}")
+        self.agent = agent
+        self.level = level
+        self.min_level = LEVELS[level]
+        self.sample_rate = sample_rate
+        self.max_lines = max_lines
+        self.console = console
+        self.writer = writer or log_writer
+
+    def start_run(self, run_id: Optional[str] = None) -> RunLog:
+        """เริ่ม log ของ run ใหม่ (ตัดสินใจ sampling ครั้งเดียวต่อ run)"""
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        return RunLog(self, run_id or uuid.uuid4().hex[:12], sampled)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """รอจน record ที่ค้างอยู่ถูกเขียน (เช่นก่อนแสดงคำตอบใน console)"""
+        return self.writer.flush(timeout)
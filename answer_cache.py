@@ -0,0 +1,374 @@
+# answer_cache.py
+"""
+Cache ของคำตอบสุดท้ายที่อยู่หน้า ReAct loop ใช้ร่วมกันทั้ง react_agent และ langgraph_version
+
+คำถามที่เคยตอบแล้ว (หรือถามซ้ำด้วยถ้อยคำต่างกันเล็กน้อย) ได้คำตอบทันทีโดยไม่เรียก LLM หรือ tool เลย
+- normalize: ตัวพิมพ์เล็ก ตัดคำเสริมที่ไม่มีผลต่อความหมาย (article, กริยา is/are/do, คำขอร้อง, สรรพนามผู้ถาม)
+  และ what/which ที่ขึ้นต้นคำถาม แล้ว stem คำแบบง่ายโดยคงลำดับคำไว้
+  เช่น "What are the Employee Benefits?", "List the employee benefits" และ "employee benefits" ได้ key เดียวกัน
+  คำแสดงคำถาม กริยาช่วย (modal) และคำปฏิเสธที่เหลือถูกเก็บไว้เสมอ: "Who can apply ...?" กับ "How do I apply ...?"
+  จึงเป็นคนละคำถาม
+- near-duplicate: shingle คือ character 3-gram ของแต่ละ token ที่ normalize แล้ว (ทนต่อการสะกดผิด)
+  หา candidate ด้วย MinHash + LSH banding แล้วยืนยันด้วย Jaccard similarity จริง
+  hit เมื่อ similarity ไม่ต่ำกว่า min_similarity, คำในกลุ่ม GUARD_WORDS ตรงกันตามลำดับ
+  และคำที่จับคู่กันได้อยู่ฝั่งเดียวกันของ RELATION_WORDS ที่มีในทั้งสองคำถาม (same_roles)
+  เช่น "benefits for employees?" ตรงกับ "Employee Benefits" แต่ "Does A report to B?" ไม่ตรงกับ "Does B report to A?"
+- TTL: รายการที่เก่ากว่า ttl_seconds ไม่ถูกใช้
+- invalidation: เมื่อ knowledge base ถูก index ใหม่และ publish snapshot (rag.add_kb_listener)
+  kb_generation เพิ่มขึ้นและ cache ถูกล้างทั้งหมด เพราะคำตอบเดิมอาจอ้างข้อมูลที่ไม่ตรงแล้ว
+  คำตอบที่เริ่มสร้างก่อน publish (จาก snapshot เดิม) ไม่ถูกเก็บ (store(..., version=...))
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+import hashlib
+import struct
+import threading
+import time
+
+from rag import add_kb_listener, rag_tokenize
+
+# คำที่ไม่มีผลต่อความหมายของคำถาม (ตัดออกก่อนสร้าง key)
+STOPWORDS = frozenset(
+    "a an the s is are was were be been am do does did about please tell show give explain describe list "
+    "i me my we our us you your there this these those it its any some".split()
+)
+
+# คำแสดงคำถามที่ตัดได้เมื่อขึ้นต้นคำถาม ("What are the benefits?" ถามเรื่องเดียวกับ "benefits")
+LEADING_WORDS = frozenset(("what", "which"))
+
+# คำแสดงคำถาม กริยาช่วย และคำปฏิเสธ: เปลี่ยนความหมายของคำถาม จึงไม่ถูกตัด
+# และ near-duplicate ต้องมีคำกลุ่มนี้ตรงกันตามลำดับ
+GUARD_WORDS = frozenset(
+    "what when where which who whom whose why how "
+    "can could would should will shall may might must cannot "
+    "not no never nor none neither without except".split()
+)
+
+# คำบุพบทและกริยาที่บอกความสัมพันธ์ระหว่างสองฝั่ง (stem แล้ว): สลับคำข้ามคำเหล่านี้เปลี่ยนความหมาย
+# ("A report to B" กับ "B report to A") ส่วนการสลับคำที่ไม่ข้ามคำกลุ่มนี้ไม่เปลี่ยนความหมาย
+RELATION_WORDS = frozenset(
+    "to from for of by with than between into before after "
+    "report manage supervise approve pay own hire replace include exceed".split()
+)
+
+# similarity ของ 3-gram ขั้นต่ำที่ถือว่าสอง token เป็นคำเดียวกัน (ใน same_roles)
+_TOKEN_MATCH = 0.5
+
+# จำนวนครั้งที่ knowledge base ถูก index ใหม่หลังโหลดครั้งแรก (นับจาก snapshot ที่ rag_store publish)
+_kb_generation = 0
+
+
+def _on_kb_publish(path: str, snapshot: Any) -> None:
+    global _kb_generation
+    # snapshot version 1 คือการโหลดครั้งแรก ไม่ใช่การแก้ไข
+    if snapshot.version > 1:
+        _kb_generation += 1
+
+
+add_kb_listener(_on_kb_publish)
+
+
+def kb_generation() -> int:
+    """version ของ knowledge base ที่ agent ค้นหาอยู่ (เปลี่ยนทันทีที่ snapshot ใหม่ถูก publish)"""
+    return _kb_generation
+
+
+# ความยาวขั้นต่ำของคำหลังตัด suffix
+_MIN_STEM = 3
+
+
+def stem(token: str) -> str:
+    """แปลงพหูพจน์ภาษาอังกฤษเป็นเอกพจน์แบบง่าย (benefits → benefit, policies → policy, taxes → tax)"""
+    if len(token) - 1 < _MIN_STEM or not token.endswith("s") or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies") and len(token) - 3 >= _MIN_STEM:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return token[:-2]
+    return token[:-1]
+
+
+def normalize_query(text: str) -> Tuple[str, ...]:
+    """
+    แปลงคำถามเป็น token ที่ stem แล้วตามลำดับเดิม (ใช้เป็น key แบบ exact)
+    "n't" (ที่ถูกแยกเป็น token "t") กลายเป็น "not" ถ้าทุกคำเป็น stopword จะใช้ token ทั้งหมดแทน
+    what/which ที่ขึ้นต้นคำถามถูกตัด (ถ้ายังเหลือคำอื่น)
+    """
+    tokens = ["not" if t == "t" else t for t in rag_tokenize(text)]
+    kept = [t for t in tokens if t not in STOPWORDS] or tokens
+    if len(kept) > 1 and kept[0] in LEADING_WORDS:
+        kept = kept[1:]
+    return tuple(stem(t) for t in kept)
+
+
+def guard_words(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    """คำในกลุ่ม GUARD_WORDS ตามลำดับที่ปรากฏ"""
+    return tuple(t for t in tokens if t in GUARD_WORDS)
+
+
+def same_roles(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """
+    token ของ a ที่จับคู่กับ token ใน b ได้ (3-gram similarity ไม่ต่ำกว่า _TOKEN_MATCH)
+    ต้องอยู่ฝั่งเดียวกัน (ก่อน/หลัง) ของทุกคำใน RELATION_WORDS ที่มีในทั้ง a และ b
+    เช่น "manager report to director" กับ "director report to manager" ไม่ผ่าน
+    แต่ "employee benefit" กับ "benefit for employee" ผ่าน (ไม่มีคำความสัมพันธ์ร่วมกัน)
+    """
+    relations = [r for r in RELATION_WORDS.intersection(a) if r in b]
+    if not relations:
+        return True
+    grams_b = [shingles((token,)) for token in b]
+    for i, token in enumerate(a):
+        if token in RELATION_WORDS or token in GUARD_WORDS:
+            continue
+        grams = shingles((token,))
+        sims = [jaccard(grams, other) for other in grams_b]
+        best = max(range(len(b)), key=sims.__getitem__, default=None)
+        if best is None or sims[best] < _TOKEN_MATCH:
+            continue
+        for r in relations:
+            if (i < a.index(r)) != (best < b.index(r)):
+                return False
+    return True
+
+
+def shingles(tokens: Tuple[str, ...]) -> FrozenSet[str]:
+    """character 3-gram ของแต่ละ token (มีตัวคั่นหัว/ท้ายคำ) สำหรับวัดความคล้าย"""
+    grams: Set[str] = set()
+    for token in tokens:
+        padded = f"^{token}$"
+        grams.update(padded[i:i + 3] for i in range(max(len(padded) - 2, 1)))
+    return frozenset(grams)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    MinHash signature ของเซตของ shingle
+    hash function ทั้ง num_perm ตัวมาจาก digest ของ BLAKE2b (64 byte ต่อครั้ง แบ่งเป็นค่า 16 bit
+    ตัวละหนึ่ง hash) จึงเร็วกว่าคำนวณ (a*x + b) mod p ทีละ function ใน Python
+    - num_perm: จำนวน hash function (ความยาว signature)
+    - seed: seed ของ hash function (ค่าเดียวกันให้ signature เดียวกันทุก process)
+    """
+
+    # ค่า 16 bit ต่อ digest ขนาด 64 byte
+    _PER_DIGEST = 32
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        self.num_perm = num_perm
+        digests = -(-num_perm // self._PER_DIGEST)
+        self._keys = [f"{seed}:{i}".encode("ascii") for i in range(digests)]
+        self._format = struct.Struct(f"<{num_perm}H")
+
+    def signature(self, items: FrozenSet[str]) -> Tuple[int, ...]:
+        rows = []
+        for item in items:
+            data = item.encode("utf-8")
+            digest = b"".join(hashlib.blake2b(data, key=key, digest_size=64).digest() for key in self._keys)
+            rows.append(self._format.unpack_from(digest))
+        if not rows:
+            return (0,) * self.num_perm
+        return tuple(map(min, zip(*rows)))
+
+
+@dataclass(frozen=True)
+class AnswerHit:
+    """
+    ผลของการค้นหาใน cache
+    - answer: คำตอบที่ cache ไว้
+    - similarity: Jaccard similarity กับคำถามที่ cache ไว้ (1.0 = key ตรงกัน)
+    - question: คำถามเดิมที่ได้คำตอบนี้
+    """
+    answer: str
+    similarity: float
+    question: str
+
+    @property
+    def exact(self) -> bool:
+        return self.similarity >= 1.0
+
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    created_at: float
+    grams: FrozenSet[str]
+    bands: List[Tuple[int, Tuple[int, ...]]]
+
+
+class AnswerCache:
+    """
+    cache ของคำตอบสุดท้ายในหน่วยความจำ (LRU) พร้อม near-duplicate matching
+    - min_similarity: Jaccard similarity ต่ำสุดของ shingle ที่ถือว่าเป็นคำถามเดียวกัน
+    - ttl_seconds: อายุของแต่ละคำตอบ (None = ไม่หมดอายุ)
+    - max_entries: จำนวนคำตอบสูงสุด (ลบรายการที่ใช้น้อยที่สุดเมื่อเกิน)
+    - kb_version: ฟังก์ชันที่คืนค่า version ของ knowledge base (None = ไม่ตรวจ)
+    - version_check_seconds: ระยะห่างขั้นต่ำระหว่างการตรวจ version (สำหรับ kb_version ที่ช้า)
+    - num_perm, bands: ขนาด MinHash signature และจำนวน LSH band (num_perm ต้องหารด้วย bands ลงตัว)
+    """
+
+    def __init__(
+        self,
+        min_similarity: float = 0.8,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        max_entries: int = 4096,
+        kb_version: Optional[Callable[[], Any]] = kb_generation,
+        version_check_seconds: float = 0.0,
+        num_perm: int = 32,
+        bands: int = 8,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.kb_version = kb_version
+        self.version_check_seconds = version_check_seconds
+        self.bands = bands
+        self._rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[Tuple[str, ...], _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._version: Any = None
+        self._version_checked = 0.0
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # -------------------------
+    # Lookup / store
+    # -------------------------
+    def lookup(self, question: str) -> Optional[AnswerHit]:
+        """คืนค่าคำตอบของคำถามนี้หรือคำถามที่คล้ายพอ (None ถ้าไม่พบ/หมดอายุ)"""
+        key = normalize_query(question)
+        now = time.time()
+        with self._lock:
+            self._check_version(now)
+            entry = self._live(key, now)
+            if entry is not None:
+                self.hits += 1
+                return AnswerHit(entry.answer, 1.0, entry.question)
+
+        # near-duplicate: คำนวณ signature นอก lock แล้วตรวจ candidate จาก LSH bucket
+        grams = shingles(key)
+        bands = self._bands(grams)
+        guards = guard_words(key)
+        with self._lock:
+            best: Optional[Tuple[float, _Entry, Tuple[str, ...]]] = None
+            candidates = set().union(*(self._buckets.get(band, ()) for band in bands))
+            for candidate in candidates:
+                entry = self._live(candidate, now, touch=False)
+                if entry is None:
+                    continue
+                similarity = jaccard(grams, entry.grams)
+                if similarity < self.min_similarity or (best is not None and similarity <= best[0]):
+                    continue
+                # คำถามต่างชนิด (who/how, can/must, มี/ไม่มี not) หรือสลับบทบาทของคำ ไม่ใช่คำถามเดียวกัน
+                if guard_words(candidate) != guards or not same_roles(key, candidate):
+                    continue
+                best = (similarity, entry, candidate)
+            if best is None:
+                self.misses += 1
+                return None
+            similarity, entry, candidate = best
+            self._entries.move_to_end(candidate)
+            self.hits += 1
+            self.near_hits += 1
+            return AnswerHit(entry.answer, similarity, entry.question)
+
+    def version(self) -> Any:
+        """version ของ knowledge base ตอนนี้ (ส่งให้ store เมื่อสร้างคำตอบเสร็จ)"""
+        return None if self.kb_version is None else self.kb_version()
+
+    def store(self, question: str, answer: str, version: Any = None) -> None:
+        """
+        บันทึกคำตอบของคำถาม (แทนที่คำตอบเดิมของ key เดียวกัน)
+        - version: ค่าจาก version() ก่อนเริ่มสร้างคำตอบ ถ้า knowledge base เปลี่ยนหลังจากนั้น
+          คำตอบอ้างข้อมูลเดิมจึงไม่ถูกเก็บ (None = ไม่ตรวจ)
+        """
+        if not answer:
+            return
+        key = normalize_query(question)
+        grams = shingles(key)
+        entry = _Entry(question, answer, time.time(), grams, self._bands(grams))
+        with self._lock:
+            self._check_version(entry.created_at)
+            if version is not None and self.kb_version is not None and version != self.kb_version():
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            for band in entry.bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self) -> None:
+        """ลบทุกคำตอบ (เช่นหลังแก้ไข knowledge base)"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, float]:
+        """ตัวนับ hit/miss ของ cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    # -------------------------
+    # Internals (เรียกขณะถือ self._lock)
+    # -------------------------
+    def _bands(self, grams: FrozenSet[str]) -> List[Tuple[int, Tuple[int, ...]]]:
+        signature = self._hasher.signature(grams)
+        rows = self._rows
+        return [(i, signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def _live(self, key: Tuple[str, ...], now: float, touch: bool = True) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds:
+            self._remove(key)
+            return None
+        if touch:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Tuple[str, ...]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+
+    def _check_version(self, now: float) -> None:
+        # ตรวจ version ของ knowledge base ไม่บ่อยกว่า version_check_seconds
+        if self.kb_version is None or now - self._version_checked < self.version_check_seconds:
+            return
+        self._version_checked = now
+        version = self.kb_version()
+        if self._version is not None and version != self._version and self._entries:
+            self._clear()
+            self.invalidations += 1
+        self._version = version
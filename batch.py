@@ -0,0 +1,165 @@
+# batch.py
+"""
+Batch mode สำหรับรันคำถามจำนวนมากจากไฟล์ JSONL (ใช้ร่วมกันทั้ง main.py และ langgraph_version/main.py)
+
+Input  : หนึ่งบรรทัดต่อคำถาม เช่น {"id": "q1", "question": "..."} (รับ key "question" หรือ "query")
+Output : หนึ่งบรรทัดต่อผลลัพธ์ {"line", "id", "question", "answer", "error", "latency_s"}
+         เขียนทันทีที่แต่ละคำถามเสร็จ จึง resume ต่อได้หลัง crash (ข้ามบรรทัดที่มีผลลัพธ์แล้ว)
+"""
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+# runner คือฟังก์ชันรับคำถามแล้วคืนคำตอบ เช่น agent.run
+Runner = Callable[[str], str]
+
+
+@dataclass
+class BatchSummary:
+    """สรุปผลการรัน batch (เฉพาะคำถามที่รันในครั้งนี้ ไม่รวมที่ข้ามจากการ resume)"""
+    completed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    wall_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.completed if self.completed else 0.0
+
+    def percentile(self, p: float) -> float:
+        """latency ที่ percentile p (nearest-rank)"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(math.ceil(p / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def report(self) -> str:
+        return (
+            f"Completed {self.completed} queries ({self.skipped} skipped) in {self.wall_seconds:.1f}s\n"
+            f"Throughput: {self.throughput:.2f} queries/s\n"
+            f"Latency p50/p95/p99: {self.percentile(50):.2f}s / {self.percentile(95):.2f}s / {self.percentile(99):.2f}s\n"
+            f"Errors: {self.errors} ({self.error_rate:.1%})"
+        )
+
+
+def read_questions(input_path: str) -> Iterator[Tuple[int, Dict]]:
+    """อ่านคำถามจากไฟล์ JSONL แบบ streaming คืนค่า (หมายเลขบรรทัดเริ่มที่ 0, record)"""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if line:
+                yield line_no, json.loads(line)
+
+
+def completed_lines(output_path: str) -> Set[int]:
+    """
+    อ่านหมายเลขบรรทัดของคำถามที่มีผลลัพธ์แล้วในไฟล์ output
+    บรรทัดสุดท้ายที่เขียนไม่ครบ (crash ระหว่างเขียน) จะถูกตัดทิ้ง
+    """
+    done: Set[int] = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        # ตัดส่วนท้ายที่ไม่มี newline ออก เพื่อให้ append ต่อได้ถูกต้อง
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+        for raw in data[:end].splitlines():
+            try:
+                done.add(json.loads(raw)["line"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    make_runner: Callable[[], Runner],
+    concurrency: int = 8,
+    resume: bool = True,
+) -> BatchSummary:
+    """
+    รันคำถามทั้งหมดจาก input_path และเขียนผลลัพธ์ลง output_path ทีละบรรทัด
+    - make_runner: สร้าง runner หนึ่งครั้งต่อ worker thread แล้วใช้ซ้ำ
+    - concurrency: จำนวนคำถามที่รันพร้อมกัน (อ่าน input ล่วงหน้าไม่เกินจำนวนนี้)
+    - resume: ข้ามคำถามที่มีผลลัพธ์อยู่แล้วใน output_path (False = เขียนทับไฟล์)
+    """
+    summary = BatchSummary()
+    done = completed_lines(output_path) if resume else set()
+    local = threading.local()
+
+    def answer(record: Dict) -> Tuple[Optional[str], Optional[str], float]:
+        runner = getattr(local, "runner", None)
+        if runner is None:
+            runner = local.runner = make_runner()
+        question = record.get("question") or record.get("query") or ""
+        start = time.perf_counter()
+        try:
+            return runner(question), None, time.perf_counter() - start
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+    def write(out, line_no: int, record: Dict, result: Tuple[Optional[str], Optional[str], float]) -> None:
+        answer_text, error, latency = result
+        out.write(json.dumps({
+            "line": line_no,
+            "id": record.get("id"),
+            "question": record.get("question") or record.get("query"),
+            "answer": answer_text,
+            "error": error,
+            "latency_s": round(latency, 4),
+        }, ensure_ascii=False) + "\n")
+        out.flush()
+        summary.completed += 1
+        summary.errors += error is not None
+        summary.latencies.append(latency)
+
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        pending = {}
+
+        def drain(return_when) -> None:
+            finished, _ = wait(pending, return_when=return_when)
+            for future in finished:
+                line_no, record = pending.pop(future)
+                write(out, line_no, record, future.result())
+
+        for line_no, record in read_questions(input_path):
+            if line_no in done:
+                summary.skipped += 1
+                continue
+            # จำกัดจำนวนงานที่ค้างอยู่ เพื่อไม่ให้อ่าน input ทั้งไฟล์เข้าหน่วยความจำ
+            if len(pending) >= concurrency:
+                drain(FIRST_COMPLETED)
+            pending[pool.submit(answer, record)] = (line_no, record)
+        if pending:
+            drain(ALL_COMPLETED)
+
+    summary.wall_seconds = time.perf_counter() - start
+    return summary
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    """เพิ่ม argument ของคำสั่ง batch ให้กับ parser"""
+    parser.add_argument("input", help="JSONL file with one {\"question\": ...} per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file for answers and timings")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="queries run at the same time (default: 8)")
+    parser.add_argument("--no-resume", dest="resume", action="store_false",
+                        help="overwrite the output instead of skipping completed lines")
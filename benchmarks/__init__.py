@@ -0,0 +1,10 @@
+"""
+Offline benchmark suite.
+
+Runs the knowledge-base search and both agents against deterministic
+stand-ins for Gemini and DuckDuckGo, so performance can be measured
+without API quota or network access:
+
+    python -m benchmarks.run --save-baseline   # record a baseline
+    python -m benchmarks.run                   # compare against it (exit 1 on regression)
+"""
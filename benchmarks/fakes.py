@@ -0,0 +1,217 @@
+"""
+Deterministic stand-ins for the external backends used by the agents.
+
+- FakeGemini replaces ``google.generativeai.GenerativeModel`` (pass it as
+  ``react_agent.ReActAgent(llm_client=...)``).
+- FakeChatModel replaces ``ChatGoogleGenerativeAI`` (pass it as
+  ``langgraph_version.agent.ReActAgent(llm=...)``).
+- FakeDDGS replaces ``DDGS`` (install it with ``install_fake_search``).
+
+Replies depend only on the prompt, so results are reproducible and safe to
+use from concurrent runs. Latency can be injected to model network time.
+"""
+import asyncio
+import functools
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Fixed final answer (about 60 tokens)
+ANSWER = (
+    "Employees receive full health insurance, life and accident insurance, a provident fund with "
+    "a 5% company contribution, and allowances for travel, phone and internet. Annual leave starts "
+    "at 15 days and grows with service, sick leave is 30 days with a certificate, and training "
+    "budgets support career development."
+)
+
+_STEP_RE = re.compile(r"Current step: (\d+)")
+_QUESTION_RE = re.compile(r"User question: (.*)")
+_PIECE_RE = re.compile(r"\S+\s*")
+
+
+def _approx_tokens(text: str) -> int:
+    return max(len(text) // 4, 1)
+
+
+class _Usage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = _approx_tokens(prompt)
+        self.candidates_token_count = _approx_tokens(text)
+
+
+class _Response:
+    """Mimics the parts of a Gemini response the agent reads (.text, .usage_metadata)."""
+
+    def __init__(self, text: str, usage: Optional[_Usage] = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeGemini:
+    """
+    Scripted stand-in for the Gemini GenerativeModel.
+
+    Reasoning prompts are answered by step: ``search_context`` at step 1,
+    ``web_search`` at step 2 and ``final_answer`` afterwards, always querying
+    the user question. Any other prompt is a final-answer prompt and gets
+    ``answer``.
+
+    Args:
+        latency: Seconds to wait before each response
+        token_latency: Seconds to wait between streamed chunks
+        answer: Final answer text
+    """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, answer: str = ANSWER):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer = answer
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def reply(self, prompt: str) -> str:
+        step = _STEP_RE.search(prompt)
+        if step is None:
+            return self.answer
+        question = _QUESTION_RE.search(prompt).group(1).strip()
+        n = int(step.group(1))
+        action = "search_context" if n == 1 else "web_search" if n == 2 else "final_answer"
+        return json.dumps({"action": action, "query": question})
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _pieces(self, prompt: str, text: str) -> List[_Response]:
+        pieces = _PIECE_RE.findall(text) or [text]
+        responses = [_Response(p) for p in pieces]
+        # Like Gemini, the last chunk carries the usage of the whole response
+        responses[-1].usage_metadata = _Usage(prompt, text)
+        return responses
+
+    def generate_content(self, prompt: str, generation_config: Any = None, stream: bool = False, **kwargs):
+        self._count()
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.reply(prompt)
+        if not stream:
+            return _Response(text, _Usage(prompt, text))
+
+        def chunks() -> Iterator[_Response]:
+            for piece in self._pieces(prompt, text):
+                if self.token_latency:
+                    time.sleep(self.token_latency)
+                yield piece
+        return chunks()
+
+    async def generate_content_async(self, prompt: str, generation_config: Any = None, stream: bool = False, **kwargs):
+        self._count()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self.reply(prompt)
+        if not stream:
+            return _Response(text, _Usage(prompt, text))
+
+        async def chunks():
+            for piece in self._pieces(prompt, text):
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency)
+                yield piece
+        return chunks()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted stand-in for ChatGoogleGenerativeAI with tools bound.
+
+    For each user message, the first call requests ``search_knowledge_base``,
+    the second ``web_search`` (both with the user question) and the third
+    returns ``answer``.
+    """
+
+    latency: float = 0.0
+    answer: str = ANSWER
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def bind_tools(self, tools: list, **kwargs) -> "FakeChatModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        # Only the current turn counts, so multi-turn sessions replay the same script
+        start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        question = messages[start].content if messages else ""
+        turn = sum(1 for m in messages[start:] if isinstance(m, ToolMessage))
+        usage = {
+            "input_tokens": _approx_tokens("".join(str(m.content) for m in messages)),
+            "output_tokens": 0,
+            "total_tokens": 0,
+        }
+        if turn < 2:
+            name = "search_knowledge_base" if turn == 0 else "web_search"
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": name, "args": {"query": question}, "id": f"call_{turn}"}],
+                usage_metadata=usage,
+            )
+        usage["output_tokens"] = _approx_tokens(self.answer)
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=self.answer, usage_metadata=usage)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+
+class FakeDDGS:
+    """
+    Stand-in for the DDGS client: returns ``max_results`` synthetic results.
+
+    Args:
+        latency: Seconds to wait per search
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def text(self, query: str, max_results: int = 5, **kwargs) -> List[dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "href": f"https://example.com/{i + 1}",
+                "body": f"Synthetic web result {i + 1} about {query}.",
+            }
+            for i in range(max_results)
+        ]
+
+    def __enter__(self) -> "FakeDDGS":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+def install_fake_search(latency: float = 0.0) -> None:
+    """Make both agents' web search tools use FakeDDGS clients."""
+    import agent_actions
+    from langgraph_version import tools
+
+    for pool in (agent_actions.ddgs_pool, tools.ddgs_pool):
+        pool.factory = functools.partial(FakeDDGS, latency=latency)
+        pool.reset()
@@ -0,0 +1,124 @@
+"""
+Check that cold imports stay cheap.
+
+Each module is imported in a fresh interpreter with ``-X importtime``. The
+check fails (exit status 1) when the cumulative import time of the module
+exceeds its budget, or when the import pulls in a heavy dependency that
+should only be loaded on first use (Gemini SDK, LangGraph, LangChain,
+the search clients, multiprocessing).
+
+The interpreter start-up itself (site, encodings, ...) is not counted, so
+budgets only cover this repository's modules and what they import.
+
+Examples:
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --runs 5 --scale 2.0   # slower machine
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budgets in milliseconds
+BUDGETS_MS: Dict[str, float] = {
+    "rag": 40.0,
+    "constant": 5.0,
+    "langgraph_version": 5.0,
+    "agent_actions": 60.0,
+    "react_agent": 100.0,
+}
+
+# Top-level packages that must not be imported as a side effect
+FORBIDDEN = (
+    "google.generativeai",
+    "langchain_google_genai",
+    "langgraph",
+    "langchain_core",
+    "ddgs",
+    "duckduckgo_search",
+    "dotenv",
+    "multiprocessing",
+)
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure_import(module: str) -> Tuple[float, Set[str]]:
+    """
+    Import ``module`` in a new interpreter.
+
+    Returns:
+        (cumulative import time of the module in ms, names of all modules imported by it)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    entries: List[Tuple[int, int, str]] = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            entries.append((len(match.group(3)), int(match.group(2)), match.group(4)))
+
+    # importtime prints children before their parent: the module's own line
+    # (at depth 1) comes after everything it imported
+    imported: Set[str] = set()
+    for i, (depth, cumulative, name) in enumerate(entries):
+        if depth == 1 and name == module:
+            j = i - 1
+            while j >= 0 and entries[j][0] > 1:
+                imported.add(entries[j][2])
+                j -= 1
+            return cumulative / 1000, imported
+    # Already imported during interpreter start-up
+    return 0.0, imported
+
+
+def forbidden_imports(imported: Set[str]) -> List[str]:
+    return sorted(
+        name for name in imported
+        if any(name == f or name.startswith(f + ".") for f in FORBIDDEN)
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check cold import time budgets")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS), help="modules to check (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="imports per module; the median is compared")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (for slow machines)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'module':<20} {'median ms':>10} {'budget ms':>10}")
+    for module in args.modules:
+        times, imported = [], set()
+        for _ in range(args.runs):
+            ms, imported = measure_import(module)
+            times.append(ms)
+        median = statistics.median(times)
+        budget = BUDGETS_MS.get(module, float("inf")) * args.scale
+        print(f"{module:<20} {median:>10.1f} {budget:>10.1f}")
+
+        if median > budget:
+            failures.append(f"{module}: {median:.1f}ms exceeds budget of {budget:.1f}ms")
+        heavy = forbidden_imports(imported)
+        if heavy:
+            roots = sorted({name.split(".")[0] for name in heavy})
+            failures.append(f"{module}: imports {', '.join(roots)} eagerly")
+
+    if failures:
+        print(f"\nFAILED ({len(failures)}):")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("All imports within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Run the offline benchmarks and compare them with a stored baseline.
+
+Benchmarks:
+- rag_search_context[n=...]: BM25 search over synthetic knowledge bases
+- rag_store.update[n=...]: re-indexing after a one-section edit, for
+  knowledge bases stored as directories of markdown files
+- rag_shard.search[n=...,shards=...]: scatter-gather BM25 search over
+  shard worker processes, single-query latency and batch throughput
+  (batch_qps), next to the in-process index (shards=0)
+- react_agent.run: full ReAct loop of the original agent (router disabled,
+  3 LLM calls and 2 tool calls per query)
+- langgraph.run: the LangGraph agent (3 LLM calls and 2 tool calls per query)
+- answer_cache.hit[...]: react_agent.run answered from the answer cache, for
+  an exact (normalized) match and a near-duplicate paraphrase
+- json_stream.decision[...]: incremental parsing of a fenced reasoning
+  decision fed in small chunks, as it arrives from a streamed LLM call
+
+LLM and web search are replaced by the stand-ins in benchmarks/fakes.py,
+with optional injected latency. Results are written as JSON; every
+"*_ms" metric that is slower than the baseline by more than the tolerance
+is reported as a regression and the command exits with status 1.
+
+Examples:
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --sizes 100 10000 1000000
+    python -m benchmarks.run --only react langgraph --llm-latency-ms 50
+    python -m benchmarks.run --only rag_shard --sizes 100000 --shards 1 2 4 8
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fakes import FakeChatModel, FakeGemini, install_fake_search
+from benchmarks.synthetic_kb import COMPILE_THRESHOLD, DEFAULT_DATA_DIR, ensure_kb, sample_queries
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """Call fn(i) ``iterations`` times and return latency statistics in milliseconds."""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    if len(latencies) > 1:
+        q = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "ops_per_s": iterations / elapsed if elapsed else 0.0,
+    }
+
+
+def bench_rag(sizes: List[int], iterations: int, data_dir: str) -> Dict[str, Dict[str, float]]:
+    """Benchmark rag_search_context on a synthetic knowledge base of each size."""
+    import rag
+
+    results = {}
+    queries = sample_queries(max(iterations, 1))
+    previous = os.environ.get("RAG_INDEX_PATH")
+    try:
+        for size in sizes:
+            path = ensure_kb(size, data_dir)
+            os.environ["RAG_INDEX_PATH"] = path
+
+            t0 = time.perf_counter()
+            rag.get_rag_index(path)
+            load_ms = (time.perf_counter() - t0) * 1000
+
+            stats = measure(lambda i: rag.rag_search_context(queries[i % len(queries)], top_k=2), iterations)
+            stats["index_load_ms"] = load_ms
+            results[f"rag_search_context[n={size}]"] = stats
+            print(f"  rag_search_context[n={size}]: p50 {stats['p50_ms']:.3f}ms, load {load_ms:.0f}ms", file=sys.stderr)
+    finally:
+        if previous is None:
+            os.environ.pop("RAG_INDEX_PATH", None)
+        else:
+            os.environ["RAG_INDEX_PATH"] = previous
+    return results
+
+
+def bench_rag_store(sizes: List[int], iterations: int) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark rag_store.DocumentStore.refresh after editing one section, per knowledge base size.
+
+    Each knowledge base is a directory of 100-section files; every iteration
+    edits one section in one file and refreshes that file, so the work per
+    update is constant and the latency should not grow with the knowledge
+    base. scan_ms is the cost of a full change scan (what the watcher does
+    each poll), which stats every file.
+    """
+    import shutil
+    import tempfile
+
+    from benchmarks.synthetic_kb import write_kb_dir
+    from rag_store import DocumentStore
+
+    results = {}
+    for size in sizes:
+        path = tempfile.mkdtemp(prefix="rag_store_")
+        try:
+            files = write_kb_dir(path, size)
+            store = DocumentStore(path)
+            t0 = time.perf_counter()
+            store.refresh()
+            build_ms = (time.perf_counter() - t0) * 1000
+
+            def edit(i: int) -> None:
+                file_path = files[i % len(files)]
+                with open(file_path, "r", encoding="utf-8") as f:
+                    lines = f.read().split("\n")
+                lines[3] = f"{lines[3].split(' rev')[0]} rev{i}"  # body of the file's first section
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(lines))
+                store.refresh([file_path])
+
+            stats = measure(edit, iterations)
+            t0 = time.perf_counter()
+            store.refresh()
+            stats["scan_ms"] = (time.perf_counter() - t0) * 1000
+            stats["full_build_ms"] = build_ms
+            stats["segments"] = len(store.snapshot().segments)
+            results[f"rag_store.update[n={size}]"] = stats
+            print(
+                f"  rag_store.update[n={size}]: p50 {stats['p50_ms']:.3f}ms, "
+                f"scan {stats['scan_ms']:.1f}ms, full build {build_ms:.0f}ms",
+                file=sys.stderr,
+            )
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def bench_rag_shard(sizes: List[int], shard_counts: List[int], iterations: int, data_dir: str) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark rag_shard.ShardedIndex against the in-process index, per knowledge base size and shard count.
+
+    p50_ms is the latency of one query (a full scatter-gather round trip);
+    batch_qps is the throughput of one search_scored_batch call over
+    ``iterations`` queries, which pipelines the batches to every shard.
+    shards=0 is the in-process index running the same queries one by one.
+    Throughput only scales with shards up to the number of free CPU cores.
+    """
+    import rag
+    from rag_shard import ShardedIndex
+
+    results = {}
+    queries = sample_queries(max(iterations, 1))
+    for size in sizes:
+        path = ensure_kb(size, data_dir)
+        for n_shards in [0] + shard_counts:
+            t0 = time.perf_counter()
+            index = rag.get_rag_index(path) if n_shards == 0 else ShardedIndex(path, n_shards, with_passages=False)
+            load_ms = (time.perf_counter() - t0) * 1000
+            try:
+                stats = measure(lambda i: index.search_scored(queries[i % len(queries)], 5), iterations)
+                t0 = time.perf_counter()
+                if n_shards == 0:
+                    for query in queries:
+                        index.search_scored(query, 5)
+                else:
+                    index.search_scored_batch(queries, 5)
+                stats["batch_qps"] = len(queries) / (time.perf_counter() - t0)
+                stats["index_load_ms"] = load_ms
+            finally:
+                if n_shards:
+                    index.close()
+            name = f"rag_shard.search[n={size},shards={n_shards}]"
+            results[name] = stats
+            print(
+                f"  {name}: p50 {stats['p50_ms']:.3f}ms, batch {stats['batch_qps']:.0f} q/s, load {load_ms:.0f}ms",
+                file=sys.stderr,
+            )
+    return results
+
+
+def bench_react_agent(iterations: int, llm_latency: float) -> Dict[str, float]:
+    """Benchmark react_agent.ReActAgent.run with the Gemini stand-in."""
+    from react_agent import ReActAgent
+
+    agent = ReActAgent(enable_logging=False, router_threshold=None, llm_client=FakeGemini(latency=llm_latency))
+    # A distinct question per iteration keeps the tool cache from short-circuiting the searches
+    return measure(lambda i: agent.run(f"What does the benefits policy say about case {i}?"), iterations)
+
+
+def bench_langgraph_agent(iterations: int, llm_latency: float) -> Dict[str, float]:
+    """Benchmark langgraph_version.agent.ReActAgent.run with the chat-model stand-in."""
+    from langgraph_version.agent import ReActAgent
+
+    agent = ReActAgent(enable_logging=False, llm=FakeChatModel(latency=llm_latency))
+    return measure(lambda i: agent.run(f"What does the benefits policy say about case {i}?"), iterations)
+
+
+def bench_answer_cache(iterations: int, llm_latency: float) -> Dict[str, Dict[str, float]]:
+    """Benchmark repeat questions answered by react_agent.ReActAgent from the answer cache."""
+    from answer_cache import AnswerCache
+    from react_agent import ReActAgent
+
+    agent = ReActAgent(
+        enable_logging=False, router_threshold=None, llm_client=FakeGemini(latency=llm_latency),
+        answer_cache=AnswerCache(),
+    )
+    agent.run("What are the employee benefits?")
+    return {
+        "answer_cache.hit[exact]": measure(lambda i: agent.run("Employee Benefits"), iterations),
+        "answer_cache.hit[near]": measure(lambda i: agent.run("benefits for employees?"), iterations),
+    }
+
+
+def bench_decision_stream(iterations: int) -> Dict[str, Dict[str, float]]:
+    """Benchmark json_stream.DecisionStream on fenced single- and multi-action decisions."""
+    from json_stream import DecisionStream
+
+    single = '```json\n{"action": "search_context", "query": "What does the benefits policy say?"}\n```'
+    multi = (
+        '```json\n{"actions": [{"action": "search_context", "query": "benefits policy"}, '
+        '{"action": "web_search", "query": "provident fund contribution rates"}]}\n```'
+    )
+
+    def parse(text: str) -> None:
+        stream = DecisionStream()
+        for i in range(0, len(text), 8):  # about two tokens per chunk
+            stream.feed(text[i:i + 8])
+            if stream.settled:
+                break
+        stream.decision()
+
+    return {
+        "json_stream.decision[single]": measure(lambda i: parse(single), iterations),
+        "json_stream.decision[multi]": measure(lambda i: parse(multi), iterations),
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+    min_delta_ms: float,
+) -> List[str]:
+    """
+    Return a description of every "*_ms" metric slower than the baseline.
+
+    A metric regresses when it exceeds baseline * (1 + tolerance) and the
+    absolute difference is larger than min_delta_ms (to ignore timer noise).
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, value in metrics.items():
+            if not metric.endswith("_ms") or metric not in base:
+                continue
+            limit = base[metric] * (1 + tolerance)
+            if value > limit and value - base[metric] > min_delta_ms:
+                regressions.append(
+                    f"{name} {metric}: {value:.3f} vs baseline {base[metric]:.3f} "
+                    f"(+{(value / base[metric] - 1) * 100 if base[metric] else float('inf'):.0f}%)"
+                )
+    return regressions
+
+
+def write_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["benchmarks"]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the RAG search and both agents")
+    parser.add_argument("--only", nargs="+",
+                        choices=["rag", "rag_store", "rag_shard", "react", "langgraph", "answer_cache", "json_stream"],
+                        default=["rag", "rag_store", "rag_shard", "react", "langgraph", "answer_cache", "json_stream"],
+                        help="benchmarks to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 10_000],
+                        help="knowledge base sizes in sections (default: 100 10000; add 1000000 for the large run)")
+    parser.add_argument("--shards", nargs="+", type=int, default=[1, 2, 4],
+                        help="shard counts for the rag_shard benchmark (default: 1 2 4)")
+    parser.add_argument("--iterations", type=int, default=200, help="search queries per knowledge base size")
+    parser.add_argument("--agent-iterations", type=int, default=30, help="agent runs per agent benchmark")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="latency injected per LLM call")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="latency injected per web search")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where synthetic knowledge bases are cached")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="results JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown ratio (default: 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    install_fake_search(latency=args.search_latency_ms / 1000)
+    llm_latency = args.llm_latency_ms / 1000
+
+    benchmarks: Dict[str, Dict[str, float]] = {}
+    if "rag" in args.only:
+        benchmarks.update(bench_rag(args.sizes, args.iterations, args.data_dir))
+    if "rag_store" in args.only:
+        # in-memory stores only: large sizes are served from compiled indexes
+        store_sizes = [size for size in args.sizes if size < COMPILE_THRESHOLD]
+        benchmarks.update(bench_rag_store(store_sizes, min(args.iterations, 50)))
+    if "rag_shard" in args.only:
+        benchmarks.update(bench_rag_shard(args.sizes, args.shards, args.iterations, args.data_dir))
+    if "react" in args.only:
+        benchmarks["react_agent.run"] = bench_react_agent(args.agent_iterations, llm_latency)
+    if "langgraph" in args.only:
+        benchmarks["langgraph.run"] = bench_langgraph_agent(args.agent_iterations, llm_latency)
+    if "answer_cache" in args.only:
+        benchmarks.update(bench_answer_cache(args.iterations, llm_latency))
+    if "json_stream" in args.only:
+        benchmarks.update(bench_decision_stream(args.iterations))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_latency_ms": args.llm_latency_ms,
+            "search_latency_ms": args.search_latency_ms,
+        },
+        "benchmarks": benchmarks,
+    }
+    write_json(args.output, results)
+
+    print(f"{'benchmark':<34} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>10}")
+    for name, stats in benchmarks.items():
+        print(f"{name:<34} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['ops_per_s']:>10.1f}")
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(benchmarks, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\nREGRESSIONS ({len(regressions)}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Synthetic knowledge bases for benchmarking retrieval at scale.
+
+Sections follow the format of data/mock_rag_document.md ("## title",
+content lines, "---"), with words drawn from a fixed pseudo-word
+vocabulary using a seeded RNG, so the same size always produces the same
+file. Large sizes are also compiled into a binary index (rag_build.py
+format) so they can be searched through mmap without loading all text.
+"""
+import os
+import random
+from typing import List
+
+from rag_index import write_index
+from rag_ingest import ingest_documents
+
+SIZES = (100, 10_000, 1_000_000)
+
+# Sizes from this many sections up are searched through a compiled index
+COMPILE_THRESHOLD = 100_000
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+_SYLLABLES = [
+    "ba", "ce", "di", "fo", "gu", "ha", "je", "ki", "lo", "mu", "na", "pe", "qi", "ro",
+    "su", "ta", "ve", "wi", "xo", "yu", "za", "bre", "cla", "dro", "fli", "gra", "plo", "tri",
+]
+
+
+def vocabulary(size: int = 4000, seed: int = 0) -> List[str]:
+    """Return ``size`` distinct pseudo-words (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def write_kb(path: str, n_sections: int, seed: int = 0, words_per_section: int = 30) -> None:
+    """
+    Write a markdown knowledge base with ``n_sections`` sections.
+
+    Word frequencies are skewed (Zipf-like) so term statistics resemble
+    natural text: a few words appear everywhere, most are rare.
+    """
+    rng = random.Random(seed)
+    words = vocabulary(seed=seed)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("# Synthetic Knowledge Base\n\n")
+        for i in range(1, n_sections + 1):
+            title = " ".join(rng.choices(words, weights, k=3)).title()
+            body = " ".join(rng.choices(words, weights, k=words_per_section))
+            f.write(f"## {i}. {title}\n{body}.\n\n---\n\n")
+    os.replace(tmp_path, path)
+
+
+def write_kb_dir(path: str, n_sections: int, sections_per_file: int = 100) -> List[str]:
+    """
+    Write a knowledge base of ``n_sections`` sections as a directory of markdown files.
+
+    Returns:
+        The file paths, each holding ``sections_per_file`` sections (the last may hold fewer)
+    """
+    files = []
+    for i, start in enumerate(range(0, n_sections, sections_per_file)):
+        file_path = os.path.join(path, f"part_{i:05d}.md")
+        write_kb(file_path, min(sections_per_file, n_sections - start), seed=i)
+        files.append(file_path)
+    return files
+
+
+def sample_queries(n: int, seed: int = 1) -> List[str]:
+    """Return ``n`` queries of two or three vocabulary words."""
+    rng = random.Random(seed)
+    words = vocabulary()
+    return [" ".join(rng.sample(words, rng.randint(2, 3))) for _ in range(n)]
+
+
+def ensure_kb(n_sections: int, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """
+    Generate (once) the knowledge base with ``n_sections`` sections.
+
+    Returns:
+        The path to pass as RAG_INDEX_PATH: the markdown file for small
+        sizes, or a compiled index for sizes >= COMPILE_THRESHOLD
+    """
+    md_path = os.path.join(data_dir, f"kb_{n_sections}.md")
+    if not os.path.exists(md_path):
+        write_kb(md_path, n_sections)
+    if n_sections < COMPILE_THRESHOLD:
+        return md_path
+
+    index_path = os.path.join(data_dir, f"kb_{n_sections}.ragidx")
+    if not os.path.exists(index_path):
+        write_index(ingest_documents([md_path]), index_path)
+    return index_path
@@ -1,7 +1,33 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# ค่า default ของ configuration (อ่านจาก environment / .env ตอนใช้งานครั้งแรก)
+_DEFAULTS = {
+    "GOOGLE_GEMINI_API_KEY": None,
+    "GOOGLE_GEMINI_MODEL_NAME": "gemini-2.5-flash",
+    # โควตาของ Gemini ที่ llm_governor ใช้ (ไม่กำหนด = ไม่จำกัด)
+    "GEMINI_RPM": None,
+    "GEMINI_TPM": None,
+    "GEMINI_MAX_CONCURRENCY": None,
+}
 
-GOOGLE_GEMINI_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY")
-GOOGLE_GEMINI_MODEL_NAME = os.getenv("GOOGLE_GEMINI_MODEL_NAME", "gemini-2.5-flash")
+_env_loaded = False
+
+
+def load_env():
+    """โหลด .env เพียงครั้งเดียว (ถูกเรียกอัตโนมัติเมื่ออ่านค่าคงที่ครั้งแรก)"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+def __getattr__(name: str):
+    # ไม่เรียก load_dotenv ตอน import: process ที่ไม่ได้ใช้ค่าเหล่านี้จะไม่เสียเวลาอ่าน .env
+    if name in _DEFAULTS:
+        load_env()
+        value = os.getenv(name, _DEFAULTS[name])
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,278 @@
+# json_stream.py
+"""
+parser JSON แบบทีละส่วน (incremental) ที่ทนต่อ output ของ LLM
+
+- StreamingJSONParser: รับข้อความทีละส่วนด้วย feed() และแจ้ง on_value(path, value) ทันทีที่ค่าใดครบ
+  จึงใช้ค่าที่ parse ได้ระหว่างที่ LLM ยังสร้างข้อความอยู่ (ไม่ต้องรอทั้ง response)
+  ซ่อมข้อผิดพลาดที่ LLM มักทำได้เอง:
+  - ข้ามข้อความก่อน { หรือ [ ตัวแรกและหลัง root ปิด (เช่น ```json fence หรือคำอธิบาย)
+  - string ใน '...', key ที่ไม่มี quote, trailing comma, comma ที่หายไประหว่าง item
+  - True/False/None แบบ Python
+  - close(): ปิด string และ object/array ที่ค้างอยู่เมื่อ response ถูกตัด
+- DecisionStream: decision ของ ReAct ({"action", "query"} หรือ {"actions": [...]})
+  แจ้ง action แต่ละตัวทันทีที่ action และ query ครบ (ใช้เริ่ม tool ก่อน LLM สร้างข้อความเสร็จ)
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import re
+
+# path ของค่าใน root: key ของ object หรือ index ของ array ตามลำดับความลึก
+Path = Tuple[Any, ...]
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+_STRING_SPECIAL = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_BARE = re.compile(r"[^\s,:{}\[\]\"']+")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_NUMBER = re.compile(r"-?\d+(\.\d+)?([eE][-+]?\d+)?")
+
+
+def _bare_value(token: str) -> Any:
+    # ค่าที่ไม่มี quote: literal, ตัวเลข หรือถือเป็น string
+    if token in _LITERALS:
+        return _LITERALS[token]
+    match = _NUMBER.fullmatch(token)
+    if match:
+        return float(token) if match.group(1) or match.group(2) else int(token)
+    return token
+
+
+class StreamingJSONParser:
+    """
+    parser JSON แบบ feed ทีละส่วน
+    - on_value(path, value): เรียกเมื่อค่า (string, ตัวเลข, literal, object หรือ array) ครบ
+      object/array ถูกแจ้งตอนปิด ส่วน root ถูกแจ้งด้วย path ()
+    - value: root ที่ parse ได้จนถึงตอนนี้ (object/array ที่ยังไม่ปิดมีเฉพาะค่าที่ครบแล้ว)
+    - started / done: พบ root แล้ว / root ปิดแล้ว (ข้อความหลังจากนี้ถูกข้าม)
+    """
+
+    def __init__(self, on_value: Optional[Callable[[Path, Any], None]] = None):
+        self.on_value = on_value
+        self.value: Any = None
+        self.started = False
+        self.done = False
+        # object/array ที่ยังไม่ปิด และ key/index ของแต่ละตัวใน parent (root = None)
+        self._stack: List[Any] = []
+        self._elems: List[Any] = []
+        # ของแต่ละ object: key ที่รอค่า และสิ่งที่รออยู่ ("key", "colon", "value" หรือ "after")
+        self._keys: List[Optional[str]] = []
+        self._phase: List[str] = []
+        # token ที่กำลังอ่าน: string (quote) หรือค่าที่ไม่มี quote (bare)
+        self._quote: Optional[str] = None
+        self._bare = False
+        self._is_key = False
+        self._escape: Optional[str] = None
+        self._buf: List[str] = []
+
+    def feed(self, text: str) -> None:
+        """parse ข้อความส่วนถัดไป"""
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if self._quote is not None:
+                i = self._scan_string(text, i)
+                continue
+            if self._bare:
+                match = _BARE.match(text, i)
+                if match:
+                    self._buf.append(match.group())
+                    i = match.end()
+                    if i == n:
+                        break  # token อาจต่อในส่วนถัดไป
+                self._end_bare()
+                continue
+
+            ch = text[i]
+            i += 1
+            if not self.started:
+                # ข้ามทุกอย่างก่อน root (code fence, คำอธิบาย)
+                if ch == "{" or ch == "[":
+                    self.started = True
+                    self._open({} if ch == "{" else [])
+                continue
+            if ch.isspace():
+                continue
+            if ch == "{" or ch == "[":
+                if not self._expect_key():
+                    self._open({} if ch == "{" else [])
+            elif ch == "}" or ch == "]":
+                self._close()
+            elif ch == ",":
+                self._phase[-1] = "key" if isinstance(self._stack[-1], dict) else "value"
+            elif ch == ":":
+                if self._phase[-1] == "colon":
+                    self._phase[-1] = "value"
+            elif ch == '"' or ch == "'":
+                self._is_key = self._expect_key()
+                self._quote = ch
+            else:
+                self._is_key = self._expect_key()
+                self._bare = True
+                self._buf.append(ch)
+
+    def close(self) -> Any:
+        """จบ input: ปิด token และ object/array ที่ค้างอยู่ แล้วคืนค่า root (None ถ้าไม่พบ JSON)"""
+        if self.started and not self.done:
+            if self._quote is not None:
+                self._quote = None
+                self._escape = None
+                self._end_token("".join(self._buf))
+            elif self._bare:
+                self._end_bare()
+            while self._stack:
+                self._close()
+        return self.value
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _expect_key(self) -> bool:
+        # ใน object ที่รอ key (หรือเพิ่งจบค่าโดยไม่มี comma) token ถัดไปคือ key
+        return isinstance(self._stack[-1], dict) and self._phase[-1] in ("key", "after")
+
+    def _scan_string(self, text: str, i: int) -> int:
+        n = len(text)
+        buf = self._buf
+        while i < n:
+            if self._escape is not None:
+                ch = text[i]
+                i += 1
+                if self._escape == "":
+                    if ch == "u":
+                        self._escape = "u"
+                    else:
+                        buf.append(_ESCAPES.get(ch, ch))
+                        self._escape = None
+                    continue
+                self._escape += ch
+                if len(self._escape) == 5:
+                    try:
+                        buf.append(chr(int(self._escape[1:], 16)))
+                    except ValueError:
+                        buf.append(self._escape)
+                    self._escape = None
+                continue
+            match = _STRING_SPECIAL[self._quote].search(text, i)
+            if match is None:
+                buf.append(text[i:])
+                return n
+            j = match.start()
+            buf.append(text[i:j])
+            if text[j] == "\\":
+                self._escape = ""
+                i = j + 1
+                continue
+            self._quote = None
+            self._end_token("".join(buf))
+            return j + 1
+        return i
+
+    def _end_bare(self) -> None:
+        self._bare = False
+        token = "".join(self._buf)
+        self._end_token(token if self._is_key else _bare_value(token))
+
+    def _end_token(self, value: Any) -> None:
+        self._buf = []
+        if self._is_key:
+            self._keys[-1] = str(value)
+            self._phase[-1] = "colon"
+        else:
+            self._add(value)
+
+    def _attach(self, value: Any) -> Any:
+        # ใส่ค่าลงใน parent แล้วคืนค่า key/index ของค่านั้น
+        parent = self._stack[-1]
+        if isinstance(parent, dict):
+            key = self._keys[-1]
+            if key is None:
+                return None  # ค่าที่ไม่มี key ถูกข้าม
+            parent[key] = value
+            self._keys[-1] = None
+            elem = key
+        else:
+            parent.append(value)
+            elem = len(parent) - 1
+        self._phase[-1] = "after"
+        return elem
+
+    def _add(self, value: Any) -> None:
+        elem = self._attach(value)
+        if elem is not None and self.on_value is not None:
+            self.on_value(tuple(self._elems[1:]) + (elem,), value)
+
+    def _open(self, container: Any) -> None:
+        if self._stack:
+            elem = self._attach(container)
+            if elem is None:
+                container = {} if isinstance(container, dict) else []  # ไม่มี key: parse แต่ไม่เก็บ
+        else:
+            self.value = container
+            elem = None
+        self._stack.append(container)
+        self._elems.append(elem)
+        self._keys.append(None)
+        self._phase.append("key" if isinstance(container, dict) else "value")
+
+    def _close(self) -> None:
+        path = tuple(self._elems[1:])
+        container = self._stack.pop()
+        elem = self._elems.pop()
+        self._keys.pop()
+        self._phase.pop()
+        if not self._stack:
+            self.done = True
+        if self.on_value is not None and (elem is not None or self.done):
+            self.on_value(path, container)
+
+
+class DecisionStream:
+    """
+    decision ของ ReAct ที่รับทีละส่วนจาก LLM stream
+    รองรับ {"action": ..., "query": ...}, {"actions": [...]} และ array ของ action
+    - on_action(action): เรียกทันทีที่ action หนึ่งตัวมีทั้ง action และ query ครบ ขณะที่ decision
+      ยังไม่ครบ (final_answer ไม่ต้องมี query) ส่วน action ที่ครบพร้อมกับ decision ไม่ถูกแจ้ง
+      เพราะผู้เรียกรันได้ทันทีอยู่แล้ว
+    - settled: decision ครบแล้ว ข้อความที่เหลือจาก LLM ไม่จำเป็นต้องรอ
+    - decision(): dict ของ decision หลังซ่อมส่วนที่ไม่ครบ (raise ValueError ถ้าไม่ใช่ decision)
+    """
+
+    def __init__(self, on_action: Optional[Callable[[Dict[str, str]], None]] = None):
+        self.on_action = on_action
+        self.settled = False
+        self.actions: List[Dict[str, str]] = []
+        self._parser = StreamingJSONParser(on_value=self._on_value)
+
+    def feed(self, text: str) -> None:
+        self._parser.feed(text)
+
+    def decision(self) -> Dict[str, Any]:
+        value = self._parser.close()
+        if isinstance(value, list):
+            value = {"actions": value}
+        if not isinstance(value, dict):
+            raise ValueError("LLM response has no JSON decision")
+        return value
+
+    def _on_value(self, path: Path, value: Any) -> None:
+        root = self._parser.value
+        if path in (("action",), ("query",)):
+            # รูปแบบ action เดียว: ครบเมื่อมีทั้ง action และ query
+            if isinstance(root, dict) and "actions" not in root and self._complete(root):
+                self.settled = True
+                self._emit(root)
+        elif len(path) == 2 and path[0] == "actions" or len(path) == 1 and isinstance(path[0], int):
+            if isinstance(value, dict) and self._complete(value):
+                self._emit(value)
+        elif path == ("actions",) or path == ():
+            self.settled = True
+
+    @staticmethod
+    def _complete(action: Dict[str, Any]) -> bool:
+        name = action.get("action")
+        return isinstance(name, str) and (name == "final_answer" or isinstance(action.get("query"), str))
+
+    def _emit(self, action: Dict[str, Any]) -> None:
+        action = {"action": action["action"], "query": action.get("query")}
+        if action in self.actions:
+            return
+        self.actions.append(action)
+        if self.on_action is not None and not self.settled:
+            self.on_action(action)
@@ -1,10 +1,31 @@
-from langgraph_version.agent import ReActAgent, create_react_agent
-from langgraph_version.tools import all_tools, search_knowledge_base, web_search
-
-__all__ = [
-    "ReActAgent",
-    "create_react_agent",
-    "all_tools",
-    "search_knowledge_base",
-    "web_search",
-]
+"""
+LangGraph implementation of the ReAct agent.
+
+Attributes are imported on first access, so ``import langgraph_version``
+does not load LangGraph, LangChain or the search client until they are used.
+"""
+import importlib
+
+_EXPORTS = {
+    "ReActAgent": "langgraph_version.agent",
+    "create_react_agent": "langgraph_version.agent",
+    "CompactionPolicy": "langgraph_version.sessions",
+    "all_tools": "langgraph_version.tools",
+    "search_knowledge_base": "langgraph_version.tools",
+    "web_search": "langgraph_version.tools",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
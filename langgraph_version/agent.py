@@ -1,23 +1,57 @@
+import json
+import operator
 import os
 import sys
-from typing import Annotated, Sequence
+import threading
+from collections import OrderedDict
+from typing import Annotated, AsyncIterator, Dict, Iterator, List, Optional, Sequence
 from typing_extensions import TypedDict
 
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    SystemMessage,
+    HumanMessage,
+    ToolMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from constant import GOOGLE_GEMINI_API_KEY, GOOGLE_GEMINI_MODEL_NAME
+from agent_logging import AgentLogger, RunLog
+from answer_cache import AnswerCache
+import constant
+from langgraph_version.sessions import (
+    DEFAULT_SESSION_PATH,
+    CompactionPolicy,
+    create_compact_node,
+    get_checkpointer,
+    session_config,
+)
 from langgraph_version.tools import all_tools
+from llm_cache import LLMCache
+from llm_governor import LLMGovernor, estimate_tokens, get_llm_governor
+from parallel_tools import ParallelRun, arun_parallel, run_parallel
+from run_context import RunContext, activate_run, current_run
+from streaming import StreamTimings
+from tool_cache import get_tool_executor
+from tracing import Trace, current_span, record_llm_usage, span, start_trace
 
 
 # Define the state schema
 class AgentState(TypedDict):
     """State schema for the ReAct agent."""
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    # Wall-clock seconds saved by running tool calls in parallel instead of serially
+    tool_time_saved: Annotated[float, operator.add]
+    # Summary of earlier session turns removed by compaction (sessions only)
+    summary: str
 
 
 # System prompt for the agent
@@ -36,40 +70,238 @@ Guidelines:
 """
 
 
-def create_react_agent():
-    """Create and return a compiled ReAct agent graph."""
+def _cache_key_messages(messages: Sequence[BaseMessage]) -> list:
+    """
+    Reduce messages to the fields that affect the LLM output.
+
+    Message and tool-call ids are generated per run, so they are left out
+    to let identical conversations share a cache entry.
+    """
+    key = []
+    for m in messages:
+        entry = {"type": m.type, "content": m.content}
+        tool_calls = getattr(m, "tool_calls", None)
+        if tool_calls:
+            entry["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in tool_calls]
+        key.append(entry)
+    return key
+
+
+class _TokenTracker(BaseCallbackHandler):
+    """Callback that records whether an LLM call has streamed any token."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.emitted = False
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.emitted = True
+
+
+def _track_tokens(config: RunnableConfig) -> tuple:
+    """
+    Add a _TokenTracker to the callbacks inherited by an LLM call inside a node.
+
+    Under stream_mode="messages" the chat model streams tokens to the caller
+    through these callbacks, so once one was emitted a retry would repeat it.
+
+    Returns:
+        (config for the LLM call, tracker)
+    """
+    tracker = _TokenTracker()
+    callbacks = config.get("callbacks")
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(tracker, inherit=True)
+    else:
+        callbacks = list(callbacks or []) + [tracker]
+    return {"callbacks": callbacks}, tracker
+
+
+def create_tools_node(
+    tools: list,
+    max_parallel_tools: int = 4,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+) -> RunnableLambda:
+    """
+    Create a node that runs all tool calls of the last AI message in parallel.
+
+    Replaces ToolNode so that the number of concurrent tools and the
+    per-tool timeouts match the original agent's act_many().
+
+    Args:
+        tools: Tools available to the agent
+        max_parallel_tools: Maximum number of tool calls of one step running at once
+        tool_timeouts: Per-tool timeouts in seconds (None = DEFAULT_TOOL_TIMEOUTS)
+    """
+    tools_by_name = {t.name: t for t in tools}
+
+    def unknown_tool(name: str):
+        raise ValueError(f"Unknown tool: {name}")
+
+    def to_update(tool_calls: List[dict], parallel: ParallelRun) -> dict:
+        messages = []
+        for tc, result in zip(tool_calls, parallel.results):
+            if result.error is None:
+                messages.append(ToolMessage(content=str(result.value), tool_call_id=tc["id"], name=tc["name"]))
+            else:
+                messages.append(ToolMessage(
+                    content=f"Error: {result.error}", tool_call_id=tc["id"], name=tc["name"], status="error"
+                ))
+        return {"messages": messages, "tool_time_saved": parallel.time_saved}
+
+    def call_tools(state: AgentState) -> dict:
+        tool_calls = state["messages"][-1].tool_calls
+        calls = []
+        for tc in tool_calls:
+            tool = tools_by_name.get(tc["name"])
+            if tool is None:
+                calls.append((tc["name"], lambda name=tc["name"]: unknown_tool(name)))
+            else:
+                calls.append((tc["name"], lambda tool=tool, args=tc["args"]: tool.invoke(args)))
+        with span("tools", "act", actions=[tc["name"] for tc in tool_calls]):
+            return to_update(tool_calls, run_parallel(calls, get_tool_executor(), tool_timeouts, max_parallel_tools))
+
+    async def acall_tools(state: AgentState) -> dict:
+        tool_calls = state["messages"][-1].tool_calls
+
+        async def missing(name: str):
+            unknown_tool(name)
+
+        calls = []
+        for tc in tool_calls:
+            tool = tools_by_name.get(tc["name"])
+            if tool is None:
+                calls.append((tc["name"], lambda name=tc["name"]: missing(name)))
+            else:
+                calls.append((tc["name"], lambda tool=tool, args=tc["args"]: tool.ainvoke(args)))
+        with span("tools", "act", actions=[tc["name"] for tc in tool_calls]):
+            return to_update(tool_calls, await arun_parallel(calls, max_parallel_tools, tool_timeouts))
+
+    return RunnableLambda(call_tools, afunc=acall_tools)
+
+
+def create_react_agent(
+    llm_cache: Optional[LLMCache] = None,
+    max_parallel_tools: int = 4,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+    llm: Optional[BaseChatModel] = None,
+    checkpointer=None,
+    compaction: Optional[CompactionPolicy] = None,
+    llm_governor: Optional[LLMGovernor] = None,
+):
+    """
+    Create and return a compiled ReAct agent graph.
+
+    Args:
+        llm_cache: Optional LLMCache used to reuse responses of the assistant node
+        max_parallel_tools: Maximum number of tool calls from one AI message run at once
+        tool_timeouts: Per-tool timeouts in seconds (None = DEFAULT_TOOL_TIMEOUTS)
+        llm: Chat model to use instead of Gemini (e.g. the stand-in from benchmarks/)
+        checkpointer: LangGraph checkpointer that persists state per thread_id (sessions)
+        compaction: If set, a "compact" node trims the history before each turn
+        llm_governor: Rate limiter / retry policy / circuit breaker for LLM calls
+            (None = the process-wide one, see llm_governor.py)
+    """
+    temperature = 0.2
 
     # Initialize the LLM with tools
-    llm = ChatGoogleGenerativeAI(
-        model=GOOGLE_GEMINI_MODEL_NAME,
-        google_api_key=GOOGLE_GEMINI_API_KEY,
-        temperature=0.2,
-    )
+    if llm is None:
+        llm = get_chat_model(temperature)
 
     # Bind tools to the LLM
     llm_with_tools = llm.bind_tools(all_tools)
+    cache_config = {"temperature": temperature, "tools": [t.name for t in all_tools]}
 
-    # Define the assistant node
-    def assistant(state: AgentState) -> dict:
-        """The assistant node that calls the LLM."""
+    def prepare(state: AgentState):
+        """Build the prompt messages and look up a cached response."""
         messages = state["messages"]
 
         # Add system message if not present
         if not any(isinstance(m, SystemMessage) for m in messages):
-            messages = [SystemMessage(content=SYSTEM_PROMPT)] + list(messages)
-
-        response = llm_with_tools.invoke(messages)
+            system_prompt = SYSTEM_PROMPT
+            if state.get("summary"):
+                system_prompt += f"\nSummary of the earlier conversation:\n{state['summary']}\n"
+            messages = [SystemMessage(content=system_prompt)] + list(messages)
+
+        key = None
+        if llm_cache is not None:
+            key = LLMCache.make_key(constant.GOOGLE_GEMINI_MODEL_NAME, _cache_key_messages(messages), cache_config)
+            cached = llm_cache.get(key)
+            current_span().set(cache_hit=cached is not None)
+            if cached is not None:
+                response = messages_from_dict([json.loads(cached)])[0]
+                # Let add_messages assign a fresh id for this run
+                response.id = None
+                return messages, key, response
+        return messages, key, None
+
+    def store(key: Optional[str], response: BaseMessage) -> dict:
+        s = current_span()
+        s.set(response_chars=len(str(response.content)), tool_calls=len(getattr(response, "tool_calls", None) or []))
+        record_llm_usage(s, response)
+        if key is not None:
+            llm_cache.set(key, json.dumps(message_to_dict(response)))
         return {"messages": [response]}
 
+    # Define the assistant node
+    def llm_span(state: AgentState):
+        # Span of one LLM call, nested under the assistant node's "reason" span
+        messages = state["messages"]
+        return span(
+            constant.GOOGLE_GEMINI_MODEL_NAME, "llm",
+            messages=len(messages), prompt_chars=sum(len(str(m.content)) for m in messages),
+        )
+
+    def governor() -> LLMGovernor:
+        return llm_governor if llm_governor is not None else get_llm_governor()
+
+    def call_tokens(messages: Sequence[BaseMessage]) -> int:
+        # Estimated tokens of one call, reserved against the TPM budget
+        return estimate_tokens(sum(len(str(m.content)) for m in messages))
+
+    def assistant(state: AgentState, config: RunnableConfig) -> dict:
+        """The assistant node that calls the LLM."""
+        with span("assistant", "reason"), llm_span(state):
+            messages, key, cached = prepare(state)
+            if cached is not None:
+                return {"messages": [cached]}
+            # Retrying after part of the answer was streamed would send that part twice
+            llm_config, tracker = _track_tokens(config)
+            response = governor().call(
+                lambda: llm_with_tools.invoke(messages, llm_config),
+                tokens=call_tokens(messages), can_retry=lambda: not tracker.emitted,
+            )
+            return store(key, response)
+
+    async def aassistant(state: AgentState, config: RunnableConfig) -> dict:
+        """Async assistant node used by graph.ainvoke / graph.astream."""
+        with span("assistant", "reason"), llm_span(state):
+            messages, key, cached = prepare(state)
+            if cached is not None:
+                return {"messages": [cached]}
+            llm_config, tracker = _track_tokens(config)
+            response = await governor().acall(
+                lambda: llm_with_tools.ainvoke(messages, llm_config),
+                tokens=call_tokens(messages), can_retry=lambda: not tracker.emitted,
+            )
+            return store(key, response)
+
     # Build the graph
     builder = StateGraph(AgentState)
 
     # Add nodes
-    builder.add_node("assistant", assistant)
-    builder.add_node("tools", ToolNode(all_tools))
+    builder.add_node("assistant", RunnableLambda(assistant, afunc=aassistant))
+    builder.add_node("tools", create_tools_node(all_tools, max_parallel_tools, tool_timeouts))
 
     # Add edges
-    builder.add_edge(START, "assistant")
+    if compaction is not None:
+        builder.add_node("compact", create_compact_node(compaction))
+        builder.add_edge(START, "compact")
+        builder.add_edge("compact", "assistant")
+    else:
+        builder.add_edge(START, "assistant")
     builder.add_conditional_edges(
         "assistant",
         tools_condition,  # Routes to "tools" if tool call, else to END
@@ -77,82 +309,378 @@ def create_react_agent():
     builder.add_edge("tools", "assistant")  # Loop back after tool execution
 
     # Compile the graph
-    graph = builder.compile()
+    graph = builder.compile(checkpointer=checkpointer)
 
     return graph
 
 
-class ReActAgent:
-    """Wrapper class for the LangGraph ReAct agent."""
+# Process-wide caches so the chat model is built and the graph compiled once
+# per configuration, not once per ReActAgent
+_chat_models: Dict[tuple, BaseChatModel] = {}
+_chat_models_lock = threading.Lock()
+# Compiled graphs, least recently used first. Bounded because the key holds
+# the identity (and a reference) of per-agent objects such as llm_cache
+GRAPH_CACHE_SIZE = 32
+_graphs: "OrderedDict[tuple, tuple]" = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def get_chat_model(temperature: float = 0.2) -> BaseChatModel:
+    """
+    Return the shared Gemini chat model for this temperature, creating it on first use.
+
+    Args:
+        temperature: Sampling temperature of the model
+
+    Returns:
+        A ChatGoogleGenerativeAI instance shared by every graph in the process
+    """
+    key = (constant.GOOGLE_GEMINI_MODEL_NAME, temperature)
+    with _chat_models_lock:
+        llm = _chat_models.get(key)
+        if llm is None:
+            # Imported here: langchain_google_genai is slow to import and unused when llm is injected
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            llm = ChatGoogleGenerativeAI(
+                model=constant.GOOGLE_GEMINI_MODEL_NAME,
+                google_api_key=constant.GOOGLE_GEMINI_API_KEY,
+                temperature=temperature,
+                # A single attempt: retries and backoff are done by the LLM governor
+                max_retries=1,
+            )
+            _chat_models[key] = llm
+        return llm
+
+
+def get_react_agent_graph(
+    llm_cache: Optional[LLMCache] = None,
+    max_parallel_tools: int = 4,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+    llm: Optional[BaseChatModel] = None,
+    checkpointer=None,
+    compaction: Optional[CompactionPolicy] = None,
+    llm_governor: Optional[LLMGovernor] = None,
+):
+    """
+    Return the compiled graph for this configuration, compiling it on first use.
+
+    Compiled graphs keep no per-run state (sessions live in the checkpointer),
+    so one graph serves every agent and every concurrent run with the same
+    configuration. Takes the same arguments as create_react_agent();
+    llm_cache, llm, checkpointer and llm_governor are matched by identity.
+    Up to GRAPH_CACHE_SIZE graphs are kept; the least recently used one is
+    dropped (with its references) when a new configuration is compiled.
+    """
+    key = (
+        id(llm_cache) if llm_cache is not None else None,
+        max_parallel_tools,
+        tuple(sorted((tool_timeouts or {}).items())),
+        id(llm) if llm is not None else None,
+        id(checkpointer) if checkpointer is not None else None,
+        compaction,
+        id(llm_governor) if llm_governor is not None else None,
+    )
+    with _graphs_lock:
+        entry = _graphs.get(key)
+        if entry is not None:
+            _graphs.move_to_end(key)
+            return entry[0]
+        graph = create_react_agent(
+            llm_cache=llm_cache, max_parallel_tools=max_parallel_tools, tool_timeouts=tool_timeouts,
+            llm=llm, checkpointer=checkpointer, compaction=compaction, llm_governor=llm_governor,
+        )
+        # Keep the objects referenced while the key is cached so their ids cannot be reused
+        _graphs[key] = (graph, llm_cache, llm, checkpointer, llm_governor)
+        while len(_graphs) > GRAPH_CACHE_SIZE:
+            _graphs.popitem(last=False)
+        return graph
 
-    def __init__(self, max_steps: int = 5, enable_logging: bool = True):
-        self.graph = create_react_agent()
+
+class ReActAgent:
+    """
+    Wrapper class for the LangGraph ReAct agent.
+
+    stream_tokens() / astream_tokens() yield the final answer as the LLM
+    produces it; their timings are available in self.timings.
+
+    Per-query state lives in a RunContext (see run_context.py) and the
+    compiled graph is shared process-wide (get_react_agent_graph), so one
+    instance can serve many threads or tasks at once. self.timings and
+    self.last_trace refer to the current (or latest) query of the calling
+    thread/task, falling back to the last query finished by the instance.
+
+    Every query is traced (run -> reason/act -> llm/tool spans, one
+    reason/act pair per graph step). The last trace is kept in
+    self.last_trace and appended to trace_path as JSONL when it is set.
+
+    Logging goes through agent_logging: records are queued to a background
+    writer (rotating JSONL segments in data/debug) filtered by log_level and
+    sampled per query with log_sample_rate, so it never blocks a query.
+
+    Passing session_id to run()/arun()/stream_tokens()/astream_tokens()
+    continues a multi-turn conversation checkpointed in session_path
+    (SQLite), so sessions survive restarts. The history is compacted before
+    each turn according to compaction (see sessions.py).
+
+    With an answer_cache, a repeated or near-duplicate one-off question is
+    answered from the cache without running the graph (see answer_cache.py).
+    Session turns bypass the cache since they depend on the earlier turns.
+
+    LLM calls go through llm_governor (rate limits, retries with backoff and
+    a circuit breaker, see llm_governor.py). When the LLM stays unavailable,
+    the query raises LLMUnavailableError instead of returning an answer.
+    """
+
+    def __init__(
+        self,
+        max_steps: int = 5,
+        enable_logging: bool = True,
+        llm_cache: Optional[LLMCache] = None,
+        max_parallel_tools: int = 4,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        trace_path: Optional[str] = None,
+        llm: Optional[BaseChatModel] = None,
+        log_level: str = "info",
+        log_sample_rate: float = 1.0,
+        session_path: str = DEFAULT_SESSION_PATH,
+        compaction: Optional[CompactionPolicy] = CompactionPolicy(),
+        answer_cache: Optional[AnswerCache] = None,
+        llm_governor: Optional[LLMGovernor] = None,
+    ):
+        self._graph_options = {
+            "llm_cache": llm_cache, "max_parallel_tools": max_parallel_tools, "tool_timeouts": tool_timeouts, "llm": llm,
+            "llm_governor": llm_governor,
+        }
+        self.graph = get_react_agent_graph(**self._graph_options)
+        self.session_path = session_path
+        self.compaction = compaction
+        self._session_graph = None
+        self.llm_cache = llm_cache
+        self.answer_cache = answer_cache
+        self.llm_governor = llm_governor
         self.max_steps = max_steps
         self.enable_logging = enable_logging
-
-    def run(self, user_input: str) -> str:
-        """
-        Run the agent with the given user input.
-
-        Args:
-            user_input: The user's question or request
-
-        Returns:
-            The agent's final response as a string
-        """
+        self.trace_path = trace_path
+        self.logger = AgentLogger("langgraph", level=log_level, sample_rate=log_sample_rate)
+        # Last finished query, used when the caller's context has no query of this agent
+        self.last_run = RunContext(owner=self, log=self.logger.start_run())
+
+    @property
+    def run_context(self) -> RunContext:
+        return current_run(self) or self.last_run
+
+    @property
+    def timings(self) -> StreamTimings:
+        return self.run_context.timings
+
+    @property
+    def governor(self) -> LLMGovernor:
+        """The LLM governor used by this agent's graphs."""
+        return self.llm_governor if self.llm_governor is not None else get_llm_governor()
+
+    @property
+    def last_trace(self) -> Optional[Trace]:
+        return self.run_context.trace
+
+    def _start_run(self, user_input: str, trace: Trace) -> RunContext:
+        # The agent may be shared by concurrent queries, so each one gets its own RunContext
+        ctx = RunContext(owner=self, question=user_input, log=self.logger.start_run(), trace=trace)
+        activate_run(ctx)
         if self.enable_logging:
-            print(f"\n{'='*50}")
-            print(f"User Query: {user_input}")
-            print(f"{'='*50}\n")
+            ctx.log.log(f"\n{'='*50}\nUser Query: {user_input}\n{'='*50}\n", question=user_input)
+        return ctx
 
+    @staticmethod
+    def _initial_state(user_input: str) -> dict:
         # Create initial state with user message
-        initial_state = {
+        return {
             "messages": [HumanMessage(content=user_input)]
         }
 
-        # Run the graph with recursion limit
+    def _run_config(self) -> dict:
         # Each step = assistant -> tools -> assistant, so multiply by 2
-        final_state = self.graph.invoke(
-            initial_state,
-            {"recursion_limit": self.max_steps * 2 + 1}
-        )
+        return {"recursion_limit": self.max_steps * 2 + 1}
+
+    @property
+    def session_graph(self):
+        """Graph with the SQLite checkpointer and history compaction (built on first session query)."""
+        if self._session_graph is None:
+            self._session_graph = get_react_agent_graph(
+                **self._graph_options, checkpointer=get_checkpointer(self.session_path), compaction=self.compaction
+            )
+        return self._session_graph
+
+    def _graph_and_config(self, session_id: Optional[str]):
+        # Stateless graph for one-off queries, checkpointed graph for sessions
+        config = self._run_config()
+        if session_id is None:
+            return self.graph, config
+        if self.compaction is not None:
+            config["recursion_limit"] += 1  # the compact node runs once per turn
+        config.update(session_config(session_id))
+        return self.session_graph, config
+
+    def session_state(self, session_id: str) -> dict:
+        """
+        Return the checkpointed state of a session.
 
-        # Extract the final response
-        messages = final_state["messages"]
+        Args:
+            session_id: The session to read
 
+        Returns:
+            The state values ("messages", "summary", ...); empty for an unknown session
+        """
+        return self.session_graph.get_state(session_config(session_id)).values
+
+    def delete_session(self, session_id: str) -> None:
+        """Delete every checkpoint of a session."""
+        get_checkpointer(self.session_path).delete_thread(session_id)
+
+    def _cached_answer(self, ctx: RunContext, session_id: Optional[str]) -> Optional[str]:
+        """Return the cached answer of a one-off question, or None to run the graph."""
+        if self.answer_cache is None or session_id is not None:
+            return None
+        ctx.kb_version = self.answer_cache.version()
+        with span("answer_cache", "cache") as s:
+            hit = self.answer_cache.lookup(ctx.question)
+            s.set(cache_hit=hit is not None)
+            if hit is None:
+                return None
+            s.set(similarity=round(hit.similarity, 4))
+
+        timings = ctx.timings
+        timings.start_generation()
+        timings.token()
+        timings.finish()
+        if self.enable_logging:
+            ctx.log.log(
+                f"Answer cache hit (similarity {hit.similarity:.2f}, cached question: {hit.question})",
+                similarity=round(hit.similarity, 4),
+            )
+        return hit.answer
+
+    def _remember_answer(self, ctx: RunContext, session_id: Optional[str], final_state: Optional[dict]) -> None:
+        # Only a final AI message is an answer; the fallback text of _extract_answer is not cached.
+        # An answer built from a knowledge base that was re-indexed during the run is dropped.
+        if self.answer_cache is None or session_id is not None or not final_state:
+            return
+        last = final_state["messages"][-1]
+        if isinstance(last, AIMessage) and last.content and not last.tool_calls:
+            self.answer_cache.store(ctx.question, self._content_text(last.content), version=ctx.kb_version)
+
+    def _log_state(self, run_log: RunLog, final_state: dict) -> None:
         if self.enable_logging:
-            print("\n--- Message History ---")
+            messages = final_state["messages"]
+            run_log.log("\n--- Message History ---")
             for msg in messages:
                 msg_type = type(msg).__name__
                 content = getattr(msg, 'content', str(msg))
                 if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    print(f"[{msg_type}] Tool calls: {[tc['name'] for tc in msg.tool_calls]}")
+                    names = [tc['name'] for tc in msg.tool_calls]
+                    run_log.log(f"[{msg_type}] Tool calls: {names}", message_type=msg_type, tool_calls=names)
                 else:
                     preview = content[:200] + "..." if len(content) > 200 else content
-                    print(f"[{msg_type}] {preview}")
-            print("-" * 30)
-
+                    run_log.log(f"[{msg_type}] {preview}", message_type=msg_type)
+            time_saved = final_state.get("tool_time_saved") or 0.0
+            if time_saved:
+                run_log.log(f"Parallel tool time saved: {time_saved:.2f}s", tool_time_saved=time_saved)
+            run_log.log("-" * 30)
+
+    @staticmethod
+    def _content_text(content) -> str:
+        # Handle case where content is a list of dicts (Gemini format)
+        if isinstance(content, list):
+            text_parts = []
+            for part in content:
+                if isinstance(part, dict) and 'text' in part:
+                    text_parts.append(part['text'])
+                elif isinstance(part, str):
+                    text_parts.append(part)
+            return '\n'.join(text_parts) if text_parts else str(content)
+        return content
+
+    @classmethod
+    def _extract_answer(cls, messages: Sequence[BaseMessage]) -> str:
         # Return the last AI message content
         for msg in reversed(messages):
             if hasattr(msg, 'content') and msg.content:
                 # Skip messages that have tool calls (intermediate steps)
                 if hasattr(msg, 'tool_calls') and msg.tool_calls:
                     continue
-
-                content = msg.content
-                # Handle case where content is a list of dicts (Gemini format)
-                if isinstance(content, list):
-                    text_parts = []
-                    for part in content:
-                        if isinstance(part, dict) and 'text' in part:
-                            text_parts.append(part['text'])
-                        elif isinstance(part, str):
-                            text_parts.append(part)
-                    return '\n'.join(text_parts) if text_parts else str(content)
-                return content
+                return cls._content_text(msg.content)
 
         return "Unable to generate a response."
 
+    @classmethod
+    def _answer_chunk_text(cls, chunk: BaseMessage, metadata: dict) -> str:
+        """Return the answer text of a streamed message chunk ("" for anything else)."""
+        if metadata.get("langgraph_node") != "assistant" or not isinstance(chunk, AIMessage):
+            return ""
+        # Chunks of tool-calling turns are intermediate steps, not the answer
+        if chunk.tool_calls or getattr(chunk, "tool_call_chunks", None):
+            return ""
+        if not chunk.content:
+            return ""
+        return cls._content_text(chunk.content)
+
+    def run(self, user_input: str, session_id: Optional[str] = None) -> str:
+        """
+        Run the agent with the given user input.
+
+        Args:
+            user_input: The user's question or request
+            session_id: Continue this session (None = a one-off query without history)
+
+        Returns:
+            The agent's final response as a string
+        """
+        # Run the graph with recursion limit
+        graph, config = self._graph_and_config(session_id)
+        with start_trace("langgraph.run", self.trace_path, question=user_input, session_id=session_id) as trace:
+            ctx = self._start_run(user_input, trace)
+            try:
+                answer = self._cached_answer(ctx, session_id)
+                if answer is not None:
+                    return answer
+                final_state = graph.invoke(self._initial_state(user_input), config)
+            finally:
+                self.last_run = ctx
+            self._log_state(ctx.log, final_state)
+            self._remember_answer(ctx, session_id, final_state)
+
+        # Extract the final response
+        return self._extract_answer(final_state["messages"])
+
+    async def arun(self, user_input: str, session_id: Optional[str] = None) -> str:
+        """
+        Async version of run() using graph.ainvoke.
+
+        The LLM is called with ainvoke and tools run on the shared tool
+        executor, so one event loop can drive many concurrent runs.
+
+        Args:
+            user_input: The user's question or request
+            session_id: Continue this session (None = a one-off query without history)
+
+        Returns:
+            The agent's final response as a string
+        """
+        graph, config = self._graph_and_config(session_id)
+        with start_trace("langgraph.arun", self.trace_path, question=user_input, session_id=session_id) as trace:
+            ctx = self._start_run(user_input, trace)
+            try:
+                answer = self._cached_answer(ctx, session_id)
+                if answer is not None:
+                    return answer
+                final_state = await graph.ainvoke(self._initial_state(user_input), config)
+            finally:
+                self.last_run = ctx
+            self._log_state(ctx.log, final_state)
+            self._remember_answer(ctx, session_id, final_state)
+
+        return self._extract_answer(final_state["messages"])
+
     def stream(self, user_input: str):
         """
         Stream the agent execution for real-time updates.
@@ -169,3 +697,101 @@ class ReActAgent:
 
         for state in self.graph.stream(initial_state):
             yield state
+
+    def stream_tokens(self, user_input: str, session_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream the final answer token by token.
+
+        Uses LangGraph's message-level stream mode, so the answer is yielded
+        while the LLM is still generating it. Chunks belonging to tool-calling
+        turns are skipped. An answer that was not streamed (e.g. an error
+        message) is yielded whole once the graph finishes.
+
+        Args:
+            user_input: The user's question or request
+            session_id: Continue this session (None = a one-off query without history)
+
+        Yields:
+            Text chunks of the final answer
+        """
+        final_state = None
+        graph, config = self._graph_and_config(session_id)
+        with start_trace("langgraph.stream_tokens", self.trace_path, question=user_input, session_id=session_id) as trace:
+            ctx = self._start_run(user_input, trace)
+            timings, run_log = ctx.timings, ctx.log
+            answer = self._cached_answer(ctx, session_id)
+            if answer is not None:
+                yield answer
+            else:
+                streamed = False
+                for mode, payload in graph.stream(
+                    self._initial_state(user_input), config, stream_mode=["messages", "values"]
+                ):
+                    if mode == "values":
+                        # A new superstep finished; the next assistant call may produce the answer
+                        final_state = payload
+                        timings.start_generation()
+                        continue
+                    text = self._answer_chunk_text(*payload)
+                    if text:
+                        streamed = True
+                        timings.token()
+                        yield text
+                if not streamed and final_state is not None:
+                    # The answer was not streamed (e.g. an error message): yield it whole
+                    timings.token()
+                    yield self._extract_answer(final_state["messages"])
+                self._remember_answer(ctx, session_id, final_state)
+            timings.finish()
+            current_span().set(**timings.as_dict())
+            if final_state is not None:
+                self._log_state(run_log, final_state)
+            if self.enable_logging:
+                run_log.log(f"Timing: {timings.report()}", **timings.as_dict())
+        self.last_run = ctx
+
+    async def astream_tokens(self, user_input: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async version of stream_tokens() using graph.astream.
+
+        Args:
+            user_input: The user's question or request
+            session_id: Continue this session (None = a one-off query without history)
+
+        Yields:
+            Text chunks of the final answer
+        """
+        final_state = None
+        graph, config = self._graph_and_config(session_id)
+        with start_trace("langgraph.astream_tokens", self.trace_path, question=user_input, session_id=session_id) as trace:
+            ctx = self._start_run(user_input, trace)
+            timings, run_log = ctx.timings, ctx.log
+            answer = self._cached_answer(ctx, session_id)
+            if answer is not None:
+                yield answer
+            else:
+                streamed = False
+                async for mode, payload in graph.astream(
+                    self._initial_state(user_input), config, stream_mode=["messages", "values"]
+                ):
+                    if mode == "values":
+                        final_state = payload
+                        timings.start_generation()
+                        continue
+                    text = self._answer_chunk_text(*payload)
+                    if text:
+                        streamed = True
+                        timings.token()
+                        yield text
+                if not streamed and final_state is not None:
+                    # The answer was not streamed (e.g. an error message): yield it whole
+                    timings.token()
+                    yield self._extract_answer(final_state["messages"])
+                self._remember_answer(ctx, session_id, final_state)
+            timings.finish()
+            current_span().set(**timings.as_dict())
+            if final_state is not None:
+                self._log_state(run_log, final_state)
+            if self.enable_logging:
+                run_log.log(f"Timing: {timings.report()}", **timings.as_dict())
+        self.last_run = ctx
@@ -1,20 +1,33 @@
+import argparse
 import sys
 import os
+import uuid
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langgraph_version.agent import ReActAgent
+from answer_cache import AnswerCache
+from batch import add_batch_arguments, run_batch
+from server import AgentBackend, add_serve_arguments, run_server, server_options
 
+# Agent reused by run_single_query (the compiled graph holds no per-run state)
+_default_agent = None
 
-def main():
+
+def interactive(session_id=None):
     """
-    Main entry point for the LangGraph ReAct Agent.
+    Interactive loop for the LangGraph ReAct Agent.
+
+    Every query continues one session, so follow-up questions see the
+    earlier turns. A new session is started unless session_id is given.
     """
     # Create the agent
     agent = ReActAgent(enable_logging=True)
+    session_id = session_id or uuid.uuid4().hex[:12]
 
     # Interactive loop
     print("LangGraph ReAct Agent")
+    print(f"Session: {session_id} (resume with --session {session_id})")
     print("Type 'quit' or 'exit' to stop\n")
 
     while True:
@@ -28,13 +41,17 @@ def main():
             if not user_query:
                 continue
 
-            # Run the agent
-            answer = agent.run(user_query)
-
-            print(f"\n{'='*50}")
-            print("Final Answer:")
-            print(f"{'='*50}")
-            print(answer)
+            # Run the agent, printing the answer as it is generated
+            for i, text in enumerate(agent.stream_tokens(user_query, session_id=session_id)):
+                if i == 0:
+                    # Let queued log lines print before the answer
+                    agent.logger.flush()
+                    print(f"\n{'='*50}")
+                    print("Final Answer:")
+                    print(f"{'='*50}")
+                print(text, end="", flush=True)
+            agent.logger.flush()
+            print(f"\n\n({agent.timings.report()})")
             print()
 
         except KeyboardInterrupt:
@@ -44,13 +61,73 @@ def main():
             print(f"Error: {e}")
 
 
+def batch(args):
+    """
+    Answer questions from a JSONL file with bounded concurrency.
+
+    All workers share one agent: the compiled graph keeps no per-run state.
+    """
+    agent = ReActAgent(enable_logging=False)
+    summary = run_batch(
+        args.input,
+        args.output,
+        make_runner=lambda: agent.run,
+        concurrency=args.concurrency,
+        resume=args.resume,
+    )
+    print(summary.report())
+
+
+def serve(args):
+    """
+    Answer queries over HTTP (see server.py) with one agent shared by all workers.
+
+    With --fake-llm the offline stand-ins from benchmarks/ replace Gemini
+    and web search, so the server can be load-tested without an API key.
+    """
+    llm = None
+    if args.fake_llm:
+        from benchmarks.fakes import FakeChatModel, install_fake_search
+        install_fake_search()
+        llm = FakeChatModel(latency=args.llm_latency_ms / 1000)
+    answer_cache = AnswerCache() if args.answer_cache else None
+    agent = ReActAgent(enable_logging=False, llm=llm, answer_cache=answer_cache)
+    backend = AgentBackend(
+        run=lambda question, session_id: agent.run(question, session_id=session_id),
+        stream=lambda question, session_id: agent.stream_tokens(question, session_id=session_id),
+        metrics=lambda: agent.governor.stats(),
+    )
+    run_server(backend, **server_options(args))
+
+
+def main():
+    """
+    Main entry point for the LangGraph ReAct Agent.
+    """
+    parser = argparse.ArgumentParser(description="LangGraph ReAct Agent")
+    parser.add_argument("--session", metavar="ID", help="continue a saved conversation (default: start a new one)")
+    subparsers = parser.add_subparsers(dest="command")
+    add_batch_arguments(subparsers.add_parser("batch", help="answer questions from a JSONL file"))
+    add_serve_arguments(subparsers.add_parser("serve", help="answer questions over HTTP"))
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        batch(args)
+    elif args.command == "serve":
+        serve(args)
+    else:
+        interactive(args.session)
+
+
 def run_single_query(query: str) -> str:
     """
     Run a single query and return the answer.
     Useful for testing or programmatic use.
     """
-    agent = ReActAgent(enable_logging=False)
-    return agent.run(query)
+    global _default_agent
+    if _default_agent is None:
+        _default_agent = ReActAgent(enable_logging=False)
+    return _default_agent.run(query)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""
+Multi-turn sessions for the LangGraph agent.
+
+- Conversation state is checkpointed to SQLite (one thread per session id),
+  so a session can be resumed after the process restarts.
+- Before each turn, a compaction node keeps the prompt size roughly
+  constant: earlier turns beyond a sliding window are removed from the
+  state and folded into a short extractive summary, and bulky tool outputs
+  of earlier turns that are still in the window are truncated.
+"""
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from tool_cache import run_in_tool_executor
+
+DEFAULT_SESSION_PATH = os.path.join("data", "sessions", "checkpoints.sqlite")
+
+TRUNCATED_MARKER = " ...[truncated]"
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """
+    How much conversation history is kept in a session.
+
+    Args:
+        max_turns: Most recent turns kept verbatim, the current one included
+        max_tool_chars: Tool outputs of earlier turns are cut to this many characters
+        max_summary_chars: Size limit of the summary of removed turns (oldest lines go first)
+        max_summary_line_chars: Size limit of the summary line of one removed turn
+    """
+    max_turns: int = 3
+    max_tool_chars: int = 400
+    max_summary_chars: int = 1500
+    max_summary_line_chars: int = 300
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return str(content)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: max(limit - 3, 0)] + "..."
+
+
+def summarize_turn(messages: Sequence[BaseMessage], limit: int) -> str:
+    """Return one summary line (question and final answer) for the messages of a turn."""
+    question = next((_text(m.content) for m in messages if isinstance(m, HumanMessage)), "")
+    answer = ""
+    for m in reversed(messages):
+        if isinstance(m, AIMessage) and m.content and not m.tool_calls:
+            answer = _text(m.content)
+            break
+    return _clip(f"- User asked: {question} | Answer: {answer}", limit)
+
+
+def _merge_summary(summary: str, lines: List[str], limit: int) -> str:
+    merged = [line for line in summary.splitlines() if line] + lines
+    while merged and sum(len(line) + 1 for line in merged) > limit:
+        merged.pop(0)
+    return "\n".join(merged)
+
+
+def compact_history(messages: Sequence[BaseMessage], summary: str, policy: CompactionPolicy) -> Dict[str, Any]:
+    """
+    Compute the state update that compacts a session's messages.
+
+    A turn starts at a HumanMessage; the last turn is the one being answered
+    and is never changed.
+
+    Args:
+        messages: Messages in the session state
+        summary: Current summary of removed turns
+        policy: Compaction limits
+
+    Returns:
+        A state update ({"messages": [...], "summary": ...}), empty if nothing changes
+    """
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(starts) <= 1:
+        return {}
+
+    update: Dict[str, Any] = {}
+    removals: List[BaseMessage] = []
+
+    # Sliding window: remove whole turns older than max_turns and summarize them
+    keep_from = starts[-policy.max_turns] if len(starts) > policy.max_turns > 0 else starts[0]
+    if keep_from > 0:
+        bounds = [i for i in starts if i < keep_from] + [keep_from]
+        lines = [
+            summarize_turn(messages[a:b], policy.max_summary_line_chars)
+            for a, b in zip(bounds, bounds[1:])
+        ]
+        update["summary"] = _merge_summary(summary, lines, policy.max_summary_chars)
+        removals = [RemoveMessage(id=m.id) for m in messages[:keep_from]]
+
+    # Truncate bulky tool outputs of earlier turns (same id replaces the message)
+    truncated = []
+    for m in messages[keep_from:starts[-1]]:
+        if not isinstance(m, ToolMessage):
+            continue
+        content = _text(m.content)
+        if len(content) > policy.max_tool_chars and not content.endswith(TRUNCATED_MARKER):
+            truncated.append(m.model_copy(update={"content": content[: policy.max_tool_chars] + TRUNCATED_MARKER}))
+
+    if removals or truncated:
+        update["messages"] = removals + truncated
+    return update
+
+
+def create_compact_node(policy: CompactionPolicy):
+    """Return a graph node that applies compact_history to the session state."""
+
+    def compact(state: dict) -> dict:
+        return compact_history(state["messages"], state.get("summary") or "", policy)
+
+    return compact
+
+
+def _sqlite_saver_class():
+    # Imported on first use: the SQLite checkpointer is only needed for sessions
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """
+        SqliteSaver whose async methods run the sync ones on the tool executor.
+
+        SQLite calls are short, so this lets graph.ainvoke / graph.astream use
+        the same checkpoint file without a second (aiosqlite) connection.
+        """
+
+        async def aget_tuple(self, config):
+            return await run_in_tool_executor(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[Any]:
+            items = await run_in_tool_executor(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await run_in_tool_executor(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await run_in_tool_executor(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await run_in_tool_executor(self.delete_thread, thread_id)
+
+    return ThreadedSqliteSaver
+
+
+_checkpointers: Dict[str, Any] = {}
+_checkpointers_lock = threading.Lock()
+
+
+def get_checkpointer(path: str = DEFAULT_SESSION_PATH):
+    """
+    Return the process-wide SQLite checkpointer for this file, opening it on first use.
+
+    Args:
+        path: SQLite file that stores the sessions (created if missing)
+    """
+    path = os.path.abspath(path)
+    with _checkpointers_lock:
+        saver = _checkpointers.get(path)
+        if saver is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # The saver serializes access with its own lock, so one connection is shared by all threads
+            conn = sqlite3.connect(path, check_same_thread=False)
+            saver = _sqlite_saver_class()(conn)
+            _checkpointers[path] = saver
+        return saver
+
+
+def session_config(session_id: str) -> Dict[str, Dict[str, str]]:
+    """Return the graph config that selects a session's checkpoint thread."""
+    return {"configurable": {"thread_id": session_id}}
+
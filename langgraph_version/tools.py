@@ -1,14 +1,32 @@
-from langchain_core.tools import tool
-from duckduckgo_search import DDGS
+from langchain_core.tools import StructuredTool
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from rag import rag_search_context
+from rag import rag_search_compact
+from tool_cache import ClientPool, run_in_tool_executor, tool_cache
 
+def _new_ddgs():
+    # Deferred so importing the tools does not load the search client
+    from duckduckgo_search import DDGS
 
-@tool
-def search_knowledge_base(query: str) -> str:
+    return DDGS()
+
+
+# Reuse one DDGS client per thread instead of opening a new session per call
+ddgs_pool = ClientPool(_new_ddgs)
+
+
+def _ddgs_text_search(query: str, max_results: int) -> list:
+    """Run a DDGS text search on a pooled client, dropping the client on failure."""
+    try:
+        return list(ddgs_pool.get().text(query, max_results=max_results))
+    except Exception:
+        ddgs_pool.reset()
+        raise
+
+
+def _search_knowledge_base(query: str, mode: str = "bm25") -> str:
     """
     Search the internal knowledge base (RAG system) for relevant information.
     Use this tool when you need to find information from company documents,
@@ -16,11 +34,15 @@ def search_knowledge_base(query: str) -> str:
 
     Args:
         query: The search query or keywords to find relevant documents
+        mode: "bm25" for keyword matching (default), or "tfidf" for fuzzy
+            matching when the exact wording in the documents is unknown
 
     Returns:
-        A string containing the relevant documents found
+        The most relevant passages of the matching documents, with their titles
     """
-    docs = rag_search_context(query, top_k=2)
+    # Only the best passages of each section (within the RAG_PASSAGE_CHAR_BUDGET
+    # character budget) go into the tool message, not whole sections
+    docs = tool_cache.get_or_call("search_passages", rag_search_compact, query, top_k=2, mode=mode)
 
     if docs:
         results = []
@@ -31,8 +53,7 @@ def search_knowledge_base(query: str) -> str:
         return "No relevant information found in the internal knowledge base."
 
 
-@tool
-def web_search(query: str) -> str:
+def _web_search(query: str) -> str:
     """
     Search the internet using DuckDuckGo for current/external information.
     Use this tool when you need real-time information, news, or data
@@ -45,8 +66,7 @@ def web_search(query: str) -> str:
         A string containing the search results from the web
     """
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=3))
+        results = tool_cache.get_or_call("web_search", _ddgs_text_search, query, max_results=3)
 
         if not results:
             return "No relevant information found on the web."
@@ -63,5 +83,29 @@ def web_search(query: str) -> str:
         return f"Error during web search: {e}"
 
 
+async def _asearch_knowledge_base(query: str, mode: str = "bm25") -> str:
+    """Async version of search_knowledge_base; runs on the shared tool executor."""
+    return await run_in_tool_executor(_search_knowledge_base, query, mode)
+
+
+async def _aweb_search(query: str) -> str:
+    """Async version of web_search; runs on the shared tool executor."""
+    return await run_in_tool_executor(_web_search, query)
+
+
+# Tools expose both a sync and an async implementation, so the graph can
+# run them with either invoke() or ainvoke() without blocking the event loop
+search_knowledge_base = StructuredTool.from_function(
+    func=_search_knowledge_base,
+    coroutine=_asearch_knowledge_base,
+    name="search_knowledge_base",
+)
+web_search = StructuredTool.from_function(
+    func=_web_search,
+    coroutine=_aweb_search,
+    name="web_search",
+)
+
 # List of all tools for the agent
 all_tools = [search_knowledge_base, web_search]
+
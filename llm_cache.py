@@ -0,0 +1,133 @@
+# llm_cache.py
+"""
+Cache สำหรับผลลัพธ์ของ LLM ใช้ร่วมกันทั้ง react_agent และ langgraph_version
+
+- key คือ SHA-256 ของ (model name, prompt/messages, generation config)
+- ชั้นที่ 1: LRU ในหน่วยความจำของ process
+- ชั้นที่ 2: SQLite บนดิสก์ (ใช้ร่วมกันข้าม process และอยู่รอดหลัง restart)
+- ทุกรายการมี TTL และมีตัวนับ hit/miss สำหรับติดตามประสิทธิภาพ
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = "data/cache/llm_cache.sqlite3"
+
+
+class LLMCache:
+    """
+    Cache 2 ชั้น (LRU + SQLite) สำหรับข้อความตอบกลับของ LLM
+    - path: ไฟล์ SQLite (None = ใช้เฉพาะ LRU ในหน่วยความจำ)
+    - max_entries: จำนวนรายการสูงสุดใน LRU
+    - ttl_seconds: อายุของแต่ละรายการ (None = ไม่หมดอายุ)
+    """
+
+    # ลบรายการที่หมดอายุออกจาก SQLite ทุกๆ จำนวนครั้งของการเขียนนี้
+    PURGE_EVERY = 256
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 24 * 3600,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(model: str, prompt: Any, config: Optional[Dict[str, Any]] = None) -> str:
+        """สร้าง cache key จาก model name, prompt (string หรือ list ของ message) และ generation config"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "config": config or {}},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """คืนค่าที่ cache ไว้ หรือ None ถ้าไม่พบ/หมดอายุ"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """บันทึกค่าลง cache ทั้ง 2 ชั้น"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                self._writes += 1
+                if self.ttl_seconds is not None and self._writes % self.PURGE_EVERY == 0:
+                    self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+    def _remember(self, key: str, created_at: float, value: str) -> None:
+        # เก็บใน LRU และตัดรายการที่เก่าที่สุดเมื่อเกินขนาด
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """ลบทุกรายการใน cache"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, float]:
+        """ตัวนับ hit/miss ของ cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._memory),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,481 @@
+# llm_governor.py
+"""
+ตัวควบคุมการเรียก LLM (Gemini) ที่ใช้ร่วมกันทั้ง react_agent และ langgraph_version
+
+ทุกการเรียกผ่าน LLMGovernor.call() / acall() ซึ่งทำตามลำดับ:
+1. circuit breaker: ถ้า LLM ล่มต่อเนื่อง (error แบบ unavailable ครบ failure_threshold ครั้ง)
+   จะปฏิเสธทันทีด้วย CircuitOpenError เป็นเวลา reset_seconds แล้วจึงให้ลองหนึ่งครั้ง (half-open)
+2. concurrency cap: เรียกพร้อมกันไม่เกิน max_concurrency
+3. token bucket: จำกัดจำนวน request ต่อนาที (rpm) และ token ต่อนาที (tpm)
+   จอง token ตามค่าประมาณก่อนเรียก แล้วปรับตาม usage จริงหลังได้คำตอบ
+4. retry: error แบบ throttled (429) และ unavailable (5xx, timeout, connection) ถูกลองใหม่
+   ด้วย exponential backoff แบบ full jitter หรือรอตาม retry-after ที่ server แนะนำ
+   (throttled จะหยุดทุกการเรียกของ governor จนพ้นเวลานั้น)
+   เมื่อลองครบแล้วยังไม่สำเร็จจะ raise LLMUnavailableError แทนการคืนค่าที่ผิด
+error อื่น (เช่น request ไม่ถูกต้อง) ถูก raise ต่อทันทีโดยไม่ลองใหม่
+ตัวนับทั้งหมดอ่านได้จาก stats()
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import random
+import re
+import threading
+import time
+
+from tracing import current_span
+
+# จำนวน token ของคำตอบที่ใช้ประมาณเมื่อไม่ทราบ max_output_tokens
+DEFAULT_OUTPUT_TOKENS = 1024
+
+# ชื่อ class ของ exception (จาก google.api_core, google.genai, httpx, ...) ตามประเภท
+_THROTTLED_NAMES = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+_UNAVAILABLE_NAMES = {
+    "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+    "ServerError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError",
+}
+_THROTTLED_TEXT = re.compile(r"\b429\b|rate.?limit|quota|resource.?exhausted", re.IGNORECASE)
+_UNAVAILABLE_TEXT = re.compile(r"\b50[0234]\b|unavailable|overloaded|deadline.?exceeded|timed? ?out", re.IGNORECASE)
+# "Please retry in 12.5s" หรือ retry_delay { seconds: 12 }
+_RETRY_TEXT = re.compile(
+    r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry(?:[ _]?delay)?\D{0,24}?(\d+(?:\.\d+)?)\s*s", re.IGNORECASE
+)
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    เรียก LLM ไม่สำเร็จหลังลองใหม่ครบ หรือ circuit breaker เปิดอยู่
+    - retry_after: วินาทีที่ควรรอก่อนลองใหม่ (None = ไม่ทราบ)
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """circuit breaker เปิดอยู่ จึงไม่เรียก LLM (fail fast)"""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for value in (getattr(exc, "code", None), getattr(exc, "status_code", None),
+                  getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """
+    ประเภทของ error จากการเรียก LLM
+    คืนค่า "throttled" (เกินโควตา), "unavailable" (ชั่วคราว) หรือ None (ไม่ควรลองใหม่)
+    """
+    status = _status_code(exc)
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if status == 429 or names & _THROTTLED_NAMES:
+        return "throttled"
+    if (status is not None and status >= 500) or names & _UNAVAILABLE_NAMES:
+        return "unavailable"
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return "unavailable"
+    if status is None:
+        text = str(exc)
+        if _THROTTLED_TEXT.search(text):
+            return "throttled"
+        if _UNAVAILABLE_TEXT.search(text):
+            return "unavailable"
+    return None
+
+
+def retry_after_hint(exc: BaseException) -> Optional[float]:
+    """วินาทีที่ server แนะนำให้รอ (header Retry-After, attribute หรือข้อความของ error)"""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is not None:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        match = _RETRY_TEXT.search(str(exc))
+        value = (match.group(1) or match.group(2)) if match else None
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """จำนวน token ทั้งหมดที่ใช้จริงจาก response (Gemini SDK หรือ LangChain message)"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None
+    if isinstance(usage, dict):
+        total = usage.get("total_tokens") or (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+    else:
+        total = getattr(usage, "total_token_count", None) or (
+            (getattr(usage, "prompt_token_count", None) or 0) + (getattr(usage, "candidates_token_count", None) or 0)
+        )
+    return total or None
+
+
+def estimate_tokens(prompt_chars: int, max_output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """ประมาณ token ของการเรียกหนึ่งครั้ง (ประมาณ 4 ตัวอักษรต่อ token + คำตอบสูงสุด)"""
+    return prompt_chars // 4 + max_output_tokens
+
+
+class TokenBucket:
+    """
+    token bucket แบบจองล่วงหน้า: reserve() หัก token ทันที (ติดลบได้) และคืนเวลาที่ต้องรอ
+    ผู้เรียกจึงรอนอก lock ได้ทั้งแบบ thread (time.sleep) และ async (asyncio.sleep)
+    - per_minute: โควตาต่อนาที
+    - burst_seconds: ขนาด bucket เป็นจำนวนวินาทีของโควตา (ใช้ได้ทันทีเมื่อว่าง)
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """จอง amount token (ไม่เกินขนาด bucket) คืนค่าวินาทีที่ต้องรอก่อนใช้ได้"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= min(amount, self.capacity)
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def adjust(self, delta: float) -> None:
+        """คืน token (delta > 0) หรือหักเพิ่ม (delta < 0) เมื่อทราบการใช้จริง"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + delta)
+
+
+class CircuitBreaker:
+    """
+    circuit breaker 3 สถานะ: closed → open (เมื่อล้มเหลวติดกัน failure_threshold ครั้ง)
+    → half_open (หลัง reset_seconds ให้ลองหนึ่งครั้ง) → closed เมื่อสำเร็จ / open เมื่อล้มเหลว
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.opens = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """อนุญาตให้เรียกหรือไม่ (ใน half_open อนุญาตครั้งเดียวจนกว่าจะทราบผล)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def retry_after(self) -> float:
+        """วินาทีจนกว่าจะให้ลองอีกครั้ง (0 ถ้าไม่ได้เปิดอยู่)"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(self.reset_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+
+class LLMGovernor:
+    """
+    ควบคุมอัตรา, concurrency, retry และ circuit breaker ของการเรียก LLM
+    - rpm / tpm: โควตา request และ token ต่อนาที (None = ไม่จำกัด)
+    - max_concurrency: จำนวนการเรียกพร้อมกันสูงสุด (None = ไม่จำกัด)
+    - max_retries: จำนวนครั้งที่ลองใหม่ต่อการเรียก
+    - base_delay / max_delay: ช่วงของ exponential backoff (full jitter)
+    - max_retry_after: retry-after ที่ยอมรอได้มากที่สุด (นานกว่านี้ถือว่าไม่พร้อมใช้งาน)
+    - failure_threshold / reset_seconds: ค่าของ circuit breaker
+    - burst_seconds: ขนาดของ token bucket เป็นวินาทีของโควตา
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        max_retry_after: float = 60.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        burst_seconds: float = 10.0,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._requests = TokenBucket(rpm, burst_seconds) if rpm else None
+        self._tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = dict.fromkeys(
+            ("calls", "succeeded", "failed", "retries", "throttled", "unavailable", "rejected_open",
+             "in_flight", "rate_wait_s", "slot_wait_s", "backoff_s", "tokens_used"),
+            0,
+        )
+
+    # -------------------------
+    # การเรียก
+    # -------------------------
+    def call(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        usage: Callable[[Any], Optional[int]] = usage_tokens,
+        can_retry: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """
+        เรียก fn() ภายใต้การควบคุมของ governor และคืนค่าผลลัพธ์
+        - tokens: จำนวน token ที่ประมาณไว้ (ดู estimate_tokens)
+        - usage: ฟังก์ชันอ่าน token ที่ใช้จริงจากผลลัพธ์ (None = ใช้ค่าประมาณ)
+        - can_retry: ถ้าคืนค่า False จะไม่ลองใหม่ (เช่น stream ส่งข้อความบางส่วนไปแล้ว)
+        """
+        attempt = 0
+        waited = 0.0
+        while True:
+            self._admit()
+            waited += self._sleep(self._pause_remaining())
+            waited += self._acquire_slot()
+            try:
+                waited += self._sleep(self._reserve(tokens), "rate_wait_s")
+                try:
+                    result = fn()
+                except Exception as e:
+                    delay = self._failed(e, attempt, can_retry)
+                    if delay is None:
+                        raise
+                else:
+                    self._succeeded(result, tokens, usage, attempt, waited)
+                    return result
+            finally:
+                self._release_slot()
+            waited += self._sleep(delay, "backoff_s")
+            attempt += 1
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        usage: Callable[[Any], Optional[int]] = usage_tokens,
+        can_retry: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """call() แบบ async: fn() คืนค่า awaitable และการรอทั้งหมดไม่ block event loop"""
+        import asyncio
+
+        attempt = 0
+        waited = 0.0
+        while True:
+            self._admit()
+            pause = self._pause_remaining()
+            if pause:
+                await asyncio.sleep(pause)
+                waited += pause
+            waited += await self._aacquire_slot()
+            try:
+                delay = self._reserve(tokens)
+                if delay:
+                    self._count("rate_wait_s", delay)
+                    await asyncio.sleep(delay)
+                    waited += delay
+                try:
+                    result = await fn()
+                except Exception as e:
+                    delay = self._failed(e, attempt, can_retry)
+                    if delay is None:
+                        raise
+                else:
+                    self._succeeded(result, tokens, usage, attempt, waited)
+                    return result
+            finally:
+                self._release_slot()
+            self._count("backoff_s", delay)
+            await asyncio.sleep(delay)
+            waited += delay
+            attempt += 1
+
+    def stats(self) -> Dict[str, float]:
+        """ตัวนับของ governor และสถานะของ circuit breaker"""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opens"] = self.breaker.opens
+        stats["paused_s"] = round(self._pause_remaining(), 3)
+        for key in ("rate_wait_s", "slot_wait_s", "backoff_s"):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def _sleep(self, seconds: float, counter: Optional[str] = None) -> float:
+        if seconds > 0:
+            if counter:
+                self._count(counter, seconds)
+            time.sleep(seconds)
+        return seconds
+
+    def _admit(self) -> None:
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            retry_after = self.breaker.retry_after()
+            raise CircuitOpenError(f"LLM circuit breaker is open, retry in {retry_after:.1f}s", retry_after)
+
+    def _pause_remaining(self) -> float:
+        return max(self._paused_until - time.monotonic(), 0.0)
+
+    def _acquire_slot(self) -> float:
+        if self._slots is None:
+            self._count("in_flight")
+            return 0.0
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._counters["in_flight"] += 1
+            self._counters["slot_wait_s"] += waited
+        return waited
+
+    async def _aacquire_slot(self) -> float:
+        import asyncio
+
+        if self._slots is None:
+            self._count("in_flight")
+            return 0.0
+        # ใช้ semaphore เดียวกับแบบ thread จึงรอด้วยการ poll แทนการ block event loop
+        start = time.perf_counter()
+        delay = 0.001
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._counters["in_flight"] += 1
+            self._counters["slot_wait_s"] += waited
+        return waited
+
+    def _release_slot(self) -> None:
+        self._count("in_flight", -1)
+        if self._slots is not None:
+            self._slots.release()
+
+    def _reserve(self, tokens: int) -> float:
+        self._count("calls")
+        wait = self._requests.reserve(1) if self._requests is not None else 0.0
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+
+    def _succeeded(self, result: Any, tokens: int, usage, attempt: int, waited: float) -> None:
+        self.breaker.success()
+        used = usage(result) if usage is not None else None
+        if used is not None and self._tokens is not None and tokens:
+            self._tokens.adjust(tokens - used)
+        with self._lock:
+            self._counters["succeeded"] += 1
+            self._counters["tokens_used"] += used or tokens
+        if attempt or waited:
+            current_span().set(llm_retries=attempt, governor_wait_s=round(waited, 4))
+
+    def _failed(self, exc: Exception, attempt: int, can_retry: Optional[Callable[[], bool]]) -> Optional[float]:
+        """บันทึกความล้มเหลว คืนค่าเวลาที่รอก่อนลองใหม่ หรือ None ถ้าควร raise error เดิม"""
+        kind = classify_error(exc)
+        if kind is None:
+            # LLM ตอบกลับได้ (เช่น request ไม่ถูกต้อง) จึงไม่นับเป็นความล้มเหลวของ breaker
+            self.breaker.success()
+            self._count("failed")
+            return None
+
+        hint = retry_after_hint(exc)
+        self._count(kind)
+        if kind == "throttled":
+            # LLM ตอบกลับได้ (เกินโควตาเท่านั้น) จึงไม่นับเป็นความล้มเหลวของ breaker
+            self.breaker.success()
+            if hint:
+                # หยุดทุกการเรียกจนพ้นเวลาที่ server แนะนำ
+                with self._lock:
+                    self._paused_until = max(self._paused_until, time.monotonic() + min(hint, self.max_retry_after))
+        else:
+            self.breaker.failure()
+
+        if attempt >= self.max_retries or (can_retry is not None and not can_retry()) \
+                or (hint is not None and hint > self.max_retry_after):
+            self._count("failed")
+            raise LLMUnavailableError(
+                f"LLM call failed after {attempt + 1} attempt(s) ({kind}): {type(exc).__name__}: {exc}",
+                hint if hint is not None else self.breaker.retry_after() or None,
+            ) from exc
+
+        self._count("retries")
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if hint is not None:
+            # รอตามที่ server แนะนำ บวก jitter เล็กน้อยเพื่อไม่ให้ทุก request กลับมาพร้อมกัน
+            return hint + random.uniform(0, self.base_delay)
+        return backoff
+
+
+def _env_number(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+_governor: Optional[LLMGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_llm_governor() -> LLMGovernor:
+    """
+    governor ที่ใช้ร่วมกันทั้ง process (สร้างเมื่อเรียกครั้งแรก)
+    โควตาอ่านจาก constant: GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY (ไม่กำหนด = ไม่จำกัด)
+    """
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                import constant
+
+                concurrency = _env_number(constant.GEMINI_MAX_CONCURRENCY)
+                _governor = LLMGovernor(
+                    rpm=_env_number(constant.GEMINI_RPM),
+                    tpm=_env_number(constant.GEMINI_TPM),
+                    max_concurrency=int(concurrency) if concurrency else None,
+                )
+    return _governor
@@ -1,6 +1,10 @@
 from react_agent import ReActAgent
+from answer_cache import AnswerCache
+from batch import add_batch_arguments, run_batch
+from server import AgentBackend, add_serve_arguments, run_server, server_options
+import argparse
 
-def main():
+def interactive():
     """
     ตัวรันหลักของ ReAct Agent
     - สร้าง Agent instance
@@ -13,12 +17,74 @@ def main():
     # 2️⃣ รับ input จากผู้ใช้ (ตัวอย่าง)
     user_query = input("Query: ")
 
-    # 3️⃣ เรียก Agent.run() → ได้ Final Answer
-    final_answer = agent.run(user_query)
+    # 3️⃣ เรียก Agent.run() → แสดง Final Answer ทีละส่วนทันทีที่ Gemini สร้าง
+    def print_token(text: str):
+        # timings.chunks ถูกนับก่อนเรียก callback จึงเป็น 1 เมื่อได้ส่วนแรก
+        if agent.timings.chunks == 1:
+            # ให้ log ที่ค้างอยู่ใน queue แสดงก่อนคำตอบ
+            agent.logger.flush()
+            print("\n=== Final Answer ===")
+        print(text, end="", flush=True)
+
+    answer = agent.run(user_query, on_token=print_token)
+    agent.logger.flush()
+    # คำตอบที่ไม่ได้ stream (เช่นข้อความแจ้งข้อผิดพลาด) แสดงทั้งก้อน
+    if agent.timings.chunks == 0:
+        print("\n=== Final Answer ===")
+        print(answer, end="")
+
+    # 4️⃣ แสดงเวลา (TTFT = เวลาที่ผู้ใช้รอจนเห็นคำตอบส่วนแรก)
+    print(f"\n\n({agent.timings.report()})")
+
+def batch(args):
+    """
+    รันคำถามจากไฟล์ JSONL แบบ batch
+    - ทุก worker thread ใช้ agent ตัวเดียวกัน (state ของแต่ละ run อยู่ใน RunContext)
+    """
+    agent = ReActAgent(enable_logging=False)
+    summary = run_batch(
+        args.input,
+        args.output,
+        make_runner=lambda: agent.run,
+        concurrency=args.concurrency,
+        resume=args.resume,
+    )
+    print(summary.report())
+
+def serve(args):
+    """
+    รับคำถามผ่าน HTTP (ดู server.py)
+    - ทุก worker ใช้ agent ตัวเดียวกัน
+    - --fake-llm ใช้ FakeGemini และ web search จำลองจาก benchmarks/ (ทดสอบได้โดยไม่ต้องมี API key)
+    """
+    llm_client = None
+    if args.fake_llm:
+        from benchmarks.fakes import FakeGemini, install_fake_search
+        install_fake_search()
+        llm_client = FakeGemini(latency=args.llm_latency_ms / 1000)
+    answer_cache = AnswerCache() if args.answer_cache else None
+    agent = ReActAgent(enable_logging=False, llm_client=llm_client, answer_cache=answer_cache)
+    # agent เวอร์ชันนี้ไม่มี session จึงไม่ใช้ session_id
+    backend = AgentBackend(
+        run=lambda question, session_id: agent.run(question),
+        stream=lambda question, session_id: agent.stream(question),
+        metrics=lambda: agent.governor.stats(),
+    )
+    run_server(backend, **server_options(args))
+
+def main():
+    parser = argparse.ArgumentParser(description="ReAct Agent (original version)")
+    subparsers = parser.add_subparsers(dest="command")
+    add_batch_arguments(subparsers.add_parser("batch", help="answer questions from a JSONL file"))
+    add_serve_arguments(subparsers.add_parser("serve", help="answer questions over HTTP"))
+    args = parser.parse_args()
 
-    # 4️⃣ แสดงผล
-    print("\n=== Final Answer ===")
-    print(final_answer)
+    if args.command == "batch":
+        batch(args)
+    elif args.command == "serve":
+        serve(args)
+    else:
+        interactive()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
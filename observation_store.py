@@ -0,0 +1,104 @@
+# observation_store.py
+"""
+ที่เก็บ observations ของ ReActAgent แบบ incremental และจำกัดขนาด
+
+- แต่ละ observation ถูก clean (ลบ HTML tags, รวมช่องว่าง) เพียงครั้งเดียวตอน append
+- เก็บข้อความรวมที่ normalize แล้วไว้ ทำให้การสร้าง prompt แต่ละ step ไม่ต้องประมวลผลซ้ำ
+- เมื่อขนาดรวมเกิน budget จะตัด observation ที่มีค่าน้อยออก:
+  - "recency": ตัดตัวที่เก่าที่สุดก่อน
+  - "relevance": ตัดตัวที่มีคำซ้ำกับคำถามน้อยที่สุดก่อน (ถ้าเท่ากันตัดตัวที่เก่ากว่า)
+  observation ล่าสุดจะไม่ถูกตัดทิ้ง แต่จะถูกตัดความยาวให้พอดี budget
+"""
+from typing import Iterator, List, Optional, Set
+import re
+
+# ประมาณจำนวนตัวอักษรต่อ token สำหรับแปลง token budget เป็น character budget
+CHARS_PER_TOKEN = 4
+
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+OBSERVATION_POLICIES = ("recency", "relevance")
+
+
+def clean_observation(text: str) -> str:
+    """ลบ HTML tags และช่องว่างเกินออกจาก observation"""
+    return _WHITESPACE_RE.sub(" ", _HTML_TAG_RE.sub("", text)).strip()
+
+
+class ObservationStore:
+    """
+    เก็บ observations ที่ clean แล้วพร้อมข้อความรวม
+    - max_chars: ขนาดสูงสุดของข้อความรวม (None = ไม่จำกัด)
+    - max_tokens: กำหนด budget เป็น token แทน (ประมาณ CHARS_PER_TOKEN ตัวอักษรต่อ token)
+    - policy: "recency" หรือ "relevance"
+    - question: คำถามของผู้ใช้ (ใช้กับ policy "relevance")
+    """
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        policy: str = "recency",
+        question: str = "",
+    ):
+        if policy not in OBSERVATION_POLICIES:
+            raise ValueError(f"Unknown observation policy: {policy!r} (expected one of {OBSERVATION_POLICIES})")
+        if max_tokens is not None:
+            max_chars = max_tokens * CHARS_PER_TOKEN
+        self.max_chars = max_chars
+        self.policy = policy
+        self._question_words: Set[str] = set(_WORD_RE.findall(question.lower()))
+        self._entries: List[str] = []
+        self._scores: List[int] = []
+        self._text = ""
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def _relevance(self, text: str) -> int:
+        return len(self._question_words.intersection(_WORD_RE.findall(text.lower())))
+
+    def append(self, observation: str) -> None:
+        """clean observation แล้วเพิ่มเข้าไป จากนั้นตัดส่วนที่เกิน budget"""
+        if observation == "FINAL_STEP":
+            return
+        cleaned = clean_observation(observation)
+        if not cleaned:
+            return
+
+        self._entries.append(cleaned)
+        self._scores.append(self._relevance(cleaned) if self.policy == "relevance" else 0)
+        self._text = f"{self._text} {cleaned}" if self._text else cleaned
+
+        if self.max_chars is not None and len(self._text) > self.max_chars:
+            self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        # ความยาวรวม = ผลรวมความยาวแต่ละตัว + ช่องว่างคั่น
+        total = len(self._text)
+        while total > self.max_chars and len(self._entries) > 1:
+            # ไม่พิจารณาตัวล่าสุด; recency ตัดตัวแรก, relevance ตัดตัวที่คะแนนต่ำสุด (เก่ากว่าก่อน)
+            if self.policy == "relevance":
+                victim = min(range(len(self._entries) - 1), key=lambda i: (self._scores[i], i))
+            else:
+                victim = 0
+            total -= len(self._entries[victim]) + 1
+            del self._entries[victim]
+            del self._scores[victim]
+            self.dropped += 1
+
+        if total > self.max_chars:
+            # เหลือ observation เดียวที่ยาวเกิน budget: ตัดความยาว
+            self._entries[-1] = self._entries[-1][:self.max_chars]
+
+        self._text = " ".join(self._entries)
+
+    def text(self) -> str:
+        """ข้อความรวมของ observations ทั้งหมด (normalize แล้ว)"""
+        return self._text
@@ -0,0 +1,256 @@
+# parallel_tools.py
+"""
+รัน tool หลายตัวพร้อมกันภายใน step เดียว ใช้ร่วมกันทั้ง react_agent และ langgraph_version
+
+- run_parallel: รันบน thread pool กลางของ process โดยจำกัดจำนวน tool ที่รันพร้อมกันต่อ step
+  พร้อม timeout ต่อ tool (tool ที่ค้างเกิน timeout ไม่กันที่ของ tool อื่น)
+  timeout นับจากตอนที่ tool เริ่มรันจริง ไม่นับเวลาที่รอคิวใน pool
+  tool ที่รอคิวนานเกิน timeout จะถูกยกเลิกและได้ ToolNotStartedError แทน ToolTimeoutError
+- arun_parallel: เวอร์ชัน async (จำกัด concurrency ด้วย semaphore)
+- ParallelRun.time_saved: เวลาที่ประหยัดได้เทียบกับการรันทีละตัว (ผลรวมเวลาแต่ละ tool - เวลาจริง)
+- แต่ละ tool ถูกบันทึกเป็น span ประเภท "tool" ใต้ span ปัจจุบัน (ดู tracing.py)
+- submit_call / astart_call: เริ่ม tool ล่วงหน้า (เช่นระหว่างที่ LLM ยังสร้าง decision อยู่)
+  แล้วส่ง future ที่ได้ให้ run_parallel / arun_parallel แทนฟังก์ชัน
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import contextvars
+import threading
+import time
+
+from tracing import span
+
+# timeout (วินาที) ต่อ tool (ชื่อของทั้ง 2 implementation)
+DEFAULT_TOOL_TIMEOUTS: Dict[str, float] = {
+    "search_context": 10.0,
+    "search_knowledge_base": 10.0,
+    "web_search": 20.0,
+}
+DEFAULT_TIMEOUT = 30.0
+
+
+class ToolTimeoutError(TimeoutError):
+    """tool ทำงานเกิน timeout ที่กำหนด"""
+
+
+class ToolNotStartedError(TimeoutError):
+    """tool รอคิวใน thread pool นานเกิน timeout จนถูกยกเลิกโดยยังไม่ได้เริ่มรัน"""
+
+
+@dataclass
+class ToolCallResult:
+    """ผลลัพธ์ของการเรียก tool หนึ่งครั้ง (value หรือ error อย่างใดอย่างหนึ่ง)"""
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class ParallelRun:
+    """ผลลัพธ์ของการรัน tool หลายตัวพร้อมกัน เรียงตามลำดับที่ส่งเข้ามา"""
+    results: List[ToolCallResult] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def serial_seconds(self) -> float:
+        return sum(r.seconds for r in self.results)
+
+    @property
+    def time_saved(self) -> float:
+        return max(self.serial_seconds - self.wall_seconds, 0.0)
+
+
+def _timeout_for(name: str, timeouts: Optional[Dict[str, float]]) -> float:
+    table = DEFAULT_TOOL_TIMEOUTS if timeouts is None else timeouts
+    return table.get(name, DEFAULT_TIMEOUT)
+
+
+def _timeout_error(name: str, timeout: float) -> ToolTimeoutError:
+    return ToolTimeoutError(f"{name} timed out after {timeout:g}s")
+
+
+def _not_started_error(name: str, timeout: float) -> ToolNotStartedError:
+    return ToolNotStartedError(f"{name} did not start within {timeout:g}s (tool pool busy)")
+
+
+class _CallClock:
+    """เวลาที่ส่ง call เข้า pool และเวลาที่เริ่มรันจริง (ใช้ lock กัน race ระหว่างเริ่มรันกับการยกเลิก)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+        self._abandoned = False
+
+    def begin(self) -> bool:
+        """เรียกจาก worker ตอนเริ่มรัน คืนค่า False ถ้าผู้รอยกเลิก call นี้ไปแล้ว"""
+        with self._lock:
+            if self._abandoned:
+                return False
+            self.started = time.perf_counter()
+            return True
+
+    def give_up(self) -> bool:
+        """ยกเลิก call ที่ยังไม่เริ่มรัน คืนค่า False ถ้า call เริ่มรันไปแล้ว"""
+        with self._lock:
+            if self.started is not None:
+                return False
+            self._abandoned = True
+            return True
+
+
+def _timed(name: str, fn: Callable[[], Any], clock: Optional[_CallClock] = None) -> ToolCallResult:
+    if clock is not None and not clock.begin():
+        return ToolCallResult(name, error=_not_started_error(name, 0))
+    start = time.perf_counter()
+    with span(name, "tool") as s:
+        try:
+            return ToolCallResult(name, value=fn(), seconds=time.perf_counter() - start)
+        except Exception as e:
+            s.set(error=f"{type(e).__name__}: {e}")
+            return ToolCallResult(name, error=e, seconds=time.perf_counter() - start)
+
+
+def submit_call(executor: ThreadPoolExecutor, name: str, fn: Callable[[], Any]) -> "Future[ToolCallResult]":
+    """เริ่ม tool หนึ่งตัวบน executor ทันที (span อยู่ใต้ span ของผู้เรียก) คืนค่า Future ของ ToolCallResult"""
+    clock = _CallClock()
+    future = executor.submit(contextvars.copy_context().run, _timed, name, fn, clock)
+    future.tool_clock = clock
+    return future
+
+
+@dataclass
+class _Pending:
+    # call ที่ run_parallel กำลังรอผล
+    index: int
+    name: str
+    clock: Optional[_CallClock]
+    began: float  # ใช้แทน clock กับ Future ที่ไม่ได้มาจาก submit_call
+    timeout: float
+    counted: bool  # นับใน max_concurrency (Future ที่เริ่มไว้ก่อนไม่นับ)
+
+    @property
+    def started(self) -> Optional[float]:
+        return self.began if self.clock is None else self.clock.started
+
+    @property
+    def deadline(self) -> float:
+        # ยังไม่เริ่มรัน: รอคิวได้ไม่เกิน timeout นับจากตอนส่ง / เริ่มแล้ว: timeout นับจากตอนเริ่ม
+        started = self.started
+        return (self.clock.submitted if started is None else started) + self.timeout
+
+
+def run_parallel(
+    calls: List[Tuple[str, Any]],
+    executor: ThreadPoolExecutor,
+    timeouts: Optional[Dict[str, float]] = None,
+    max_concurrency: Optional[int] = None,
+) -> ParallelRun:
+    """
+    รัน tool หลายตัวพร้อมกันบน executor
+    - calls: list ของ (ชื่อ tool, ฟังก์ชันไม่มี argument หรือ Future จาก submit_call)
+    - executor: thread pool กลางของ process (เช่น tool_cache.get_tool_executor) ควรมี worker มากพอ
+      ที่ thread ของ tool ที่ค้างจะไม่ทำให้ tool ของ run อื่นต้องรอ
+    - timeouts: timeout ต่อชื่อ tool (None = DEFAULT_TOOL_TIMEOUTS)
+    - max_concurrency: จำนวน call ของครั้งนี้ที่รันพร้อมกันได้ (None = ทั้งหมด) call ที่เหลือรอจนมีที่ว่าง
+    tool ที่เกิน timeout (นับจากตอนเริ่มรัน) จะได้ ToolTimeoutError (thread ยังทำงานต่อในพื้นหลัง
+    แต่ผลลัพธ์ถูกทิ้ง) และคืนที่ให้ call ถัดไปทันที tool ที่รอคิวใน pool นานเกิน timeout
+    จะถูกยกเลิกและได้ ToolNotStartedError tool เดียวก็รันบน executor เพื่อให้มี timeout เดียวกัน
+    """
+    start = time.perf_counter()
+    results: List[Optional[ToolCallResult]] = [None] * len(calls)
+    active: Dict[Future, _Pending] = {}
+    waiting = deque()
+    for i, (name, fn) in enumerate(calls):
+        if isinstance(fn, Future):
+            active[fn] = _Pending(i, name, getattr(fn, "tool_clock", None), start, _timeout_for(name, timeouts), counted=False)
+        else:
+            waiting.append(i)
+    limit = max_concurrency or len(calls)
+    running = 0
+
+    def submit_waiting() -> None:
+        nonlocal running
+        while waiting and running < limit:
+            i = waiting.popleft()
+            name, fn = calls[i]
+            # copy context ต่อ call เพื่อให้ span ของ tool อยู่ใต้ span ของผู้เรียก
+            future = submit_call(executor, name, fn)
+            active[future] = _Pending(i, name, future.tool_clock, 0.0, _timeout_for(name, timeouts), counted=True)
+            running += 1
+
+    submit_waiting()
+    while active:
+        next_deadline = min(pending.deadline for pending in active.values())
+        done, _ = wait(active, timeout=max(next_deadline - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+        now = time.perf_counter()
+        for future, pending in list(active.items()):
+            if future in done:
+                results[pending.index] = future.result()
+            elif now < pending.deadline:
+                continue
+            elif pending.started is None:
+                if not pending.clock.give_up():
+                    continue  # เพิ่งเริ่มรันระหว่างที่กำลังจะยกเลิก: รอต่อด้วย deadline ใหม่
+                future.cancel()
+                error = _not_started_error(pending.name, pending.timeout)
+                results[pending.index] = ToolCallResult(pending.name, error=error)
+            else:
+                error = _timeout_error(pending.name, pending.timeout)
+                results[pending.index] = ToolCallResult(pending.name, error=error, seconds=now - pending.started)
+            del active[future]
+            if pending.counted:
+                running -= 1
+        submit_waiting()
+    return ParallelRun(results, time.perf_counter() - start)
+
+
+async def _arun_timed(name: str, make_coro: Callable[[], Awaitable[Any]], timeout: float) -> ToolCallResult:
+    import asyncio
+
+    start = time.perf_counter()
+    with span(name, "tool") as s:
+        try:
+            value = await asyncio.wait_for(make_coro(), timeout)
+            return ToolCallResult(name, value=value, seconds=time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            s.set(error="timeout")
+            return ToolCallResult(name, error=_timeout_error(name, timeout), seconds=time.perf_counter() - start)
+        except Exception as e:
+            s.set(error=f"{type(e).__name__}: {e}")
+            return ToolCallResult(name, error=e, seconds=time.perf_counter() - start)
+
+
+def astart_call(name: str, make_coro: Callable[[], Awaitable[Any]], timeouts: Optional[Dict[str, float]] = None):
+    """เริ่ม tool หนึ่งตัวเป็น task ทันที (ต้องเรียกใน event loop) คืนค่า task ของ ToolCallResult"""
+    import asyncio
+
+    return asyncio.ensure_future(_arun_timed(name, make_coro, _timeout_for(name, timeouts)))
+
+
+async def arun_parallel(
+    calls: List[Tuple[str, Any]],
+    max_concurrency: int,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> ParallelRun:
+    """
+    เวอร์ชัน async ของ run_parallel
+    - calls: list ของ (ชื่อ tool, ฟังก์ชันที่คืนค่า coroutine หรือ task จาก astart_call)
+    - max_concurrency: จำนวน tool สูงสุดที่รันพร้อมกัน (ไม่นับ task ที่เริ่มไว้แล้ว)
+    """
+    import asyncio  # ทำงานใน event loop อยู่แล้ว จึงไม่ต้อง import ตอนโหลด module
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(name: str, make_coro: Any) -> ToolCallResult:
+        if isinstance(make_coro, asyncio.Future):
+            return await make_coro
+        async with semaphore:
+            return await _arun_timed(name, make_coro, _timeout_for(name, timeouts))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(name, make_coro) for name, make_coro in calls))
+    return ParallelRun(list(results), time.perf_counter() - start)
@@ -1,79 +1,589 @@
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Iterable, Iterator, NamedTuple, Tuple, Optional, TYPE_CHECKING
+from collections import Counter
+import heapq
+import math
+import os
 import re
+import threading
+
+from rag_ingest import iter_sections
+
+if TYPE_CHECKING:
+    from rag_store import DocumentStore
+
+# ไฟล์ knowledge base เริ่มต้นของ Mock RAG
+RAG_DOCUMENT_PATH = "data/mock_rag_document.md"
+
+# pattern สำหรับแยก token (ตัวอักษร/ตัวเลข ต่อเนื่องกัน)
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def rag_tokenize(text: str) -> List[str]:
+    """
+    แยกข้อความเป็น token ตัวพิมพ์เล็ก
+    - text: ข้อความที่ต้องการแยก
+    คืนค่าเป็น list ของ token ตามลำดับที่ปรากฏ
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
 def rag_load_context(file_path: str) -> List[Dict[str, str]]:
     """
     อ่านไฟล์ Markdown และแยกเป็น sections
     แต่ละ section จะคืนค่าเป็น dict {'title': ..., 'content': ...}
     Assumption: แต่ละ section เริ่มด้วย ## และข้อมูลแยกด้วย ---
+    (สำหรับไฟล์/โฟลเดอร์จำนวนมากให้ใช้ rag_ingest.ingest_documents)
     """
-    documents = []
-    current_doc = None
+    return list(iter_sections(file_path))
 
-    with open(file_path, 'r', encoding='utf-8-sig') as f:
-        for line in f:
-            line = line.strip()
-            
-            # ข้าม header หลัก "# Knowledge Base"
-            if line.startswith("# "):
-                continue
-                
-            # เริ่ม section ใหม่ที่ขึ้นต้นด้วย ##
-            if line.startswith("## "):
-                if current_doc:
-                    # ล้าง --- ออกจากท้าย content
-                    current_doc["content"] = current_doc["content"].strip()
-                    documents.append(current_doc)
-                
-                title = line[3:].strip()  # เอา "## " ออก
-                current_doc = {"title": title, "content": ""}
-            
-            # ข้ามเส้น separator ---
-            elif line == "---":
+
+def bm25_idf(n_docs: int, df: int) -> float:
+    """IDF แบบ BM25 (+1 เพื่อไม่ให้ติดลบสำหรับ term ที่พบบ่อย)"""
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+class CorpusStats(NamedTuple):
+    """
+    สถิติของ corpus ที่ BM25 ใช้: จำนวนเอกสาร ความยาวเฉลี่ย และ document frequency ของแต่ละ term
+    ใช้ให้ index ที่มีเอกสารเพียงบางส่วน (shard) ให้คะแนนเท่ากับ index ที่มีเอกสารทั้งหมด
+    """
+    n_docs: int
+    avgdl: float
+    df: Dict[str, int]
+
+    @classmethod
+    def combine(cls, parts: Iterable["CorpusStats"]) -> "CorpusStats":
+        """รวมสถิติของหลาย index ที่มีเอกสารไม่ซ้ำกัน"""
+        n_docs, length, df = 0, 0.0, Counter()
+        for part in parts:
+            n_docs += part.n_docs
+            length += part.n_docs * part.avgdl
+            df.update(part.df)
+        return cls(n_docs, (length / n_docs) if n_docs else 0.0, dict(df))
+
+
+class BM25Scorer:
+    """
+    ส่วนให้คะแนน BM25 ที่ใช้ร่วมกันระหว่าง index แบบต่างๆ
+    subclass ต้องกำหนด n_docs, avgdl, k1, b และ implement:
+    - term_postings(term): คืนค่า iterable ของ (doc_id, tf) หรือ None ถ้าไม่มี term
+    - doc_length(doc_id), phrase_hits(doc_id, phrase), document(doc_id)
+    - document_frequencies(): dict ของ term -> df (ใช้รวมสถิติระหว่าง shard)
+    corpus_stats: ถ้ากำหนด จะใช้ n_docs, avgdl และ df จากสถิตินี้แทนของ index เอง
+    """
+
+    # title มีน้ำหนักมากกว่า content 2 เท่า (เหมือนการให้คะแนนแบบเดิม)
+    TITLE_WEIGHT = 2
+
+    n_docs: int = 0
+    avgdl: float = 0.0
+    k1: float = 1.5
+    b: float = 0.75
+    corpus_stats: Optional[CorpusStats] = None
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def term_postings(self, term: str):
+        raise NotImplementedError
+
+    def doc_length(self, doc_id: int) -> int:
+        raise NotImplementedError
+
+    def phrase_hits(self, doc_id: int, phrase: str) -> int:
+        raise NotImplementedError
+
+    def document(self, doc_id: int) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def document_frequencies(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def local_stats(self) -> CorpusStats:
+        """สถิติของเอกสารใน index นี้ (ไม่สนใจ corpus_stats)"""
+        return CorpusStats(self.n_docs, self.avgdl, self.document_frequencies())
+
+    def search_scored(self, query: str, top_k: int = 1) -> List[Tuple[float, Dict[str, str]]]:
+        """
+        ค้นหาเอกสารด้วย BM25 และคืนค่าพร้อมคะแนน
+        - query: คำค้นหา
+        - top_k: จำนวนเอกสารที่ต้องการ
+        คืนค่าเป็น list ของ (score, document) เรียงจากคะแนนมากไปน้อย
+        """
+        terms = rag_tokenize(query)
+        if not terms or top_k <= 0:
+            return []
+
+        # รวมคะแนน BM25 จาก postings ของแต่ละ term (เฉพาะเอกสารที่มี term นั้น)
+        scores: Dict[int, float] = {}
+        stats = self.corpus_stats
+        n_docs, avgdl = (self.n_docs, self.avgdl) if stats is None else (stats.n_docs, stats.avgdl)
+        k1, b = self.k1, self.b
+        for term, qtf in Counter(terms).items():
+            plist = self.term_postings(term)
+            if not plist:
                 continue
-            
-            # เพิ่มเนื้อหาถ้ามี section ปัจจุบัน และไม่ใช่บรรทัดว่าง
-            elif current_doc is not None and line:
-                current_doc["content"] += line + "\n"
+            df = len(plist) if stats is None else stats.df.get(term, len(plist))
+            idf = bm25_idf(n_docs, df)
+            for doc_id, tf in plist:
+                norm = k1 * (1 - b + b * self.doc_length(doc_id) / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (k1 + 1) / (tf + norm)
+
+        # เพิ่มคะแนนเมื่อคำค้นหาหลายคำปรากฏเป็นวลีตรงตัว (ตรวจเฉพาะเอกสารที่ติดอันดับต้นๆ)
+        if len(terms) > 1 and scores:
+            phrase = query.lower().strip()
+            pool = heapq.nlargest(max(top_k * 3, 10), scores.items(), key=lambda x: x[1])
+            for doc_id, score in pool:
+                scores[doc_id] = score + self.phrase_hits(doc_id, phrase)
+
+        # เลือก top_k ด้วย heap แทนการ sort ทั้งหมด
+        best = heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+        return [(score, self.document(doc_id)) for doc_id, score in best if score > 0]
+
+    def search(self, query: str, top_k: int = 1) -> List[Dict[str, str]]:
+        """ค้นหาเอกสารด้วย BM25 และคืนค่าเฉพาะ document"""
+        return [doc for _, doc in self.search_scored(query, top_k)]
 
-    # append last section
-    if current_doc:
-        current_doc["content"] = current_doc["content"].strip()
-        documents.append(current_doc)
+    def iter_documents(self) -> Iterator[Dict[str, str]]:
+        """วนอ่านเอกสารทั้งหมดใน index ตามลำดับ doc_id"""
+        for doc_id in range(self.n_docs):
+            yield self.document(doc_id)
 
-    return documents
 
-def rag_search_context(query: str, top_k: int = 1) -> List[Dict[str, str]]:
+class BM25Index(BM25Scorer):
+    """
+    Inverted index ในหน่วยความจำสำหรับค้นหาเอกสารด้วย BM25 (สร้างครั้งเดียวต่อ process)
+    - postings: term -> list ของ (doc_id, tf) โดย tf ของ title มีน้ำหนัก TITLE_WEIGHT เท่า
+    - titles_lower / contents_lower: title และ content ตัวพิมพ์เล็กที่คำนวณไว้ล่วงหน้า
+      ใช้เพิ่มคะแนนเมื่อคำค้นหาปรากฏเป็นวลีตรงตัว (พฤติกรรมเดิมของ rag_search_context)
+    """
+
+    def __init__(self, documents: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.titles_lower = [doc["title"].lower() for doc in self.documents]
+        self.contents_lower = [doc["content"].lower() for doc in self.documents]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+
+        # สร้าง inverted index: นับ term frequency ของแต่ละเอกสาร
+        for doc_id, doc in enumerate(self.documents):
+            tf = Counter(rag_tokenize(doc["content"]))
+            for term in rag_tokenize(doc["title"]):
+                tf[term] += self.TITLE_WEIGHT
+            for term, count in tf.items():
+                self.postings.setdefault(term, []).append((doc_id, count))
+            self.doc_lengths.append(sum(tf.values()))
+
+        self.n_docs = len(self.documents)
+        self.avgdl = (sum(self.doc_lengths) / self.n_docs) if self.n_docs else 0.0
+
+    def term_postings(self, term: str) -> Optional[List[Tuple[int, int]]]:
+        return self.postings.get(term)
+
+    def doc_length(self, doc_id: int) -> int:
+        return self.doc_lengths[doc_id]
+
+    def phrase_hits(self, doc_id: int, phrase: str) -> int:
+        hits = self.titles_lower[doc_id].count(phrase) * self.TITLE_WEIGHT
+        return hits + self.contents_lower[doc_id].count(phrase)
+
+    def document(self, doc_id: int) -> Dict[str, str]:
+        return self.documents[doc_id]
+
+    def document_frequencies(self) -> Dict[str, int]:
+        return {term: len(plist) for term, plist in self.postings.items()}
+
+    @classmethod
+    def merge(cls, parts: Iterable[Tuple["BM25Index", Iterable[int]]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        รวม index หลายตัวเป็น index เดียวจาก postings เดิม (ไม่ tokenize ใหม่)
+        - parts: list ของ (index, doc_id ที่เก็บไว้ เรียงจากน้อยไปมาก)
+        doc_id ใหม่เรียงตามลำดับของ parts แล้วตาม doc_id เดิม
+        """
+        merged = cls.__new__(cls)
+        merged.k1 = k1
+        merged.b = b
+        merged.documents = []
+        merged.titles_lower = []
+        merged.contents_lower = []
+        merged.doc_lengths = []
+        merged.postings = {}
+        for index, keep in parts:
+            remap: Dict[int, int] = {}
+            for doc_id in keep:
+                remap[doc_id] = len(merged.documents)
+                merged.documents.append(index.documents[doc_id])
+                merged.titles_lower.append(index.titles_lower[doc_id])
+                merged.contents_lower.append(index.contents_lower[doc_id])
+                merged.doc_lengths.append(index.doc_lengths[doc_id])
+            for term, plist in index.postings.items():
+                moved = [(remap[doc_id], tf) for doc_id, tf in plist if doc_id in remap]
+                if moved:
+                    merged.postings.setdefault(term, []).extend(moved)
+
+        merged.n_docs = len(merged.documents)
+        merged.avgdl = (sum(merged.doc_lengths) / merged.n_docs) if merged.n_docs else 0.0
+        return merged
+
+
+def rag_kb_path(file_path: Optional[str] = None) -> str:
+    """path ของ knowledge base ที่ใช้: file_path, env RAG_INDEX_PATH หรือ RAG_DOCUMENT_PATH ตามลำดับ"""
+    return file_path or os.getenv("RAG_INDEX_PATH") or RAG_DOCUMENT_PATH
+
+
+# index ที่ compile แล้ว (ไม่เปลี่ยน) และ knowledge base แบบ Markdown ที่ถูก watch ในแต่ละ process (key คือ path)
+_rag_indexes: Dict[str, BM25Scorer] = {}
+_rag_stores: Dict[str, "DocumentStore"] = {}
+_rag_index_lock = threading.Lock()
+# callback(path, snapshot) ที่ถูกเรียกเมื่อ knowledge base ถูก index ใหม่
+_kb_listeners: List[Callable[[str, Any], None]] = []
+
+# ช่วงเวลาเริ่มต้น (วินาที) ระหว่างการตรวจไฟล์ knowledge base (เปลี่ยนได้ด้วย env RAG_WATCH_SECONDS, 0 = ไม่ตรวจ)
+DEFAULT_WATCH_SECONDS = 2.0
+
+
+def add_kb_listener(listener: Callable[[str, Any], None]) -> None:
+    """
+    ลงทะเบียน listener(path, snapshot) ที่ถูกเรียกหลัง knowledge base แบบ Markdown ถูก index ใหม่
+    (เช่นเพื่อล้าง cache ของผลการค้นหา) listener ถูกเรียกใน thread ที่ index จึงควรทำงานเสร็จเร็ว
+    """
+    _kb_listeners.append(listener)
+
+
+def _notify_kb_listeners(path: str, snapshot: Any) -> None:
+    for listener in list(_kb_listeners):
+        listener(path, snapshot)
+
+
+def _open_kb(path: str) -> None:
+    # เปิด knowledge base ครั้งแรก (เรียกภายใต้ _rag_index_lock)
+    # import ภายในฟังก์ชันเพื่อเลี่ยง circular import กับ rag_index และ rag_store
+    from rag_index import MmapBM25Index, is_compiled_index
+    from rag_store import DocumentStore
+
+    if is_compiled_index(path):
+        _rag_indexes[path] = MmapBM25Index(path)
+        return
+    store = DocumentStore(
+        path,
+        workers=int(os.getenv("RAG_INGEST_WORKERS", "1")),
+        on_publish=lambda snapshot: _notify_kb_listeners(path, snapshot),
+    )
+    store.refresh()
+    poll_seconds = float(os.getenv("RAG_WATCH_SECONDS", DEFAULT_WATCH_SECONDS))
+    if poll_seconds > 0:
+        store.watch(poll_seconds)
+    _rag_stores[path] = store
+
+
+def get_rag_store(file_path: Optional[str] = None) -> Optional["DocumentStore"]:
+    """
+    คืนค่า rag_store.DocumentStore ของ knowledge base แบบ Markdown (โหลดครั้งแรกเมื่อเรียก)
+    หรือ None ถ้า path เป็นไฟล์ index ที่ compile แล้ว (ไม่ถูก watch)
+    - file_path: path ของ knowledge base (ค่าเริ่มต้นเหมือน get_rag_index)
+    """
+    path = rag_kb_path(file_path)
+    store = _rag_stores.get(path)
+    if store is None and path not in _rag_indexes:
+        with _rag_index_lock:
+            if path not in _rag_stores and path not in _rag_indexes:
+                _open_kb(path)
+        store = _rag_stores.get(path)
+    return store
+
+
+def get_rag_index(file_path: Optional[str] = None) -> BM25Scorer:
+    """
+    คืนค่า index ของ knowledge base
+    - file_path: path ของไฟล์ Markdown, โฟลเดอร์ของไฟล์ Markdown หรือไฟล์ index ที่ compile ด้วย rag_build.py
+      (ค่าเริ่มต้นคือ env RAG_INDEX_PATH หรือ RAG_DOCUMENT_PATH)
+    ไฟล์ index แบบ compile ถูกเปิดด้วย mmap ครั้งเดียวต่อ process จึงใช้ page cache ร่วมกันระหว่าง worker
+    Markdown ถูกโหลดเข้า rag_store.DocumentStore (โฟลเดอร์ถูก parse ด้วย process pool ขนาด env RAG_INGEST_WORKERS)
+    ที่ตรวจไฟล์ทุก RAG_WATCH_SECONDS วินาทีและ index ใหม่เฉพาะ section ที่เปลี่ยน
+    จึงคืนค่า snapshot ล่าสุด ผู้เรียกควรเรียกใหม่ทุกครั้งที่ค้นหาแทนการเก็บ index ไว้
+    """
+    path = rag_kb_path(file_path)
+    index = _rag_indexes.get(path)
+    if index is not None:
+        return index
+    store = get_rag_store(path)
+    if store is None:
+        return _rag_indexes[path]
+    return store.snapshot().sections
+
+
+# โหมดการค้นหาที่รองรับ
+# - "bm25": ค้นหาด้วย keyword (inverted index)
+# - "tfidf": hashed TF-IDF แบบ vector (NumPy) รองรับคำที่สะกดไม่ตรงทั้งหมด
+RAG_SEARCH_MODES = ("bm25", "tfidf")
+
+
+# ShardedIndex ของแต่ละ (path, env RAG_SHARDS) หรือ None เมื่อไม่ได้เปิดใช้ shard
+_sharded_indexes: Dict[Tuple[str, str], Any] = {}
+
+
+def get_sharded_index(file_path: Optional[str] = None):
+    """
+    คืนค่า rag_shard.ShardedIndex ของ knowledge base (สร้างครั้งเดียวต่อ process)
+    หรือ None ถ้าไม่ได้เปิดใช้ shard (ค้นหาใน process เดียวด้วย get_rag_index)
+    เปิดใช้เมื่อ env RAG_SHARDS > 1 หรือ path เป็นโฟลเดอร์ shard จาก rag_build.py --shards
+    """
+    path = rag_kb_path(file_path)
+    key = (path, os.getenv("RAG_SHARDS", ""))
+    if key not in _sharded_indexes:
+        with _rag_index_lock:
+            if key not in _sharded_indexes:
+                n_shards = int(key[1] or 0)
+                index = None
+                # import เฉพาะเมื่ออาจใช้ shard (rag_shard ต้องใช้ multiprocessing)
+                if n_shards > 1 or os.path.isdir(path):
+                    from rag_shard import ShardedIndex, shard_files
+
+                    if n_shards > 1 or shard_files(path):
+                        index = ShardedIndex(path, n_shards if n_shards > 1 else None)
+                _sharded_indexes[key] = index
+    return _sharded_indexes[key]
+
+
+def _get_search_index(mode: str):
+    if mode == "bm25":
+        path = rag_kb_path()
+        sharded = get_sharded_index(path)
+        return sharded if sharded is not None else get_rag_index(path)
+    if mode == "tfidf":
+        # import ภายในฟังก์ชันเพราะ rag_vector ต้องใช้ NumPy (optional dependency)
+        from rag_vector import get_vector_index
+
+        return get_vector_index()
+    raise ValueError(f"Unknown search mode: {mode!r} (expected one of {RAG_SEARCH_MODES})")
+
+
+def rag_search_context(query: str, top_k: int = 1, mode: str = "bm25") -> List[Dict[str, str]]:
     """
     ค้นหา context จาก Mock RAG
     - query: คำค้นหา (string)
     - top_k: จำนวน document ที่ต้องการคืนค่า
+    - mode: โหมดการค้นหา ("bm25" หรือ "tfidf")
     คืนค่าเป็น list ของ document ที่เกี่ยวข้องที่สุด
     """
-    
-    # โหลดเอกสารทั้งหมดจาก Mock RAG database
-    rag_docs = rag_load_context("data/mock_rag_document.md")
-    
-    # แปลงคำค้นหาเป็นตัวพิมพ์เล็กเพื่อการเปรียบเทียบที่ไม่สนใจตัวพิมพ์ใหญ่เล็ก    
-    query_lower = query.lower()
-    scored_docs = []
-
-    # วนลูปผ่านเอกสารทั้งหมดเพื่อหาความเกี่ยวข้อง
-    for doc in rag_docs:
-        # นับจำนวนครั้งที่คำค้นหาปรากฏใน title และ content (ไม่สนใจตัวพิมพ์ใหญ่เล็ก)
-        title_score = len(re.findall(re.escape(query_lower), doc["title"].lower()))
-        content_score = len(re.findall(re.escape(query_lower), doc["content"].lower()))
-        # คำนวณคะแนนรวม โดยให้น้ำหนัก title มากกว่า content เป็น 2 เท่า
-        score = title_score * 2 + content_score
-        
-        # เก็บเฉพาะเอกสารที่มีคะแนนมากกว่า 0 (มีความเกี่ยวข้อง)
-        if score > 0:
-            scored_docs.append((score, doc))
-
-    # เรียงลำดับเอกสารตามคะแนนจากมากไปน้อย
-    scored_docs.sort(key=lambda x: x[0], reverse=True)
-
-    # คืนค่าเอกสาร top_k อันดับแรกที่เกี่ยวข้องที่สุด
-    return [doc for _, doc in scored_docs[:top_k]]
+    # ใช้ index ที่สร้างไว้แล้ว แทนการอ่านและ parse ไฟล์ใหม่ทุกครั้ง
+    return _get_search_index(mode).search(query, top_k=top_k)
+
+
+def rag_search_scored(query: str, top_k: int = 1, mode: str = "bm25") -> List[Tuple[float, Dict[str, str]]]:
+    """
+    ค้นหา context พร้อมคะแนน (ใช้ประเมินความมั่นใจของผลการค้นหา)
+    - query: คำค้นหา (string)
+    - top_k: จำนวน document ที่ต้องการคืนค่า
+    - mode: โหมดการค้นหา ("bm25" หรือ "tfidf")
+    คืนค่าเป็น list ของ (score, document) เรียงจากคะแนนมากไปน้อย
+    """
+    return _get_search_index(mode).search_scored(query, top_k=top_k)
+
+
+def rag_search_batch(queries: List[str], top_k: int = 1, mode: str = "tfidf") -> List[List[Dict[str, str]]]:
+    """
+    ค้นหาหลายคำค้นหาพร้อมกัน
+    - queries: list ของคำค้นหา
+    - top_k: จำนวน document ที่ต้องการต่อคำค้นหา
+    - mode: โหมดการค้นหา (โหมด "tfidf" ให้คะแนนทุกคำค้นหาด้วย matrix-matrix product ครั้งเดียว)
+    คืนค่าเป็น list ของผลลัพธ์ตามลำดับคำค้นหา
+    """
+    index = _get_search_index(mode)
+    if hasattr(index, "search_batch"):
+        return index.search_batch(queries, top_k=top_k)
+    return [index.search(query, top_k=top_k) for query in queries]
+
+
+# ------------------------
+# Passage-level retrieval
+# ------------------------
+# ความยาวสูงสุดของ passage (ประโยคต่อเนื่องในย่อหน้าเดียวกัน)
+PASSAGE_MAX_CHARS = 320
+# งบตัวอักษรเริ่มต้นของ passage ที่คืนค่า (เปลี่ยนได้ด้วย env RAG_PASSAGE_CHAR_BUDGET)
+DEFAULT_PASSAGE_CHAR_BUDGET = 800
+# ตัวคั่นระหว่าง passage ที่ไม่ติดกันใน section เดียวกัน
+PASSAGE_GAP = " ... "
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_passages(content: str, max_chars: int = PASSAGE_MAX_CHARS) -> List[str]:
+    """
+    แบ่ง content ของ section เป็น passage
+    แต่ละย่อหน้าถูกแบ่งเป็นประโยค แล้วรวมประโยคต่อเนื่องจนยาวไม่เกิน max_chars
+    (ประโยคที่ยาวกว่า max_chars เป็น passage เดียว) passage ไม่ข้ามย่อหน้า
+    """
+    passages = []
+    for paragraph in content.split("\n"):
+        current = ""
+        for sentence in _SENTENCE_RE.split(paragraph.strip()):
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                passages.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            passages.append(current)
+    return passages
+
+
+def build_passages(documents: Iterable[Dict[str, str]], max_chars: int = PASSAGE_MAX_CHARS) -> List[Dict[str, Any]]:
+    """
+    แปลง section เป็น passage ที่มี pointer กลับไปยัง section
+    คืนค่าเป็น list ของ {'title': title ของ section, 'content': ข้อความ, 'section': ลำดับของ section,
+    'passage': ลำดับของ passage ใน section}
+    """
+    passages = []
+    for section_id, doc in enumerate(documents):
+        for position, text in enumerate(split_passages(doc["content"], max_chars)):
+            passages.append({"title": doc["title"], "content": text, "section": section_id, "passage": position})
+    return passages
+
+
+class PassageIndex(BM25Index):
+    """
+    BM25 index ระดับ passage (document แต่ละตัวคือ passage จาก build_passages)
+    title ของ section ถูกนับใน passage ทุกตัว passage ของ section ที่หัวข้อตรงกับคำค้นหาจึงยังได้คะแนนเพิ่ม
+    """
+
+    def __init__(self, documents: Iterable[Dict[str, str]], max_chars: int = PASSAGE_MAX_CHARS, k1: float = 1.5, b: float = 0.75):
+        super().__init__(build_passages(documents, max_chars), k1=k1, b=b)
+
+
+# passage index ของไฟล์ index ที่ compile แล้วในแต่ละ process (key คือ path ของ knowledge base)
+_passage_indexes: Dict[str, PassageIndex] = {}
+
+
+def get_passage_index(file_path: Optional[str] = None) -> BM25Scorer:
+    """
+    คืนค่า passage index ของ knowledge base
+    - file_path: path ของ knowledge base (ค่าเริ่มต้นเหมือน get_rag_index)
+    เมื่อเปิดใช้ shard (get_sharded_index) ค้นหา passage ในทุก shard
+    Markdown ใช้ passage ของ snapshot ล่าสุดใน rag_store ส่วนไฟล์ index ที่ compile แล้ว
+    สร้าง PassageIndex จาก section ของ get_rag_index ครั้งเดียวต่อ process
+    """
+    path = rag_kb_path(file_path)
+    sharded = get_sharded_index(path)
+    if sharded is not None and sharded.passages is not None:
+        return sharded.passages
+    store = get_rag_store(path)
+    if store is not None:
+        return store.snapshot().passages
+    index = _passage_indexes.get(path)
+    if index is None:
+        sections = get_rag_index(path)
+        with _rag_index_lock:
+            index = _passage_indexes.get(path)
+            if index is None:
+                index = PassageIndex(sections.iter_documents())
+                _passage_indexes[path] = index
+    return index
+
+
+def passage_char_budget() -> int:
+    """งบตัวอักษรเริ่มต้นของ passage (env RAG_PASSAGE_CHAR_BUDGET หรือ DEFAULT_PASSAGE_CHAR_BUDGET)"""
+    return int(os.getenv("RAG_PASSAGE_CHAR_BUDGET", DEFAULT_PASSAGE_CHAR_BUDGET))
+
+
+def _clip_words(text: str, limit: int) -> str:
+    # ตัดข้อความที่ขอบคำให้ยาวไม่เกิน limit (รวม "...")
+    if len(text) <= limit:
+        return text
+    cut = text[: max(limit - 3, 0)]
+    if " " in cut:
+        cut = cut[: cut.rindex(" ")]
+    return cut + "..."
+
+
+def select_passages(
+    scored: Iterable[Tuple[float, Dict[str, Any]]],
+    top_k: int,
+    char_budget: int,
+    max_sections: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    เลือก passage คะแนนสูงสุดไม่เกิน top_k ตัว รวม content ไม่เกิน char_budget ตัวอักษร
+    และมาจาก section ไม่เกิน max_sections (None = ไม่จำกัด)
+    passage ที่ยาวเกินงบที่เหลือถูกข้าม ยกเว้น passage แรกที่ถูกตัดให้พอดีงบ
+    คืนค่าเรียงตาม section (section ที่ได้คะแนนสูงสุดก่อน) แล้วตามลำดับใน section เพื่อให้อ่านต่อเนื่อง
+    """
+    chosen: List[Dict[str, Any]] = []
+    sections: Dict[Any, int] = {}
+    used = 0
+    for score, passage in scored:
+        if len(chosen) >= top_k or used >= char_budget:
+            break
+        section = passage["section"]
+        if section not in sections and max_sections is not None and len(sections) >= max_sections:
+            continue
+        text = passage["content"]
+        if len(text) > char_budget - used:
+            if chosen:
+                continue
+            text = _clip_words(text, char_budget)
+        chosen.append(dict(passage, content=text, score=score))
+        sections.setdefault(section, len(sections))
+        used += len(text)
+    chosen.sort(key=lambda p: (sections[p["section"]], p["passage"]))
+    return chosen
+
+
+def merge_passages(passages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    รวม passage (เรียงตาม select_passages) เป็น document ละหนึ่ง section {'title': ..., 'content': ...}
+    passage ที่ไม่ติดกันคั่นด้วย PASSAGE_GAP
+    """
+    merged: List[Dict[str, str]] = []
+    last: Optional[Dict[str, Any]] = None
+    for p in passages:
+        if last is not None and last["section"] == p["section"]:
+            gap = " " if p["passage"] == last["passage"] + 1 else PASSAGE_GAP
+            merged[-1]["content"] += gap + p["content"]
+        else:
+            merged.append({"title": p["title"], "content": p["content"]})
+        last = p
+    return merged
+
+
+def rag_search_passages(
+    query: str,
+    top_k: int = 4,
+    char_budget: Optional[int] = None,
+    mode: str = "bm25",
+    max_sections: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    ค้นหาเฉพาะ passage ที่เกี่ยวข้องที่สุด แทน section ทั้ง section
+    - query: คำค้นหา
+    - top_k: จำนวน passage สูงสุด
+    - char_budget: ความยาวรวมสูงสุดของ content (None = passage_char_budget())
+    - mode: "bm25" ค้นหาใน passage index ทั้ง knowledge base
+      โหมดอื่นค้นหา section ด้วยโหมดนั้นก่อน แล้วเลือก passage ภายใน section ที่พบ
+    - max_sections: จำนวน section สูงสุดที่ passage มาจาก (None = ไม่จำกัด)
+    คืนค่าเป็น list ของ passage {'title', 'content', 'section', 'passage', 'score'} (ดู select_passages)
+    """
+    budget = passage_char_budget() if char_budget is None else char_budget
+    # ดึง candidate มากกว่า top_k เพราะบาง passage อาจเกินงบหรือเกินจำนวน section
+    candidates = max(top_k * 4, 16)
+    if mode == "bm25":
+        scored = get_passage_index().search_scored(query, top_k=candidates)
+    else:
+        sections = _get_search_index(mode).search(query, top_k=max_sections or top_k)
+        scored = PassageIndex(sections).search_scored(query, top_k=candidates)
+    return select_passages(scored, top_k, budget, max_sections)
+
+
+def rag_search_compact(query: str, top_k: int = 2, char_budget: Optional[int] = None, mode: str = "bm25") -> List[Dict[str, str]]:
+    """
+    ผลการค้นหาแบบย่อสำหรับ tool: section ไม่เกิน top_k ตัว ที่มีเฉพาะ passage ที่เกี่ยวข้องที่สุด
+    (รูปแบบเดียวกับ rag_search_context คือ list ของ {'title': ..., 'content': ...})
+    """
+    return merge_passages(rag_search_passages(query, top_k=top_k * 3, char_budget=char_budget, mode=mode, max_sections=top_k))
 
 
 # ------------------------
@@ -0,0 +1,48 @@
+# rag_build.py
+"""
+CLI สำหรับ compile ไฟล์ Markdown ของ knowledge base เป็นไฟล์ index แบบ binary
+
+ตัวอย่าง:
+    python rag_build.py data/mock_rag_document.md -o data/knowledge_base.ragidx
+    python rag_build.py docs/ -o data/knowledge_base.ragidx --workers 8 --max-chunk-chars 2000
+    RAG_INDEX_PATH=data/knowledge_base.ragidx python main.py
+    python rag_build.py docs/ -o data/kb_shards --shards 4   # โฟลเดอร์ของ shard สำหรับ rag_shard
+    RAG_INDEX_PATH=data/kb_shards python main.py
+"""
+import argparse
+import os
+
+from rag_index import write_index
+from rag_ingest import IngestStats, ingest_documents
+from rag_shard import write_shards
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compile markdown knowledge base files into a binary RAG index")
+    parser.add_argument("sources", nargs="+", help="markdown files or directories to compile (sections start with '## ')")
+    parser.add_argument("-o", "--output", required=True, help="output index file path (directory with --shards)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes (default: CPU count)")
+    parser.add_argument("--max-chunk-chars", type=int, default=None, help="split sections longer than this many characters")
+    parser.add_argument("--shards", type=int, default=1, help="split the index into this many shard files (see rag_shard.py)")
+    args = parser.parse_args(argv)
+
+    # sections จากทุกไฟล์ถูกส่งเข้า index โดยตรงตามลำดับที่ระบุ
+    ingest_stats = IngestStats()
+    documents = ingest_documents(
+        args.sources, workers=args.workers, max_chunk_chars=args.max_chunk_chars, stats=ingest_stats
+    )
+    if args.shards > 1:
+        shard_stats = write_shards(documents, args.output, args.shards)
+    else:
+        shard_stats = [write_index(documents, args.output)]
+
+    print(ingest_stats.report())
+    for stats in shard_stats:
+        print(
+            f"Wrote {stats.get('path', args.output)}: {stats['documents']} documents, "
+            f"{stats['terms']} terms, {stats['bytes']} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
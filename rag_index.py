@@ -0,0 +1,201 @@
+# rag_index.py
+"""
+รูปแบบไฟล์ index แบบ binary สำหรับ knowledge base ขนาดใหญ่
+
+โครงสร้างไฟล์ (little-endian ทั้งหมด):
+    header      : magic, n_docs, n_terms, avgdl และ offset ของแต่ละส่วน
+    term table  : (term_offset u64, term_len u32, df u32, postings_offset u64) เรียงตาม term (UTF-8 bytes)
+    term blob   : ข้อความของ term ทั้งหมดต่อกัน
+    postings    : array ของ u32 คู่ (doc_id, tf) ของแต่ละ term ต่อกัน
+    doc lengths : array ของ u32 ความยาวเอกสาร (จำนวน token ที่ถ่วงน้ำหนักแล้ว)
+    doc table   : (title_offset u64, title_len u32, content_offset u64, content_len u32) ต่อเอกสาร
+    text blob   : title และ content แบบ UTF-8
+
+ตอน runtime ไฟล์จะถูกเปิดด้วย mmap: ค้นหา term ด้วย binary search บน term table
+และอ่านข้อความของเอกสารเฉพาะที่ติดอันดับเท่านั้น
+บนเครื่อง big-endian postings และ doc lengths ถูกคัดลอกและสลับ byte ตอนเปิดไฟล์ (ไม่ใช้ page ร่วมกับ process อื่น)
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import mmap
+import os
+import struct
+import sys
+
+from rag import BM25Index, BM25Scorer
+
+INDEX_MAGIC = b"RAGIDX01"
+
+# magic, n_docs, n_terms, avgdl, offsets ของ term table, term blob, postings, doc lengths, doc table, text blob
+_HEADER = struct.Struct("<8sIId6Q")
+_TERM_ENTRY = struct.Struct("<QIIQ")
+_DOC_ENTRY = struct.Struct("<QIQI")
+
+
+def is_compiled_index(path: str) -> bool:
+    """ตรวจสอบว่าไฟล์เป็น index ที่ compile แล้วหรือไม่ (ดูจาก magic bytes)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+    except OSError:
+        return False
+
+
+def _align4(f) -> None:
+    # postings และ doc lengths ต้อง align 4 bytes เพื่อ cast เป็น memoryview ของ u32
+    pad = -f.tell() % 4
+    if pad:
+        f.write(b"\0" * pad)
+
+
+def _u32_array(buffer: memoryview) -> Sequence[int]:
+    """อ่าน buffer เป็น array ของ u32 little-endian (เครื่อง little-endian ใช้ buffer เดิมโดยไม่คัดลอก)"""
+    if sys.byteorder == "little":
+        return buffer.cast("I")
+    values = array("I")
+    values.frombytes(buffer)
+    values.byteswap()
+    return values
+
+
+def write_index(documents: Iterable[Dict[str, str]], out_path: str) -> Dict[str, int]:
+    """
+    Compile เอกสารเป็นไฟล์ index แบบ binary
+    - documents: iterable ของ {'title': ..., 'content': ...} (เช่นผลลัพธ์จาก rag_ingest.ingest_documents)
+    - out_path: path ของไฟล์ผลลัพธ์ (เขียนลงไฟล์ชั่วคราวก่อนแล้ว rename)
+    คืนค่าเป็นสถิติของ index ที่สร้าง
+    """
+    index = BM25Index(documents)
+    terms = sorted(index.postings, key=lambda t: t.encode("utf-8"))
+    tmp_path = f"{out_path}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        # จองที่สำหรับ header ไว้ก่อน แล้วค่อยเขียนทับเมื่อรู้ offset ทั้งหมด
+        f.write(b"\0" * _HEADER.size)
+
+        # term table + term blob
+        term_table_off = f.tell()
+        term_bytes = [t.encode("utf-8") for t in terms]
+        blob_pos = 0
+        posting_pos = 0
+        for term, raw in zip(terms, term_bytes):
+            df = len(index.postings[term])
+            f.write(_TERM_ENTRY.pack(blob_pos, len(raw), df, posting_pos))
+            blob_pos += len(raw)
+            posting_pos += df * 2
+        term_blob_off = f.tell()
+        f.write(b"".join(term_bytes))
+
+        # postings (u32 คู่ doc_id, tf)
+        _align4(f)
+        postings_off = f.tell()
+        for term in terms:
+            plist = index.postings[term]
+            flat = [value for pair in plist for value in pair]
+            f.write(struct.pack(f"<{len(flat)}I", *flat))
+
+        # doc lengths
+        doc_lengths_off = f.tell()
+        f.write(struct.pack(f"<{len(index.doc_lengths)}I", *index.doc_lengths))
+
+        # doc table + text blob (offset ของข้อความนับจากต้น text blob)
+        doc_table_off = f.tell()
+        encoded = [(d["title"].encode("utf-8"), d["content"].encode("utf-8")) for d in index.documents]
+        text_pos = 0
+        for title, content in encoded:
+            f.write(_DOC_ENTRY.pack(text_pos, len(title), text_pos + len(title), len(content)))
+            text_pos += len(title) + len(content)
+        text_off = f.tell()
+        for title, content in encoded:
+            f.write(title)
+            f.write(content)
+
+        f.seek(0)
+        f.write(_HEADER.pack(
+            INDEX_MAGIC, index.n_docs, len(terms), index.avgdl,
+            term_table_off, term_blob_off, postings_off, doc_lengths_off, doc_table_off, text_off,
+        ))
+
+    os.replace(tmp_path, out_path)
+    return {"documents": index.n_docs, "terms": len(terms), "bytes": os.path.getsize(out_path)}
+
+
+class MmapBM25Index(BM25Scorer):
+    """
+    BM25 index ที่อ่านจากไฟล์ compile แล้วผ่าน mmap
+    - ไม่มีการโหลดเอกสารทั้งหมดเข้าหน่วยความจำ: หลาย process ที่เปิดไฟล์เดียวกัน
+      ใช้ page เดียวกันใน OS page cache
+    - ข้อความของเอกสารจะถูก decode เฉพาะเอกสารที่ต้องใช้ (top-k และ candidate สำหรับ phrase bonus)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.n_docs, self.n_terms, self.avgdl,
+         self._term_table_off, self._term_blob_off, postings_off,
+         doc_lengths_off, self._doc_table_off, self._text_off) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not a compiled RAG index: {path}")
+
+        view = memoryview(self._mmap)
+        self._postings = _u32_array(view[postings_off:doc_lengths_off])
+        self._doc_lengths = _u32_array(view[doc_lengths_off:doc_lengths_off + 4 * self.n_docs])
+
+    def _term_at(self, i: int) -> Tuple[bytes, int, int]:
+        term_off, term_len, df, posting_off = _TERM_ENTRY.unpack_from(
+            self._mmap, self._term_table_off + i * _TERM_ENTRY.size
+        )
+        start = self._term_blob_off + term_off
+        return self._mmap[start:start + term_len], df, posting_off
+
+    def _find_term(self, term: str) -> Optional[Tuple[int, int]]:
+        # binary search บน term table ที่เรียงตาม UTF-8 bytes
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_term, df, posting_off = self._term_at(mid)
+            if mid_term == key:
+                return df, posting_off
+            if mid_term < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def term_postings(self, term: str) -> Optional[List[Tuple[int, int]]]:
+        found = self._find_term(term)
+        if found is None:
+            return None
+        df, posting_off = found
+        flat = self._postings[posting_off:posting_off + df * 2]
+        return list(zip(flat[0::2], flat[1::2]))
+
+    def doc_length(self, doc_id: int) -> int:
+        return self._doc_lengths[doc_id]
+
+    def _read_text(self, offset: int, length: int) -> str:
+        start = self._text_off + offset
+        return self._mmap[start:start + length].decode("utf-8")
+
+    def document(self, doc_id: int) -> Dict[str, str]:
+        title_off, title_len, content_off, content_len = _DOC_ENTRY.unpack_from(
+            self._mmap, self._doc_table_off + doc_id * _DOC_ENTRY.size
+        )
+        return {
+            "title": self._read_text(title_off, title_len),
+            "content": self._read_text(content_off, content_len),
+        }
+
+    def document_frequencies(self) -> Dict[str, int]:
+        dfs = {}
+        for i in range(self.n_terms):
+            term, df, _ = self._term_at(i)
+            dfs[term.decode("utf-8")] = df
+        return dfs
+
+    def phrase_hits(self, doc_id: int, phrase: str) -> int:
+        doc = self.document(doc_id)
+        hits = doc["title"].lower().count(phrase) * self.TITLE_WEIGHT
+        return hits + doc["content"].lower().count(phrase)
@@ -0,0 +1,204 @@
+# rag_ingest.py
+"""
+Pipeline สำหรับอ่านไฟล์ Markdown ของ knowledge base จำนวนมาก
+
+- iter_sections: อ่านไฟล์ทีละบรรทัดแล้ว yield ทีละ section (ไม่อ่านทั้งไฟล์เข้าหน่วยความจำ)
+- chunk_section: แบ่ง section ที่ยาวเกินเป็น chunk ตามขนาดที่กำหนด
+- ingest_documents: อ่านไฟล์/โฟลเดอร์หลายรายการ กระจายการ parse ไปยัง process pool
+  และเก็บสถิติ throughput (docs/s, MB/s) ไว้ใน IngestStats
+- parse_files: parse ไฟล์ทีละไฟล์ (หรือด้วย process pool) โดยคืนเอกสารแยกตามไฟล์
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import time
+
+
+@dataclass
+class IngestStats:
+    """สถิติของการ ingest หนึ่งครั้ง"""
+    files: int = 0
+    documents: int = 0
+    bytes: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / (1024 * 1024) / self.seconds
+
+    def report(self) -> str:
+        return (
+            f"Ingested {self.documents} documents from {self.files} files "
+            f"({self.bytes / (1024 * 1024):.2f} MB) in {self.seconds:.2f}s: "
+            f"{self.docs_per_second:.0f} docs/s, {self.mb_per_second:.2f} MB/s"
+        )
+
+
+def iter_markdown_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    แปลง path ของไฟล์/โฟลเดอร์เป็นรายการไฟล์ Markdown
+    - โฟลเดอร์จะถูกค้นหาไฟล์ *.md แบบ recursive และเรียงตามชื่อ
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".md"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_sections(file_path: str) -> Iterator[Dict[str, str]]:
+    """
+    อ่านไฟล์ Markdown และ yield ทีละ section เป็น dict {'title': ..., 'content': ...}
+    Assumption: แต่ละ section เริ่มด้วย ## และข้อมูลแยกด้วย ---
+    เนื้อหาถูกเก็บเป็น list ของบรรทัดแล้ว join ครั้งเดียว (linear time)
+    """
+    title = None
+    lines: List[str] = []
+
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+
+            # ข้าม header หลัก "# Knowledge Base"
+            if line.startswith("# "):
+                continue
+
+            # เริ่ม section ใหม่ที่ขึ้นต้นด้วย ##
+            if line.startswith("## "):
+                if title is not None:
+                    yield {"title": title, "content": "\n".join(lines)}
+                title = line[3:].strip()  # เอา "## " ออก
+                lines = []
+
+            # ข้ามเส้น separator ---
+            elif line == "---":
+                continue
+
+            # เพิ่มเนื้อหาถ้ามี section ปัจจุบัน และไม่ใช่บรรทัดว่าง
+            elif title is not None and line:
+                lines.append(line)
+
+    # section สุดท้าย
+    if title is not None:
+        yield {"title": title, "content": "\n".join(lines)}
+
+
+def chunk_section(doc: Dict[str, str], max_chars: Optional[int]) -> List[Dict[str, str]]:
+    """
+    แบ่ง section ที่ยาวเกิน max_chars เป็นหลาย chunk โดยตัดที่ขอบบรรทัดก่อน
+    (บรรทัดที่ยาวเกินจะถูกตัดตามจำนวนตัวอักษร)
+    chunk ที่ได้จะมี title เป็น "<title> (part i/n)"
+    """
+    content = doc["content"]
+    if not max_chars or len(content) <= max_chars:
+        return [doc]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in content.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        # +1 สำหรับ "\n" ที่ใช้เชื่อมบรรทัด
+        if current and size + 1 + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        if line:
+            size += len(line) + (1 if current else 0)
+            current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+
+    total = len(chunks)
+    return [
+        {"title": f"{doc['title']} (part {i}/{total})", "content": chunk}
+        for i, chunk in enumerate(chunks, 1)
+    ]
+
+
+def _parse_file(args: Tuple[str, Optional[int]]) -> Tuple[List[Dict[str, str]], int]:
+    # ทำงานใน worker process: parse ไฟล์เดียวแล้วคืน sections พร้อมขนาดไฟล์
+    file_path, max_chars = args
+    docs = [chunk for doc in iter_sections(file_path) for chunk in chunk_section(doc, max_chars)]
+    return docs, os.path.getsize(file_path)
+
+
+def ingest_documents(
+    paths: Iterable[str],
+    workers: int = 1,
+    max_chunk_chars: Optional[int] = None,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    อ่านเอกสารจากไฟล์/โฟลเดอร์ Markdown และ yield ทีละ document (ใช้สร้าง index ได้ทันที)
+    - paths: list ของไฟล์หรือโฟลเดอร์
+    - workers: จำนวน process สำหรับ parse (1 = parse แบบ streaming ใน process ปัจจุบัน)
+    - max_chunk_chars: ขนาดสูงสุดของ content ต่อ chunk (None = ไม่แบ่ง)
+    - stats: IngestStats สำหรับเก็บสถิติ (อัปเดตระหว่างการ yield)
+    ลำดับของเอกสารตรงกับลำดับไฟล์เสมอ ไม่ว่าจะใช้ workers เท่าไร
+    """
+    stats = stats if stats is not None else IngestStats()
+    files = list(iter_markdown_files(paths))
+
+    if workers <= 1 or len(files) <= 1:
+        for file_path in files:
+            for doc in iter_sections(file_path):
+                for chunk in chunk_section(doc, max_chunk_chars):
+                    stats.documents += 1
+                    yield chunk
+            stats.files += 1
+            stats.bytes += os.path.getsize(file_path)
+    else:
+        for _, docs, size in parse_files(files, workers, max_chunk_chars):
+            stats.files += 1
+            stats.bytes += size
+            for doc in docs:
+                stats.documents += 1
+                yield doc
+
+    stats.finished_at = time.perf_counter()
+
+
+def parse_files(
+    files: List[str],
+    workers: int = 1,
+    max_chunk_chars: Optional[int] = None,
+) -> Iterator[Tuple[str, List[Dict[str, str]], int]]:
+    """
+    parse ไฟล์ Markdown ทีละไฟล์และ yield (file_path, documents, ขนาดไฟล์) ตามลำดับไฟล์
+    - workers: จำนวน process สำหรับ parse (1 = parse ใน process ปัจจุบัน)
+    ใช้เมื่อต้องรู้ว่าเอกสารมาจากไฟล์ใด (เช่น rag_store ที่ index ใหม่เฉพาะไฟล์ที่เปลี่ยน)
+    """
+    if workers <= 1 or len(files) <= 1:
+        for file_path in files:
+            docs, size = _parse_file((file_path, max_chunk_chars))
+            yield file_path, docs, size
+        return
+
+    # ส่งไฟล์ไปยัง worker เป็นกลุ่มเพื่อลด overhead ของ IPC
+    chunksize = max(1, len(files) // (workers * 4))
+    # import เมื่อใช้ process pool จริงเท่านั้น (multiprocessing ทำให้ import rag ช้าลง)
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = ((file_path, max_chunk_chars) for file_path in files)
+        for file_path, (docs, size) in zip(files, pool.map(_parse_file, jobs, chunksize=chunksize)):
+            yield file_path, docs, size
@@ -0,0 +1,340 @@
+# rag_shard.py
+"""
+การค้นหาแบบ scatter-gather บน knowledge base ที่แบ่งเป็น shard ใน worker process หลายตัว
+
+- corpus ถูกแบ่งเป็น N shard และแต่ละ shard มี index ของตัวเองใน process แยก
+  จึงค้นหาพร้อมกันได้โดยไม่ติด GIL และใช้ memory bandwidth ของหลาย core
+  แหล่งข้อมูลคือ Markdown/index ที่ compile แล้ว (section ที่ i อยู่ shard i % N หรือแบ่งตามไฟล์
+  เมื่อมีไฟล์มากพอ) หรือโฟลเดอร์ของ shard ที่ compile ด้วย rag_build.py --shards N (เปิดด้วย mmap)
+- ตอนเริ่มต้น shard ส่งสถิติ (จำนวนเอกสาร, ความยาวเฉลี่ย, df) มารวมกัน แล้วทุก shard ให้คะแนน
+  ด้วยสถิติรวม (rag.CorpusStats) คะแนนจาก shard ต่างกันจึงเปรียบเทียบกันได้และเท่ากับการค้นหาใน index เดียว
+  (ยกเว้น phrase boost ที่แต่ละ shard ให้กับ candidate pool ของตัวเอง อันดับท้าย ๆ จึงอาจต่างเล็กน้อย)
+- คำค้นหาถูกส่งไปทุก shard แต่ละ shard คืน top-k ของตัวเองที่เรียงแล้ว และรวมด้วย heap (heapq.merge) เป็น top-k รวม
+- คำค้นหาแบบ batch ถูกแบ่งเป็นชุดและส่งต่อกันโดยไม่รอผล (pipeline): shard ค้นหาชุดถัดไป
+  ระหว่างที่ process หลักรวมผลของชุดก่อนหน้า ผลถูกอ่านโดย thread ของแต่ละ shard จึงเรียกจากหลาย thread พร้อมกันได้
+- rag.get_sharded_index ใช้ ShardedIndex แทน index ใน process เดียวของ search_context และ search_knowledge_base
+  เมื่อกำหนด env RAG_SHARDS > 1 หรือ RAG_INDEX_PATH เป็นโฟลเดอร์ของ shard
+"""
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import atexit
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+
+from rag import BM25Index, BM25Scorer, CorpusStats, PassageIndex
+from rag_index import MmapBM25Index, is_compiled_index, write_index
+from rag_ingest import ingest_documents, iter_markdown_files
+
+# รูปแบบชื่อไฟล์ของ shard ที่ compile แล้ว
+SHARD_FILE_FORMAT = "shard_{:03d}.ragidx"
+# จำนวนคำค้นหาต่อข้อความที่ส่งไปยัง shard ใน search_scored_batch
+DEFAULT_BATCH_SIZE = 32
+# แบ่ง shard ตามไฟล์เมื่อมีไฟล์ Markdown อย่างน้อยเท่านี้ต่อ shard (ไม่เช่นนั้นแบ่ง section แบบ round-robin)
+_MIN_FILES_PER_SHARD = 8
+
+Hit = Tuple[float, Dict[str, Any]]
+
+
+class ShardError(RuntimeError):
+    """shard process โหลดหรือค้นหาไม่สำเร็จ หรือหยุดทำงาน"""
+
+
+def shard_files(path: str) -> List[str]:
+    """ไฟล์ shard ที่ compile แล้วในโฟลเดอร์ path เรียงตามลำดับ shard (list ว่างถ้าไม่ใช่โฟลเดอร์ shard)"""
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.startswith("shard_") and name.endswith(".ragidx")
+    )
+
+
+def write_shards(documents: Iterable[Dict[str, str]], out_dir: str, n_shards: int) -> List[Dict[str, Any]]:
+    """
+    Compile เอกสารเป็นไฟล์ index n_shards ไฟล์ในโฟลเดอร์ out_dir (section ที่ i อยู่ shard i % n_shards)
+    shard เดิมในโฟลเดอร์ถูกเขียนทับหรือลบ คืนค่าเป็นสถิติของแต่ละ shard (รวม 'path')
+    """
+    parts: List[List[Dict[str, str]]] = [[] for _ in range(n_shards)]
+    for i, doc in enumerate(documents):
+        parts[i % n_shards].append(doc)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stats = []
+    for shard_id, docs in enumerate(parts):
+        path = os.path.join(out_dir, SHARD_FILE_FORMAT.format(shard_id))
+        stats.append(dict(write_index(docs, path), path=path))
+    for stale in shard_files(out_dir)[n_shards:]:
+        os.remove(stale)
+    return stats
+
+
+def merge_top_k(ranked: Iterable[List[Hit]], top_k: int) -> List[Hit]:
+    """รวมผลของแต่ละ shard (เรียงคะแนนจากมากไปน้อยอยู่แล้ว) เป็น top_k รวมด้วย heap"""
+    return list(itertools.islice(heapq.merge(*ranked, key=lambda hit: hit[0], reverse=True), top_k))
+
+
+def _shard_documents(path: str, shard_id: int, n_shards: int) -> Iterator[Dict[str, str]]:
+    # เอกสารของ shard จาก knowledge base ทั้งก้อน
+    if is_compiled_index(path):
+        documents = MmapBM25Index(path).iter_documents()
+    else:
+        files = list(iter_markdown_files([path]))
+        if len(files) >= n_shards * _MIN_FILES_PER_SHARD:
+            # แบ่งตามไฟล์: แต่ละ shard parse เฉพาะไฟล์ของตัวเอง
+            yield from ingest_documents(files[shard_id::n_shards])
+            return
+        documents = ingest_documents(files)
+    for i, doc in enumerate(documents):
+        if i % n_shards == shard_id:
+            yield doc
+
+
+def _open_shard(path: str, shard_id: int, n_shards: int, with_passages: bool) -> Tuple[BM25Scorer, Optional[BM25Scorer]]:
+    files = shard_files(path)
+    if files:
+        index: BM25Scorer = MmapBM25Index(files[shard_id])
+    else:
+        index = BM25Index(list(_shard_documents(path, shard_id, n_shards)))
+    passages = PassageIndex(index.iter_documents()) if with_passages else None
+    return index, passages
+
+
+def _shard_main(conn, path: str, shard_id: int, n_shards: int, with_passages: bool) -> None:
+    # ทำงานใน worker process: โหลด shard ส่งสถิติ รับสถิติรวม แล้วตอบคำค้นหาจนกว่าจะได้ None
+    try:
+        sections, passages = _open_shard(path, shard_id, n_shards, with_passages)
+        conn.send(("ready", sections.local_stats(), passages.local_stats() if passages is not None else None))
+    except Exception as e:
+        try:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        except OSError:
+            pass  # process หลักเลิกรอแล้ว (shard อื่นโหลดไม่สำเร็จก่อน)
+        return
+    try:
+        sections.corpus_stats, passage_stats = conn.recv()
+    except EOFError:
+        return  # shard อื่นโหลดไม่สำเร็จ
+    if passages is not None:
+        passages.corpus_stats = passage_stats
+    indexes = {"sections": sections, "passages": passages}
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        request_id, level, queries, top_k = message
+        try:
+            index = indexes[level]
+            if index is None:
+                raise ValueError("passage search is disabled for this index")
+            results = [index.search_scored(query, top_k) for query in queries]
+            if level == "passages":
+                # 'section' ต้องไม่ซ้ำกันระหว่าง shard (ใช้จัดกลุ่ม passage ใน rag.select_passages)
+                results = [
+                    [(score, dict(p, section=p["section"] * n_shards + shard_id)) for score, p in hits]
+                    for hits in results
+                ]
+            conn.send((request_id, results, None))
+        except Exception as e:
+            conn.send((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+class ShardedIndex:
+    """
+    index ที่แบ่งเป็น shard ใน worker process (ใช้แทน BM25 index ใน process เดียว)
+    - path: Markdown (ไฟล์/โฟลเดอร์), index ที่ compile แล้ว หรือโฟลเดอร์ shard จาก rag_build.py --shards
+    - n_shards: จำนวน shard (โฟลเดอร์ shard ใช้จำนวนไฟล์ shard เสมอ)
+    - with_passages: สร้าง passage index ใน shard ด้วย (ใช้กับ rag_search_passages / rag_search_compact)
+    - batch_size: จำนวนคำค้นหาต่อข้อความใน search_scored_batch
+    - start_method: วิธีสร้าง process ของ multiprocessing ("spawn" ปลอดภัยกับ process ที่มีหลาย thread)
+    shard โหลดพร้อมกัน constructor รอจนทุก shard พร้อม index ไม่ถูก watch (สร้างใหม่เมื่อ knowledge base เปลี่ยน)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        n_shards: Optional[int] = None,
+        with_passages: bool = True,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        start_method: str = "spawn",
+    ):
+        files = shard_files(path)
+        if files:
+            n_shards = len(files)
+        if not n_shards or n_shards < 1:
+            raise ValueError(f"n_shards must be >= 1 (got {n_shards!r})")
+        self.path = path
+        self.n_shards = n_shards
+        self.batch_size = batch_size
+        self._pending: Dict[Tuple[int, int], Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._dead: set = set()
+
+        ctx = multiprocessing.get_context(start_method)
+        self._conns = []
+        self._processes = []
+        for shard_id in range(n_shards):
+            conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_shard_main,
+                args=(child_conn, path, shard_id, n_shards, with_passages),
+                name=f"rag-shard-{shard_id}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+
+        # รอทุก shard โหลดเสร็จ แล้วแจกสถิติรวมให้ทุก shard
+        ready = []
+        for shard_id, conn in enumerate(self._conns):
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = ("error", "process exited while loading")
+            if message[0] == "error":
+                for other in self._conns:
+                    other.close()
+                self._shutdown()
+                raise ShardError(f"shard {shard_id} failed to load {path}: {message[1]}")
+            ready.append(message)
+        self.stats = CorpusStats.combine(m[1] for m in ready)
+        passage_stats = CorpusStats.combine(m[2] for m in ready) if with_passages else None
+        for conn in self._conns:
+            conn.send((self.stats, passage_stats))
+
+        self.passages = ShardedPassages(self) if with_passages else None
+        self._send_locks = [threading.Lock() for _ in range(n_shards)]
+        self._readers = [
+            threading.Thread(target=self._read_loop, args=(shard_id,), name=f"rag-shard-reader-{shard_id}", daemon=True)
+            for shard_id in range(n_shards)
+        ]
+        for reader in self._readers:
+            reader.start()
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        return self.stats.n_docs
+
+    def search_scored_batch(self, queries: List[str], top_k: int = 1, level: str = "sections") -> List[List[Hit]]:
+        """
+        ค้นหาหลายคำค้นหาในทุก shard แล้วรวมเป็น top_k ต่อคำค้นหา
+        - level: "sections" หรือ "passages"
+        คืนค่าเป็น list ของ (score, document) ต่อคำค้นหาตามลำดับ
+        """
+        queries = list(queries)
+        if top_k <= 0 or not queries:
+            return [[] for _ in queries]
+        # ส่งทุกชุดไปทุก shard ก่อนแล้วค่อยรอผล: shard ค้นหาชุดถัดไประหว่างที่รวมผลของชุดก่อนหน้า
+        batches = []
+        for start in range(0, len(queries), self.batch_size):
+            batch = queries[start:start + self.batch_size]
+            batches.append([self._submit(shard_id, level, batch, top_k) for shard_id in range(self.n_shards)])
+
+        results: List[List[Hit]] = []
+        for futures in batches:
+            per_shard = [future.result() for future in futures]
+            for ranked in zip(*per_shard):
+                results.append(merge_top_k(ranked, top_k))
+        return results
+
+    def search_scored(self, query: str, top_k: int = 1) -> List[Hit]:
+        """ค้นหา section ในทุก shard และคืนค่า (score, document) เรียงจากคะแนนมากไปน้อย"""
+        return self.search_scored_batch([query], top_k)[0]
+
+    def search(self, query: str, top_k: int = 1) -> List[Dict[str, Any]]:
+        return [doc for _, doc in self.search_scored(query, top_k)]
+
+    def search_batch(self, queries: List[str], top_k: int = 1) -> List[List[Dict[str, Any]]]:
+        return [[doc for _, doc in hits] for hits in self.search_scored_batch(queries, top_k)]
+
+    def close(self) -> None:
+        """หยุด shard process ทั้งหมด (เรียกซ้ำได้)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for conn, lock in zip(self._conns, self._send_locks):
+            with lock:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        self._shutdown()
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _submit(self, shard_id: int, level: str, queries: List[str], top_k: int) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._closed or shard_id in self._dead:
+                raise ShardError(f"shard {shard_id} is not running")
+            request_id = next(self._ids)
+            self._pending[(shard_id, request_id)] = future
+        try:
+            with self._send_locks[shard_id]:
+                self._conns[shard_id].send((request_id, level, queries, top_k))
+        except OSError as e:
+            with self._lock:
+                self._pending.pop((shard_id, request_id), None)
+            raise ShardError(f"shard {shard_id} is not running") from e
+        return future
+
+    def _read_loop(self, shard_id: int) -> None:
+        # รับผลของ shard หนึ่งตัวและส่งให้ Future ของคำค้นหานั้น
+        conn = self._conns[shard_id]
+        while True:
+            try:
+                request_id, results, error = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._pending.pop((shard_id, request_id), None)
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(results)
+            else:
+                future.set_exception(ShardError(f"shard {shard_id}: {error}"))
+
+        # shard หยุดทำงาน: คำค้นหาที่ยังรอผลจาก shard นี้ล้มเหลวทั้งหมด
+        with self._lock:
+            self._dead.add(shard_id)
+            lost = [key for key in self._pending if key[0] == shard_id]
+            futures = [self._pending.pop(key) for key in lost]
+        for future in futures:
+            future.set_exception(ShardError(f"shard {shard_id} exited"))
+
+    def _shutdown(self) -> None:
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for reader in getattr(self, "_readers", ()):
+            reader.join(timeout=5)
+        for conn in self._conns:
+            conn.close()
+
+
+class ShardedPassages:
+    """ค้นหาระดับ passage ใน ShardedIndex (ใช้แทน rag.get_passage_index)"""
+
+    def __init__(self, index: ShardedIndex):
+        self._index = index
+
+    def search_scored(self, query: str, top_k: int = 1) -> List[Hit]:
+        return self._index.search_scored_batch([query], top_k, level="passages")[0]
+
+    def search(self, query: str, top_k: int = 1) -> List[Dict[str, Any]]:
+        return [doc for _, doc in self.search_scored(query, top_k)]
@@ -0,0 +1,481 @@
+# rag_store.py
+"""
+knowledge base แบบ Markdown ที่ถูก watch และ index ใหม่เฉพาะ section ที่เปลี่ยน
+
+- แต่ละ section (## ...) ถูกระบุด้วย hash ของ title + content เมื่อไฟล์เปลี่ยน จะ parse ใหม่เฉพาะไฟล์นั้น
+  แล้ว tokenize และ index เฉพาะ section ที่ hash ยังไม่มีอยู่ (section ที่ย้ายตำแหน่งหรือย้ายไฟล์ไม่ถูก index ใหม่)
+- ข้อมูลเก็บเป็น segment แบบ LSM: segment ที่สร้างแล้วไม่ถูกแก้ไข การ update เพิ่ม segment ใหม่สำหรับ
+  section ที่เพิ่มเข้ามา และ tombstone สำหรับ section ที่ถูกลบหรือแก้ไข
+  segment ท้ายๆ ถูกรวมกันจาก postings เดิม (ไม่ tokenize ใหม่) เมื่อขนาดใกล้กันหรือมีจำนวนมากเกินไป
+- การ update สร้าง StoreSnapshot ใหม่แยกไว้ แล้ว publish ด้วยการสลับ reference ครั้งเดียว
+  ผู้อ่านเรียก snapshot() โดยไม่ใช้ lock จึงไม่ต้องรอการ update และไม่เห็น index ที่สร้างไม่เสร็จ
+- เวลาที่ใช้ update ขึ้นกับขนาดของไฟล์และ section ที่เปลี่ยน ไม่ใช่ขนาดของ knowledge base ทั้งหมด
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import os
+import threading
+import time
+
+from rag import PASSAGE_MAX_CHARS, BM25Index, BM25Scorer, PassageIndex
+from rag_ingest import iter_markdown_files, parse_files
+
+# doc_id ของ SegmentedIndex = (ลำดับของ segment << SEGMENT_SHIFT) | doc_id ใน segment
+SEGMENT_SHIFT = 32
+_LOCAL_MASK = (1 << SEGMENT_SHIFT) - 1
+
+# segment ท้ายถูกรวมกับ segment ก่อนหน้าเมื่อ segment ก่อนหน้าใหญ่ไม่เกิน MERGE_RATIO เท่า
+MERGE_RATIO = 4
+# จำนวน segment สูงสุดต่อ snapshot (เกินแล้วรวม segment ท้าย)
+MAX_SEGMENTS = 8
+# segment ที่มี section ถูกลบเกินสัดส่วนนี้ถูกเขียนใหม่โดยตัด tombstone ทิ้ง
+MAX_DEAD_RATIO = 0.5
+
+# ช่วงเวลาเริ่มต้น (วินาที) ระหว่างการตรวจไฟล์ของ watch()
+DEFAULT_POLL_SECONDS = 2.0
+
+
+def section_hash(doc: Dict[str, str]) -> str:
+    """hash ของ section (title และ content) ใช้ตรวจว่า section เปลี่ยนหรือไม่"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(doc["title"].encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(doc["content"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Segment:
+    """
+    ชุด section ที่ถูก index พร้อมกัน (ไม่ถูกแก้ไขหลังสร้าง)
+    - sections: BM25Index ของ section
+    - passages: index ของ passage ใน section เหล่านั้น ('section' ของ passage คือ doc_id ใน sections)
+      สร้างเมื่อใช้ครั้งแรก การค้นหาระดับ section อย่างเดียวจึงไม่ต้องแบ่ง passage
+    - hashes: section_hash ของแต่ละ section ตาม doc_id
+    """
+
+    def __init__(
+        self,
+        sections: BM25Index,
+        hashes: List[str],
+        passages: Optional[BM25Index] = None,
+        max_passage_chars: int = PASSAGE_MAX_CHARS,
+    ):
+        self.sections = sections
+        self.hashes = hashes
+        self.max_passage_chars = max_passage_chars
+        self.section_length = sum(sections.doc_lengths)
+        self.passage_length = 0
+        # passage ของ section i คือ passage_starts[i] ถึง passage_starts[i + 1] - 1
+        self.passage_starts: List[int] = []
+        self._passages: Optional[BM25Index] = None
+        self._passages_lock = threading.Lock()
+        if passages is not None:
+            self._set_passages(passages)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @property
+    def has_passages(self) -> bool:
+        return self._passages is not None
+
+    @property
+    def passages(self) -> BM25Index:
+        if self._passages is None:
+            with self._passages_lock:
+                if self._passages is None:
+                    self._set_passages(PassageIndex(self.sections.documents, self.max_passage_chars))
+        return self._passages
+
+    def _set_passages(self, passages: BM25Index) -> None:
+        counts = Counter(p["section"] for p in passages.documents)
+        starts = [0]
+        for section_id in range(len(self.hashes)):
+            starts.append(starts[-1] + counts[section_id])
+        self.passage_starts = starts
+        self.passage_length = sum(passages.doc_lengths)
+        self._passages = passages
+
+    @classmethod
+    def build(
+        cls,
+        documents: List[Dict[str, str]],
+        hashes: List[str],
+        max_passage_chars: int = PASSAGE_MAX_CHARS,
+        with_passages: bool = False,
+    ) -> "Segment":
+        """tokenize และ index section ชุดใหม่ (with_passages: สร้าง passage index ทันที)"""
+        passages = PassageIndex(documents, max_passage_chars) if with_passages else None
+        return cls(BM25Index(documents), hashes, passages, max_passage_chars)
+
+    @classmethod
+    def merge(cls, parts: List[Tuple["Segment", List[int]]]) -> "Segment":
+        """
+        รวม segment จาก postings เดิม (ไม่ tokenize ใหม่)
+        - parts: list ของ (segment, doc_id ของ section ที่เก็บไว้ เรียงจากน้อยไปมาก)
+        passage index ถูกรวมด้วยเมื่อทุก segment มีอยู่แล้ว (ไม่เช่นนั้นสร้างเมื่อใช้ครั้งแรก)
+        """
+        sections = BM25Index.merge([(seg.sections, keep) for seg, keep in parts])
+        hashes = [seg.hashes[i] for seg, keep in parts for i in keep]
+        max_passage_chars = parts[0][0].max_passage_chars
+        if not all(seg.has_passages for seg, _ in parts):
+            return cls(sections, hashes, max_passage_chars=max_passage_chars)
+
+        passages = PassageIndex.merge([(seg.passages, list(seg.passage_ids(keep))) for seg, keep in parts])
+        # passage เรียงตามลำดับเดียวกับ section จึงกำหนด 'section' ใหม่ได้ตามลำดับ
+        new_id = 0
+        documents = []
+        for seg, keep in parts:
+            for old_id in keep:
+                for passage_id in seg.passage_ids((old_id,)):
+                    documents.append(dict(seg.passages.documents[passage_id], section=new_id))
+                new_id += 1
+        passages.documents = documents
+        return cls(sections, hashes, passages, max_passage_chars)
+
+    def passage_ids(self, section_ids: Iterable[int]) -> Iterator[int]:
+        """passage id ของ section ที่ระบุ (สร้าง passage index ถ้ายังไม่มี)"""
+        if not self.has_passages:
+            self.passages  # สร้าง passage_starts
+        starts = self.passage_starts
+        for section_id in section_ids:
+            yield from range(starts[section_id], starts[section_id + 1])
+
+
+class SegmentedIndex(BM25Scorer):
+    """
+    BM25 index ที่ประกอบจาก index ของหลาย segment (ไม่ถูกแก้ไขหลังสร้าง)
+    - parts: list ของ (BM25Index, doc_id ที่ถูกลบ, ความยาวรวมของทุกเอกสารใน index)
+    doc_id = (ลำดับของ part << SEGMENT_SHIFT) | doc_id ใน part
+    n_docs, avgdl และ document frequency นับเฉพาะเอกสารที่ไม่ถูกลบ
+    คะแนนจึงเท่ากับ BM25Index ที่สร้างจากเอกสารชุดเดียวกันทั้งหมดใหม่
+    """
+
+    def __init__(self, parts: List[Tuple[BM25Index, FrozenSet[int], int]], k1: float = 1.5, b: float = 0.75):
+        self.parts = parts
+        self.k1 = k1
+        self.b = b
+        self.n_docs = sum(len(index.documents) - len(dead) for index, dead, _ in parts)
+        length = sum(total - sum(index.doc_lengths[d] for d in dead) for index, dead, total in parts)
+        self.avgdl = (length / self.n_docs) if self.n_docs else 0.0
+
+    def term_postings(self, term: str) -> Optional[List[Tuple[int, int]]]:
+        merged: List[Tuple[int, int]] = []
+        for i, (index, dead, _) in enumerate(self.parts):
+            plist = index.postings.get(term)
+            if not plist:
+                continue
+            base = i << SEGMENT_SHIFT
+            if dead:
+                merged.extend((base | doc_id, tf) for doc_id, tf in plist if doc_id not in dead)
+            else:
+                merged.extend((base | doc_id, tf) for doc_id, tf in plist)
+        return merged
+
+    def doc_length(self, doc_id: int) -> int:
+        return self.parts[doc_id >> SEGMENT_SHIFT][0].doc_lengths[doc_id & _LOCAL_MASK]
+
+    def phrase_hits(self, doc_id: int, phrase: str) -> int:
+        return self.parts[doc_id >> SEGMENT_SHIFT][0].phrase_hits(doc_id & _LOCAL_MASK, phrase)
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        return self.parts[doc_id >> SEGMENT_SHIFT][0].documents[doc_id & _LOCAL_MASK]
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        for i, (index, dead, _) in enumerate(self.parts):
+            for doc_id in range(len(index.documents)):
+                if doc_id not in dead:
+                    yield self.document((i << SEGMENT_SHIFT) | doc_id)
+
+
+class SegmentedPassageIndex(SegmentedIndex):
+    """SegmentedIndex ของ passage: 'section' ของ passage เป็น doc_id ของ section ใน snapshot เดียวกัน"""
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        passage = super().document(doc_id)
+        base = doc_id >> SEGMENT_SHIFT << SEGMENT_SHIFT
+        return dict(passage, section=base | passage["section"])
+
+
+class StoreSnapshot:
+    """
+    knowledge base ณ version หนึ่ง (ไม่ถูกแก้ไขหลัง publish)
+    - version: เพิ่มขึ้นทุกครั้งที่ publish (0 = ยังไม่ได้โหลด)
+    - sections: index ของ section (ใช้แทน rag.get_rag_index)
+    - passages: index ของ passage (ใช้แทน rag.get_passage_index) สร้างเมื่อใช้ครั้งแรก
+    """
+
+    def __init__(self, version: int, segments: List[Segment], deleted: Dict[Segment, FrozenSet[int]]):
+        self.version = version
+        self.segments = tuple(segments)
+        self.deleted = dict(deleted)
+        # segment เดียวที่ไม่มี tombstone (เช่นหลังโหลดครั้งแรก) ใช้ index ของ segment ได้โดยตรง
+        self._single = len(segments) == 1 and not self.deleted.get(segments[0])
+        if self._single:
+            self.sections: BM25Scorer = segments[0].sections
+        else:
+            self.sections = SegmentedIndex(
+                [(seg.sections, self.deleted.get(seg, frozenset()), seg.section_length) for seg in segments]
+            )
+        self._passages: Optional[BM25Scorer] = None
+        self._passages_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    @property
+    def passages(self) -> BM25Scorer:
+        if self._passages is None:
+            with self._passages_lock:
+                if self._passages is None and self._single:
+                    self._passages = self.segments[0].passages
+                elif self._passages is None:
+                    self._passages = SegmentedPassageIndex([
+                        (seg.passages, frozenset(seg.passage_ids(self.deleted.get(seg, ()))), seg.passage_length)
+                        for seg in self.segments
+                    ])
+        return self._passages
+
+
+@dataclass
+class UpdateStats:
+    """สถิติของ refresh() หนึ่งครั้ง"""
+    version: int = 0
+    files: int = 0
+    added: int = 0
+    removed: int = 0
+    segments: int = 0
+    seconds: float = 0.0
+
+    def report(self) -> str:
+        return (
+            f"Knowledge base v{self.version}: {self.files} files changed, "
+            f"{self.added} sections indexed, {self.removed} removed, "
+            f"{self.segments} segments in {self.seconds * 1000:.1f}ms"
+        )
+
+
+class DocumentStore:
+    """
+    knowledge base แบบ Markdown (ไฟล์เดียวหรือโฟลเดอร์ของไฟล์ *.md) ที่ index ใหม่เฉพาะ section ที่เปลี่ยน
+    - path: path ของไฟล์หรือโฟลเดอร์
+    - workers: จำนวน process สำหรับ parse เมื่อมีหลายไฟล์เปลี่ยนพร้อมกัน (เช่นตอนโหลดครั้งแรก)
+    - max_passage_chars: ความยาวสูงสุดของ passage
+    - on_publish: callback(snapshot) ที่ถูกเรียกหลัง publish snapshot ใหม่ (ใน thread ที่เรียก refresh)
+    snapshot() เรียกได้จากทุก thread โดยไม่ใช้ lock ส่วน refresh() ทำทีละครั้ง
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 1,
+        max_passage_chars: int = PASSAGE_MAX_CHARS,
+        on_publish: Optional[Callable[[StoreSnapshot], None]] = None,
+    ):
+        self.path = path
+        self.workers = workers
+        self._root = os.path.normpath(path)
+        self.max_passage_chars = max_passage_chars
+        self.on_publish = on_publish
+        self.last_update: Optional[UpdateStats] = None
+        self.last_error: Optional[BaseException] = None
+        self._snapshot = StoreSnapshot(0, [], {})
+        self._write_lock = threading.Lock()
+        # สถานะของ writer (ผู้อ่านใช้เฉพาะ snapshot ที่ publish แล้ว)
+        # - _file_stats: ไฟล์ -> (ขนาด, mtime_ns) ตอน parse ล่าสุด
+        # - _file_hashes: ไฟล์ -> hash ของ section ตามลำดับในไฟล์
+        # - _locations: hash -> ตำแหน่ง (segment, doc_id) ที่ยังไม่ถูกลบ (section ซ้ำกันได้หลายตำแหน่ง)
+        self._file_stats: Dict[str, Tuple[int, int]] = {}
+        self._file_hashes: Dict[str, List[str]] = {}
+        self._locations: Dict[str, List[Tuple[Segment, int]]] = {}
+        self._segments: List[Segment] = []
+        self._deleted: Dict[Segment, FrozenSet[int]] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def snapshot(self) -> StoreSnapshot:
+        """snapshot ล่าสุดที่ publish แล้ว (อ่านได้ต่อเนื่องแม้จะมีการ refresh ระหว่างนั้น)"""
+        return self._snapshot
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> bool:
+        """
+        index ใหม่เฉพาะ section ของไฟล์ที่เพิ่ม แก้ไข หรือลบตั้งแต่ครั้งก่อน แล้ว publish snapshot ใหม่
+        - paths: ไฟล์ (หรือโฟลเดอร์ย่อย) ที่รู้ว่าเปลี่ยน เช่นจาก editor หรือ file-system event
+          ตรวจเฉพาะ path เหล่านี้แทนการ stat ทุกไฟล์ (None = ตรวจทั้ง knowledge base)
+        คืนค่า True ถ้ามีการเปลี่ยนแปลง
+        """
+        with self._write_lock:
+            started = time.perf_counter()
+            first = self._snapshot.version == 0
+            if first and not os.path.exists(self.path):
+                raise FileNotFoundError(f"Knowledge base not found: {self.path}")
+            changed = self._scan(None if first else paths)
+            if not changed and not first:
+                return False
+
+            # parse ไฟล์ที่เปลี่ยน (ไฟล์ที่ถูกลบไม่มี section)
+            parsed: Dict[str, List[Dict[str, str]]] = {name: [] for name, st in changed.items() if st is None}
+            files = [name for name, st in changed.items() if st is not None]
+            for name, docs, _ in parse_files(files, self.workers):
+                parsed[name] = docs
+
+            # เทียบ hash ของ section เดิมกับใหม่รวมทุกไฟล์ที่เปลี่ยน: section ที่ hash ตรงกันไม่ถูก index ใหม่
+            removed: Counter = Counter()
+            file_hashes: Dict[str, List[str]] = {}
+            for name, docs in parsed.items():
+                file_hashes[name] = [section_hash(doc) for doc in docs]
+                removed.update(self._file_hashes.get(name, ()))
+            added_docs: List[Dict[str, str]] = []
+            added_hashes: List[str] = []
+            for name, docs in parsed.items():
+                for doc, digest in zip(docs, file_hashes[name]):
+                    if removed[digest] > 0:
+                        removed[digest] -= 1
+                    else:
+                        added_docs.append(doc)
+                        added_hashes.append(digest)
+            removed = +removed
+
+            # สร้าง segment ใหม่แยกไว้ (ผู้อ่านยังใช้ snapshot เดิม)
+            segments = list(self._segments)
+            deleted = dict(self._deleted)
+            if added_docs:
+                # ถ้ามีการค้นหาระดับ passage แล้ว สร้าง passage ของ segment ใหม่ไว้เลย (ไม่ให้ผู้อ่านรอ)
+                with_passages = any(seg.has_passages for seg in segments)
+                segment = Segment.build(added_docs, added_hashes, self.max_passage_chars, with_passages)
+                segments.append(segment)
+                for doc_id, digest in enumerate(added_hashes):
+                    self._locations.setdefault(digest, []).append((segment, doc_id))
+
+            # tombstone ของ section ที่ถูกลบหรือแก้ไข
+            tombstones: Dict[Segment, set] = {}
+            for digest, count in removed.items():
+                locations = self._locations[digest]
+                for _ in range(count):
+                    seg, doc_id = locations.pop()
+                    tombstones.setdefault(seg, set()).add(doc_id)
+                if not locations:
+                    del self._locations[digest]
+            for seg, doc_ids in tombstones.items():
+                deleted[seg] = deleted.get(seg, frozenset()) | doc_ids
+
+            segments = self._compact(segments, deleted)
+            for name, st in changed.items():
+                if st is None:
+                    self._file_stats.pop(name, None)
+                    self._file_hashes.pop(name, None)
+                else:
+                    self._file_stats[name] = st
+                    self._file_hashes[name] = file_hashes[name]
+            self._segments = segments
+            self._deleted = deleted
+
+            # publish: สลับ reference ครั้งเดียว ผู้อ่านเห็นทั้ง snapshot ใหม่หรือทั้ง snapshot เดิมเท่านั้น
+            snapshot = StoreSnapshot(self._snapshot.version + 1, segments, deleted)
+            self._snapshot = snapshot
+            self.last_update = UpdateStats(
+                version=snapshot.version,
+                files=len(changed),
+                added=len(added_docs),
+                removed=sum(removed.values()),
+                segments=len(segments),
+                seconds=time.perf_counter() - started,
+            )
+            if self.on_publish is not None:
+                self.on_publish(snapshot)
+            return True
+
+    def watch(self, poll_seconds: float = DEFAULT_POLL_SECONDS) -> None:
+        """เริ่ม thread เบื้องหลังที่เรียก refresh() ทุก poll_seconds (เรียกซ้ำไม่มีผล)"""
+        with self._write_lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(
+                target=self._watch_loop, args=(poll_seconds,), name="rag-store-watch", daemon=True
+            )
+            self._watcher.start()
+
+    def close(self) -> None:
+        """หยุด thread ของ watch()"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _watch_loop(self, poll_seconds: float) -> None:
+        while not self._stop.wait(poll_seconds):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # เช่นไฟล์ที่กำลังถูกเขียนอยู่: เก็บ error ไว้แล้วลองใหม่รอบถัดไป (snapshot เดิมยังใช้ได้)
+                self.last_error = e
+
+    def _scan(self, paths: Optional[Iterable[str]] = None) -> Dict[str, Optional[Tuple[int, int]]]:
+        # ไฟล์ที่เพิ่มหรือแก้ไข (ขนาด, mtime_ns) และไฟล์ที่ถูกลบ (None) เทียบกับการ parse ครั้งก่อน
+        if paths is None:
+            files = iter_markdown_files([self._root]) if os.path.isdir(self._root) else [self._root]
+            missing = set(self._file_stats)
+        else:
+            files = [name for name in iter_markdown_files(os.path.normpath(p) for p in paths) if self._owns(name)]
+            missing = {name for name in files if name in self._file_stats}
+        changed: Dict[str, Optional[Tuple[int, int]]] = {}
+        for name in files:
+            try:
+                st = os.stat(name)
+            except OSError:
+                continue
+            missing.discard(name)
+            key = (st.st_size, st.st_mtime_ns)
+            if self._file_stats.get(name) != key:
+                changed[name] = key
+        for name in missing:
+            changed[name] = None
+        return changed
+
+    def _owns(self, name: str) -> bool:
+        # ไฟล์เป็นส่วนหนึ่งของ knowledge base หรือไม่ (ใช้กรอง paths ที่ส่งให้ refresh)
+        if name == self._root or name in self._file_stats:
+            return True
+        return name.endswith(".md") and os.path.isdir(self._root) and (
+            os.path.commonpath([os.path.abspath(self._root), os.path.abspath(name)]) == os.path.abspath(self._root)
+        )
+
+    def _compact(self, segments: List[Segment], deleted: Dict[Segment, FrozenSet[int]]) -> List[Segment]:
+        # รวม segment แบบ size-tiered: เขียน segment ที่มี tombstone มากใหม่ แล้วรวม segment ท้าย
+        # ที่ขนาดใกล้กัน ค่าใช้จ่ายของการรวมเฉลี่ยแล้วเป็น O(log n) ต่อ section
+        def live(seg: Segment) -> int:
+            return len(seg) - len(deleted.get(seg, ()))
+
+        compacted = []
+        for seg in segments:
+            if live(seg) == 0:
+                deleted.pop(seg, None)
+            elif len(deleted.get(seg, ())) > MAX_DEAD_RATIO * len(seg):
+                compacted.append(self._merge([seg], deleted))
+            else:
+                compacted.append(seg)
+        while len(compacted) > 1 and (
+            len(compacted) > MAX_SEGMENTS or live(compacted[-2]) <= MERGE_RATIO * live(compacted[-1])
+        ):
+            compacted[-2:] = [self._merge(compacted[-2:], deleted)]
+        return compacted
+
+    def _merge(self, segments: List[Segment], deleted: Dict[Segment, FrozenSet[int]]) -> Segment:
+        # รวม segment โดยตัด section ที่ถูกลบทิ้ง แล้วย้ายตำแหน่งของ section ไปยัง segment ใหม่
+        parts = []
+        for seg in segments:
+            dead = deleted.pop(seg, frozenset())
+            parts.append((seg, [doc_id for doc_id in range(len(seg)) if doc_id not in dead]))
+        merged = Segment.merge(parts)
+        new_id = 0
+        for seg, keep in parts:
+            for doc_id in keep:
+                locations = self._locations[seg.hashes[doc_id]]
+                locations[locations.index((seg, doc_id))] = (merged, new_id)
+                new_id += 1
+        return merged
@@ -0,0 +1,137 @@
+# rag_vector.py
+"""
+โหมดค้นหาแบบ vector (hashed TF-IDF) สำหรับ RAG ที่ทำงานแบบ offline ทั้งหมด
+
+- แต่ละเอกสารถูกแปลงเป็น feature: คำทั้งคำ + character n-gram ของแต่ละคำ
+  แล้ว hash ลง vector ขนาดคงที่ (hashing trick) จึงไม่ต้องเก็บ vocabulary
+- n-gram ทำให้คำที่สะกดต่างกันเล็กน้อย (benefit / benefits) ยังได้คะแนน
+- ให้คะแนนคำค้นหาด้วย matrix-vector product ครั้งเดียว และเลือก top-k ด้วย argpartition
+
+ต้องติดตั้ง NumPy (pip install numpy)
+"""
+from typing import Dict, List, Optional, Tuple
+import threading
+import zlib
+
+from rag import BM25Scorer, get_rag_index, rag_tokenize
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("Search mode 'tfidf' requires NumPy: pip install numpy") from e
+    return np
+
+
+class HashedTfidfIndex:
+    """
+    Hashed TF-IDF matrix (n_docs x n_features) ที่ normalize แต่ละแถวแล้ว
+    - n_features: ขนาด vector (ควรเป็นเลขยกกำลัง 2) หน่วยความจำที่ใช้ = n_docs * n_features * 4 bytes
+    - char_ngram: ความยาว character n-gram (0 = ใช้เฉพาะคำทั้งคำ)
+    """
+
+    # title มีน้ำหนักมากกว่า content 2 เท่า (เหมือน BM25Index)
+    TITLE_WEIGHT = 2
+
+    def __init__(self, documents: List[Dict[str, str]], n_features: int = 1024, char_ngram: int = 3):
+        np = _require_numpy()
+        self.documents = list(documents)
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+
+        counts = np.zeros((len(self.documents), n_features), dtype=np.float32)
+        for doc_id, doc in enumerate(self.documents):
+            self._add_features(counts[doc_id], doc["content"], 1.0)
+            self._add_features(counts[doc_id], doc["title"], float(self.TITLE_WEIGHT))
+
+        # IDF แบบ smooth และ sublinear TF: (1 + log tf) * idf
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(self.documents)) / (1 + df)) + 1).astype(np.float32)
+        self.matrix = self._weight(counts)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _features(self, text: str) -> List[int]:
+        # แปลงข้อความเป็น index ของ feature (crc32 ให้ผลเหมือนกันทุก process ต่างจาก hash())
+        n_features = self.n_features
+        features = []
+        for token in rag_tokenize(text):
+            features.append(zlib.crc32(b"w:" + token.encode("utf-8")) % n_features)
+            if self.char_ngram and len(token) > self.char_ngram:
+                padded = f"<{token}>"
+                for i in range(len(padded) - self.char_ngram + 1):
+                    gram = padded[i:i + self.char_ngram]
+                    features.append(zlib.crc32(b"c:" + gram.encode("utf-8")) % n_features)
+        return features
+
+    def _add_features(self, row, text: str, weight: float) -> None:
+        for feature in self._features(text):
+            row[feature] += weight
+
+    def _weight(self, counts):
+        np = _require_numpy()
+        weighted = np.zeros_like(counts)
+        nonzero = counts > 0
+        weighted[nonzero] = 1 + np.log(counts[nonzero])
+        weighted *= self.idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return weighted / norms
+
+    def vectorize(self, queries: List[str]):
+        """แปลงคำค้นหาเป็น matrix (n_queries x n_features) ด้วยน้ำหนักเดียวกับเอกสาร"""
+        np = _require_numpy()
+        counts = np.zeros((len(queries), self.n_features), dtype=np.float32)
+        for i, query in enumerate(queries):
+            self._add_features(counts[i], query, 1.0)
+        return self._weight(counts)
+
+    def _top_k(self, scores, top_k: int) -> List[Tuple[float, Dict[str, str]]]:
+        np = _require_numpy()
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        # argpartition หา top-k แบบ O(n) แล้วค่อย sort เฉพาะ k ตัว
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(float(scores[i]), self.documents[i]) for i in candidates if scores[i] > 0]
+
+    def search_scored(self, query: str, top_k: int = 1) -> List[Tuple[float, Dict[str, str]]]:
+        """ค้นหาด้วย cosine similarity และคืนค่าเป็น list ของ (score, document)"""
+        query_vec = self.vectorize([query])[0]
+        return self._top_k(self.matrix @ query_vec, top_k)
+
+    def search(self, query: str, top_k: int = 1) -> List[Dict[str, str]]:
+        """ค้นหาด้วย cosine similarity และคืนค่าเฉพาะ document"""
+        return [doc for _, doc in self.search_scored(query, top_k)]
+
+    def search_batch(self, queries: List[str], top_k: int = 1) -> List[List[Dict[str, str]]]:
+        """ให้คะแนนทุกคำค้นหาด้วย matrix-matrix product ครั้งเดียว"""
+        if not queries:
+            return []
+        scores = self.matrix @ self.vectorize(queries).T  # (n_docs x n_queries)
+        return [[doc for _, doc in self._top_k(scores[:, i], top_k)] for i in range(len(queries))]
+
+
+# index ที่สร้างแล้วในแต่ละ process (key คือ path ของ knowledge base) พร้อม index ของ section ที่ใช้สร้าง
+_vector_indexes: Dict[Optional[str], Tuple[BM25Scorer, HashedTfidfIndex]] = {}
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index(file_path: Optional[str] = None) -> HashedTfidfIndex:
+    """
+    คืนค่า HashedTfidfIndex ของ knowledge base
+    - file_path: path เดียวกับที่ใช้กับ rag.get_rag_index (Markdown หรือ index ที่ compile แล้ว)
+    สร้างใหม่ทั้งหมดเมื่อ get_rag_index คืน snapshot ใหม่ (knowledge base แบบ Markdown ถูกแก้ไข)
+    """
+    source: BM25Scorer = get_rag_index(file_path)
+    entry = _vector_indexes.get(file_path)
+    if entry is None or entry[0] is not source:
+        with _vector_index_lock:
+            entry = _vector_indexes.get(file_path)
+            if entry is None or entry[0] is not source:
+                entry = (source, HashedTfidfIndex(list(source.iter_documents())))
+                _vector_indexes[file_path] = entry
+    return entry[1]
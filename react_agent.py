@@ -1,69 +1,355 @@
-from typing import List, Dict
-from agent_actions import search_context, call_web_search
-from constant import GOOGLE_GEMINI_API_KEY, GOOGLE_GEMINI_MODEL_NAME
-
-import google.generativeai as genai
-import json
-import re
-import os
+from typing import Callable, Iterator, List, Dict, Optional
+from agent_logging import AgentLogger
+from answer_cache import AnswerCache
+from agent_actions import search_context, call_web_search, asearch_context, acall_web_search
+from tool_cache import get_tool_executor, run_in_tool_executor
+from json_stream import DecisionStream
+from llm_cache import LLMCache
+from llm_governor import LLMGovernor, LLMUnavailableError, estimate_tokens, get_llm_governor
+from observation_store import ObservationStore
+from parallel_tools import ParallelRun, ToolCallResult, arun_parallel, astart_call, run_parallel, submit_call
+from router import RetrievalRouter, RouteDecision
+from run_context import RunContext, activate_run, current_run
+from streaming import StreamCancelled, StreamTimings, TokenCallback, iter_callback
+from tracing import Trace, current_span, record_llm_usage, span, start_trace
+
+import constant
+import threading
 from datetime import datetime
 
-# ตั้งค่า Google Gemini API
-genai.configure(api_key=GOOGLE_GEMINI_API_KEY)
-gemini_client = genai.GenerativeModel(GOOGLE_GEMINI_MODEL_NAME)
+_gemini_client_lock = threading.Lock()
+
+
+def get_gemini_client():
+    """
+    คืนค่า Gemini client ที่ใช้ร่วมกันทั้ง process (สร้างเมื่อเรียกครั้งแรก)
+    import google.generativeai และ genai.configure ถูกเลื่อนมาไว้ที่นี่
+    เพื่อให้ process ที่ไม่ได้เรียก Gemini (เช่นใช้ llm_client อื่น) เริ่มทำงานได้เร็ว
+    ถ้ากำหนด react_agent.gemini_client เอง (เช่นใน test) จะใช้ค่านั้นแทน
+    """
+    client = globals().get("gemini_client")
+    if client is None:
+        with _gemini_client_lock:
+            client = globals().get("gemini_client")
+            if client is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=constant.GOOGLE_GEMINI_API_KEY)
+                client = genai.GenerativeModel(constant.GOOGLE_GEMINI_MODEL_NAME)
+                globals()["gemini_client"] = client
+    return client
+
+
+def __getattr__(name: str):
+    # react_agent.gemini_client ยังใช้ได้เหมือนเดิม แต่สร้าง client เมื่อถูกอ่านครั้งแรก
+    if name == "gemini_client":
+        return get_gemini_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ReActAgent:
-    def __init__(self, max_steps: int = 5, enable_logging: bool = True):
-        self.observations: List[str] = []
+    """
+    ReAct Agent แบบเขียนเอง (loop ควบคุมด้วยมือ)
+    - run(): ทำงานแบบ blocking
+    - arun(): coroutine ที่ใช้ Gemini แบบ async และ tool แบบ async
+    - state ของแต่ละ run (observations, log, timings, trace) อยู่ใน RunContext (ดู run_context.py)
+      instance เดียวจึงเรียก run()/arun() จากหลาย thread หรือหลาย task พร้อมกันได้
+      self.observations / self.timings / self.last_trace คืนค่าของ run ปัจจุบัน
+      (หรือ run ล่าสุดของ thread/task นั้น, ถ้าไม่มีคือ run ที่จบล่าสุดของ instance)
+    - แต่ละ step LLM เลือกได้หลาย action ซึ่งจะถูกรันพร้อมกัน
+      (ไม่เกิน max_parallel_actions ตัว และมี timeout ต่อ tool ตาม tool_timeouts)
+    - observations ถูก clean ครั้งเดียวตอนเพิ่มและจำกัดขนาดไม่เกิน max_observation_chars
+      (ตัดส่วนเกินตาม observation_policy: "recency" หรือ "relevance")
+    - run(on_token=...) / stream(): ส่งคำตอบสุดท้ายทีละส่วนทันทีที่ Gemini สร้าง
+      เวลา TTFT และเวลาสร้างคำตอบอยู่ใน self.timings
+    - ก่อนเข้า ReAct loop จะค้นหา knowledge base ล่วงหน้า ถ้าผลลัพธ์มั่นใจถึง router_threshold
+      จะสร้างคำตอบทันทีโดยไม่ต้องเรียก LLM เพื่อ reasoning (None = ปิด router)
+    - ทุก run ถูกบันทึกเป็น trace (run -> step -> reason/act -> llm/tool) ดูได้จาก self.last_trace
+      และเขียนต่อท้ายไฟล์ JSONL ที่ trace_path ถ้ากำหนด (ดู tracing.py)
+    - log ถูกส่งให้ thread เบื้องหลังเขียนเป็น JSONL หมุนเวียนใน data/debug (ดู agent_logging.py)
+      กรองด้วย log_level และสุ่มเก็บเป็นราย run ด้วย log_sample_rate
+    - answer_cache: ถ้ากำหนด คำถามที่เคยตอบแล้ว (หรือคล้ายพอ) ได้คำตอบจาก cache ทันที
+      โดยไม่เข้า ReAct loop (ดู answer_cache.py)
+    - decision ของแต่ละ step ถูก stream และ parse ทีละส่วน (json_stream.py): tool เริ่มทำงานทันทีที่
+      action และ query ของมันครบ และไม่รอข้อความที่เหลือของ LLM เมื่อ decision ครบแล้ว
+      JSON ที่มี code fence หรือไม่สมบูรณ์ถูกซ่อมแทนการเสีย step
+    - ทุกการเรียก Gemini ผ่าน llm_governor (rate limit, retry/backoff, circuit breaker ดู llm_governor.py)
+      ถ้า Gemini ไม่พร้อมใช้งานหลังลองใหม่ครบ run() จะ raise LLMUnavailableError แทนการคืนคำตอบที่ผิด
+    """
+
+    def __init__(
+        self,
+        max_steps: int = 5,
+        enable_logging: bool = True,
+        llm_cache: Optional[LLMCache] = None,
+        max_parallel_actions: int = 4,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        max_observation_chars: Optional[int] = 8000,
+        observation_policy: str = "recency",
+        router_threshold: Optional[float] = 0.75,
+        trace_path: Optional[str] = None,
+        llm_client=None,
+        log_level: str = "info",
+        log_sample_rate: float = 1.0,
+        answer_cache: Optional[AnswerCache] = None,
+        llm_governor: Optional[LLMGovernor] = None,
+    ):
+        # ขนาดสูงสุดของ observations ใน prompt (None = ไม่จำกัด)
+        self.max_observation_chars = max_observation_chars
+        self.observation_policy = observation_policy
         self.max_steps = max_steps
         self.enable_logging = enable_logging
-        self.log_lines: List[str] = []
+        self.logger = AgentLogger("react_agent", level=log_level, sample_rate=log_sample_rate)
+        # cache ของคำตอบจาก LLM (None = ไม่ใช้ cache)
+        self.llm_cache = llm_cache
+        # cache ของคำตอบสุดท้ายที่ข้าม ReAct loop ทั้งหมดสำหรับคำถามซ้ำ (None = ไม่ใช้)
+        self.answer_cache = answer_cache
+        # การรันหลาย action พร้อมกันใน step เดียว (None = ใช้ DEFAULT_TOOL_TIMEOUTS)
+        self.max_parallel_actions = max_parallel_actions
+        self.tool_timeouts = tool_timeouts
+        # pre-router ที่ข้าม reasoning เมื่อผลการค้นหา knowledge base ชัดเจน
+        self.router = RetrievalRouter(threshold=router_threshold) if router_threshold is not None else None
+        # ไฟล์ JSONL ที่เขียน trace ของทุก run ต่อท้าย (None = ไม่เขียน)
+        self.trace_path = trace_path
+        # client ที่ใช้แทน gemini_client (เช่น fake ใน benchmarks/) None = ใช้ gemini_client
+        self.llm_client = llm_client
+        # ตัวควบคุมการเรียก Gemini (None = ใช้ governor ที่ใช้ร่วมกันทั้ง process)
+        self.llm_governor = llm_governor
+        # run ที่จบล่าสุด (ใช้เมื่อ context ปัจจุบันไม่มี run ของ agent นี้)
+        self.last_run = self._new_run("")
 
     # -------------------------
-    # Logging helpers
+    # State ของ run (request-scoped)
     # -------------------------
-    def log(self, message: str):
-        if self.enable_logging:
-            self.log_lines.append(message)
-            print(message)
+    def _new_run(self, user_input: str, on_token: Optional[TokenCallback] = None) -> RunContext:
+        return RunContext(
+            owner=self,
+            question=user_input,
+            log=self.logger.start_run(),
+            observations=ObservationStore(
+                self.max_observation_chars, policy=self.observation_policy, question=user_input
+            ),
+            on_token=on_token,
+        )
+
+    @property
+    def run_context(self) -> RunContext:
+        return current_run(self) or self.last_run
+
+    @property
+    def observations(self) -> ObservationStore:
+        return self.run_context.observations
+
+    @property
+    def timings(self) -> StreamTimings:
+        return self.run_context.timings
+
+    @property
+    def last_trace(self) -> Optional[Trace]:
+        return self.run_context.trace
+
+    @property
+    def parallel_time_saved(self) -> float:
+        return self.run_context.parallel_time_saved
+
+    @property
+    def llm_calls_avoided(self) -> int:
+        return self.run_context.llm_calls_avoided
 
     # -------------------------
-    # Save log to file (output data/debug/<file>.md)
+    # Logging helpers
     # -------------------------
-    def save_log(self):
-        output_dir = "data/debug"
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = f"{output_dir}/react_agent_log_{timestamp}.md"
-        
-        # สร้างโฟลเดอร์ถ้ายังไม่มี
-        os.makedirs(output_dir, exist_ok=True)
-        
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write("\n".join(self.log_lines))
+    def log(self, message: str, level: str = "info", **fields):
+        # ไม่ block: record ถูกเขียน (และ print) โดย thread ของ agent_logging
+        if self.enable_logging:
+            self.run_context.log.log(message, level, **fields)
+
+    @property
+    def log_lines(self) -> List[str]:
+        # ข้อความของ run (ไม่เกิน logger.max_lines บรรทัด)
+        return list(self.run_context.log.lines)
 
     # -------------------------
-    # Reasoning step
+    # LLM call (ผ่าน cache ถ้าเปิดใช้)
     # -------------------------
-    def reason(self, user_input: str, observations: List[str], step: int) -> Dict[str, str]:
+    @property
+    def client(self):
+        return self.llm_client if self.llm_client is not None else get_gemini_client()
+
+    @property
+    def governor(self) -> LLMGovernor:
+        return self.llm_governor if self.llm_governor is not None else get_llm_governor()
+
+    def _cache_lookup(self, prompt: str, config: Dict):
+        # คืนค่า (key, ข้อความที่ cache ไว้) โดย key เป็น None เมื่อไม่ได้เปิดใช้ cache
+        if self.llm_cache is None:
+            return None, None
+        key = LLMCache.make_key(constant.GOOGLE_GEMINI_MODEL_NAME, prompt, config)
+        cached = self.llm_cache.get(key)
+        current_span().set(cache_hit=cached is not None)
+        if cached is not None:
+            current_span().set(response_chars=len(cached))
+        return key, cached
+
+    def _cache_store(self, key: Optional[str], text: Optional[str], response=None) -> str:
+        # บันทึกข้อความตอบกลับลง cache (และขนาด/จำนวน token ลง span ของ LLM call)
+        if not text:
+            raise ValueError("No text returned from LLM")
+        s = current_span()
+        s.set(response_chars=len(text))
+        record_llm_usage(s, response)
+        if key is not None:
+            self.llm_cache.set(key, text)
+        return text
+
+    @staticmethod
+    def _llm_span(prompt: str, config: Dict, stream: bool = False):
+        # span ของการเรียก Gemini หนึ่งครั้ง
+        return span(constant.GOOGLE_GEMINI_MODEL_NAME, "llm", prompt_chars=len(prompt), stream=stream, **config)
+
+    def _generate(self, prompt: str, temperature: float, max_output_tokens: int) -> str:
         """
-        LLM reasoning - let AI decide what to do based on the query type and current observations
+        เรียก Gemini และคืนค่าข้อความตอบกลับ
+        ถ้ามี llm_cache จะใช้ผลลัพธ์เดิมเมื่อ prompt และ config ตรงกัน
         """
+        config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        with self._llm_span(prompt, config):
+            key, cached = self._cache_lookup(prompt, config)
+            if cached is not None:
+                return cached
+
+            response = self.governor.call(
+                lambda: self.client.generate_content(prompt, generation_config=config),
+                tokens=estimate_tokens(len(prompt), max_output_tokens),
+            )
+            return self._cache_store(key, getattr(response, "text", None), response)
+
+    async def _agenerate(self, prompt: str, temperature: float, max_output_tokens: int) -> str:
+        """เหมือน _generate แต่เรียก Gemini แบบ async (ไม่ block event loop)"""
+        config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        with self._llm_span(prompt, config):
+            key, cached = self._cache_lookup(prompt, config)
+            if cached is not None:
+                return cached
+
+            response = await self.governor.acall(
+                lambda: self.client.generate_content_async(prompt, generation_config=config),
+                tokens=estimate_tokens(len(prompt), max_output_tokens),
+            )
+            return self._cache_store(key, getattr(response, "text", None), response)
+
+    @staticmethod
+    def _stop_stream(response) -> None:
+        # ปิด stream ที่ยังไม่จบ (ถ้า client รองรับ) ข้อความที่เหลือจะไม่ถูกรับ
+        current_span().set(stopped_early=True)
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
+
+    @staticmethod
+    async def _astop_stream(response) -> None:
+        current_span().set(stopped_early=True)
+        close = getattr(response, "aclose", None)
+        if close is not None:
+            await close()
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        # chunk ที่ไม่มี text (เช่นถูก safety filter) จะ raise ValueError
+        try:
+            return chunk.text or ""
+        except ValueError:
+            return ""
+
+    def _generate_stream(
+        self,
+        prompt: str,
+        temperature: float,
+        max_output_tokens: int,
+        on_token: TokenCallback,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """
+        เหมือน _generate แต่ส่งข้อความทีละส่วนให้ on_token ทันทีที่ได้รับจาก Gemini
+        คำตอบจาก cache จะถูกส่งเป็นส่วนเดียว
+        - stop: ถ้าคืนค่า True หลังส่วนใด จะหยุดรับส่วนที่เหลือและคืนค่าข้อความที่ได้ถึงตอนนั้น
+        """
+        config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        with self._llm_span(prompt, config, stream=True):
+            key, cached = self._cache_lookup(prompt, config)
+            if cached is not None:
+                on_token(cached)
+                return cached
+
+            parts = []
+
+            def generate():
+                response = self.client.generate_content(prompt, generation_config=config, stream=True)
+                chunk = None
+                for chunk in response:
+                    text = self._chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        on_token(text)
+                    if stop is not None and stop():
+                        self._stop_stream(response)
+                        break
+                # chunk สุดท้ายมี usage_metadata ของทั้งคำตอบ
+                return chunk
+
+            # ลองใหม่ได้เฉพาะเมื่อยังไม่ได้ส่งข้อความส่วนใดให้ on_token
+            chunk = self.governor.call(
+                generate, tokens=estimate_tokens(len(prompt), max_output_tokens), can_retry=lambda: not parts
+            )
+            return self._cache_store(key, "".join(parts), chunk)
+
+    async def _agenerate_stream(
+        self,
+        prompt: str,
+        temperature: float,
+        max_output_tokens: int,
+        on_token: TokenCallback,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """_generate_stream แบบ async"""
+        config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        with self._llm_span(prompt, config, stream=True):
+            key, cached = self._cache_lookup(prompt, config)
+            if cached is not None:
+                on_token(cached)
+                return cached
 
-        # -------------------------
-        # Clean ข้อมูล observations สำหรับ input ของ LLM
-        # -------------------------
-        # กรองเอา HTML tags ออกและไม่รวม "FINAL_STEP" 
-        obs_texts = [re.sub(r"<[^>]+>", "", o) for o in observations if o != "FINAL_STEP"]
-        # รวมข้อความทั้งหมดเป็นข้อความเดียว
-        obs_text = " ".join(obs_texts)
-        # ลบช่องว่างเกินและทำให้เป็นรูปแบบมาตรฐาน
-        obs_text = re.sub(r"\s+", " ", obs_text).strip()
+            parts = []
+
+            async def generate():
+                response = await self.client.generate_content_async(prompt, generation_config=config, stream=True)
+                chunk = None
+                async for chunk in response:
+                    text = self._chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        on_token(text)
+                    if stop is not None and stop():
+                        await self._astop_stream(response)
+                        break
+                return chunk
+
+            chunk = await self.governor.acall(
+                generate, tokens=estimate_tokens(len(prompt), max_output_tokens), can_retry=lambda: not parts
+            )
+            return self._cache_store(key, "".join(parts), chunk)
+
+    # -------------------------
+    # Reasoning step
+    # -------------------------
+    def _build_reason_prompt(self, user_input: str, observations: ObservationStore, step: int) -> str:
+        # observations ถูก clean (ลบ HTML tags, normalize ช่องว่าง) ไว้แล้วตอนเพิ่มเข้า store
+        obs_text = observations.text()
 
         # สร้าง prompt สำหรับให้ LLM ตัดสินใจ
-        prompt = f"""
+        return f"""
         You are a ReAct Agent AI assistant. Analyze the current situation and decide the next action.
-        
+
         Current observations: {obs_text if obs_text else "No observations yet"}
         User question: {user_input}
         Current step: {step}
@@ -78,98 +364,220 @@ class ReActAgent:
         - If observations exist, evaluate if they provide sufficient information
         - Consider whether the question requires real-time/current information vs historical/factual information
         - Think about the most logical sequence of actions to answer the question effectively
-        
-        Respond in JSON format: 
-        
+
+        Respond in JSON format: {{"action": "<action>", "query": "<query>"}}
+        If several independent searches are needed, request them together so they run in parallel:
+        {{"actions": [{{"action": "search_context", "query": "<query>"}}, {{"action": "web_search", "query": "<query>"}}]}}
+
         Query field should contain:
         - For 'search_context': search keywords or phrases for the knowledge base
         - For 'web_search': search query for the internet
         - For 'final_answer': the original user question being answered
         """
+
+    def reason(self, user_input: str, observations: ObservationStore, step: int) -> Dict[str, str]:
+        """
+        LLM reasoning - let AI decide what to do based on the query type and current observations
+        decision ถูก parse ระหว่าง stream: tool ของ action ที่ครบแล้วเริ่มทำงานทันที (ดู _dispatch_early)
+        """
+        prompt = self._build_reason_prompt(user_input, observations, step)
+        decision_stream = DecisionStream(on_action=self._dispatch_early)
         try:
             # เรียกใช้ Gemini AI เพื่อตัดสินใจการกระทำต่อไป
-            response = gemini_client.generate_content(
+            self._generate_stream(
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.2,  # ใช้ความสร้างสรรค์ปานกลาง
-                    max_output_tokens=500  # จำกัด token สำหรับการตอบกลับ
-                )
+                temperature=0.2,  # ใช้ความสร้างสรรค์ปานกลาง
+                max_output_tokens=500,  # จำกัด token สำหรับการตอบกลับ
+                on_token=decision_stream.feed,
+                stop=lambda: decision_stream.settled,  # ไม่ต้องรอข้อความหลัง decision (เช่น code fence ปิดท้าย)
             )
-
-            # ดึงข้อความจาก response
-            text = getattr(response, "text", None)
-            if not text:
-                raise ValueError("No text returned from LLM")
-            # ลบ code block markers ออกจาก JSON response
-            text = re.sub(r"^```json|```$", "", text, flags=re.MULTILINE).strip()
-            # แปลง JSON string เป็น dictionary
-            decision = json.loads(text)
+            decision = decision_stream.decision()
+        except LLMUnavailableError:
+            # Gemini ไม่พร้อมใช้งาน: ไม่แปลงเป็น final_answer เพราะจะได้คำตอบที่ไม่มีข้อมูล
+            raise
         except Exception as e:
             # หากเกิดข้อผิดพลาดให้บันทึกและใช้การตัดสินใจ default
-            self.log(f"Error parsing LLM response: {e}")
+            self.log(f"Error parsing LLM response: {e}", level="warning")
+            decision = {"action": "final_answer", "query": user_input}
+
+        return decision
+
+    async def areason(self, user_input: str, observations: ObservationStore, step: int) -> Dict[str, str]:
+        """reason แบบ async"""
+        prompt = self._build_reason_prompt(user_input, observations, step)
+        decision_stream = DecisionStream(on_action=self._adispatch_early)
+        try:
+            await self._agenerate_stream(
+                prompt, temperature=0.2, max_output_tokens=500,
+                on_token=decision_stream.feed, stop=lambda: decision_stream.settled,
+            )
+            decision = decision_stream.decision()
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            self.log(f"Error parsing LLM response: {e}", level="warning")
             decision = {"action": "final_answer", "query": user_input}
 
         return decision
 
+    # -------------------------
+    # Early dispatch (tool เริ่มระหว่าง stream decision)
+    # -------------------------
+    # action ที่เริ่ม tool ได้ก่อน decision ครบ
+    EARLY_ACTIONS = ("search_context", "web_search")
+
+    def _dispatch_early(self, action: Dict[str, str]) -> None:
+        """เริ่ม tool ของ action บน thread pool ทันทีที่ action และ query ครบ (LLM ยังสร้าง decision อยู่)"""
+        name, query = action["action"], action["query"]
+        dispatched = self.run_context.dispatched
+        # จำกัดจำนวน tool ที่เริ่มไว้ก่อนไม่ให้เกิน max_parallel_actions ต่อ run
+        if name in self.EARLY_ACTIONS and (name, query) not in dispatched and len(dispatched) < self.max_parallel_actions:
+            dispatched[(name, query)] = submit_call(get_tool_executor(), name, lambda: self._run_tool(name, query))
+            self.log(f"**Early dispatch:** '{name}' started while the decision was streaming", level="debug", action=name)
+
+    def _adispatch_early(self, action: Dict[str, str]) -> None:
+        """_dispatch_early แบบ async (tool เริ่มเป็น task ใน event loop)"""
+        name, query = action["action"], action["query"]
+        dispatched = self.run_context.dispatched
+        if name in self.EARLY_ACTIONS and (name, query) not in dispatched:
+            dispatched[(name, query)] = astart_call(name, lambda: self._arun_tool(name, query), self.tool_timeouts)
+            self.log(f"**Early dispatch:** '{name}' started while the decision was streaming", level="debug", action=name)
+
+    def _take_dispatched(self, action_type: str, query: str):
+        # future/task ของ tool ที่เริ่มไว้แล้วสำหรับ action นี้ (None ถ้าไม่มี)
+        return self.run_context.dispatched.pop((action_type, query), None)
+
+    def _discard_dispatched(self) -> None:
+        # tool ที่เริ่มไว้แต่ไม่อยู่ใน decision สุดท้าย (เช่น reason ล้มเหลวกลาง stream)
+        dispatched = self.run_context.dispatched
+        for future in dispatched.values():
+            future.cancel()
+        dispatched.clear()
+
     # -------------------------
     # Action step
     # -------------------------
-    def act(self, action_type: str, query: str, user_input: str = None) -> str:
-        """
-        Execute action and return observation
-        """
+    @staticmethod
+    def _format_search_results(docs: List[Dict[str, str]]) -> str:
+        if docs:
+            # สร้างสรุปเอกสารที่พบจากการค้นหา
+            doc_summaries = [f"Title: {doc['title']}, Content: {doc['content']}" for doc in docs]
+            return f"Found {len(docs)} relevant document(s) in knowledge base: " + "; ".join(doc_summaries)
+        # ไม่พบข้อมูลที่เกี่ยวข้องในฐานความรู้ภายใน (RAG system)
+        return "No relevant information found in the internal knowledge base"
+
+    def _run_tool(self, action_type: str, query: str) -> str:
         # ตรวจสอบประเภทของ action_type ที่ต้องการทำ
         if action_type == "search_context":
             # ค้นหาข้อมูลในฐานความรู้ภายใน (RAG system) โดยใช้คำค้นหา
-            docs = search_context(query, top_k=2) 
-            if docs:
-                # สร้างสรุปเอกสารที่พบจากการค้นหา
-                doc_summaries = [f"Title: {doc['title']}, Content: {doc['content']}" for doc in docs]
-                obs = f"Found {len(docs)} relevant document(s) in knowledge base: " + "; ".join(doc_summaries)
-            else:
-                # ไม่พบข้อมูลที่เกี่ยวข้องในฐานความรู้ภายใน (RAG system)
-                obs = "No relevant information found in the internal knowledge base"
-        elif action_type == "web_search":
+            return self._format_search_results(search_context(query, top_k=2))
+        if action_type == "web_search":
             # ค้นหาข้อมูลจากอินเทอร์เน็ต โดยใช้คำค้นหา
-            obs = call_web_search(query)
-        elif action_type == "final_answer":
+            return call_web_search(query)
+        # ประเภทการกระทำที่ไม่รู้จัก
+        return f"Unknown action: {action_type}"
+
+    async def _arun_tool(self, action_type: str, query: str) -> str:
+        if action_type == "search_context":
+            return self._format_search_results(await asearch_context(query, top_k=2))
+        if action_type == "web_search":
+            return await acall_web_search(query)
+        return f"Unknown action: {action_type}"
+
+    def act(self, action_type: str, query: str, user_input: str = None) -> str:
+        """
+        Execute action and return observation
+        """
+        if action_type == "final_answer":
             # สร้างคำตอบสุดท้ายโดยใช้ข้อมูลทั้งหมดที่รวบรวมได้
             obs = self.generate_final_answer(user_input or query)
         else:
-            # ประเภทการกระทำที่ไม่รู้จัก
-            obs = f"Unknown action: {action_type}"
+            # tool ที่เริ่มไว้แล้วระหว่าง stream decision หรือเริ่มใหม่บน thread pool
+            # รอผ่าน run_parallel เหมือน act_many เพื่อให้มี timeout ต่อ tool เดียวกัน
+            call = self._take_dispatched(action_type, query) or (lambda: self._run_tool(action_type, query))
+            obs = self._tool_observation(run_parallel([(action_type, call)], get_tool_executor(), self.tool_timeouts).results[0])
 
         # บันทึกผลการสังเกตลงในรายการ observations
         self.observations.append(obs)
         return obs
 
+    async def aact(self, action_type: str, query: str, user_input: str = None) -> str:
+        """act แบบ async (tool ที่ blocking จะทำงานใน executor)"""
+        if action_type == "final_answer":
+            obs = await self.agenerate_final_answer(user_input or query)
+        else:
+            call = self._take_dispatched(action_type, query) or (lambda: self._arun_tool(action_type, query))
+            obs = self._tool_observation((await arun_parallel([(action_type, call)], 1, self.tool_timeouts)).results[0])
+
+        self.observations.append(obs)
+        return obs
+
+    @staticmethod
+    def _tool_observation(result: ToolCallResult) -> str:
+        return result.value if result.error is None else f"Error during {result.name}: {result.error}"
+
+    def _record_parallel(self, parallel: ParallelRun) -> List[str]:
+        # แปลงผลลัพธ์เป็น observations และบันทึกเวลาที่ประหยัดได้เทียบกับการรันทีละตัว
+        observations = [self._tool_observation(r) for r in parallel.results]
+        ctx = self.run_context
+        for obs in observations:
+            ctx.observations.append(obs)
+        ctx.parallel_time_saved += parallel.time_saved
+        self.log(
+            f"**Parallel:** {len(parallel.results)} actions in {parallel.wall_seconds:.2f}s "
+            f"(serial {parallel.serial_seconds:.2f}s, saved {parallel.time_saved:.2f}s)"
+        )
+        return observations
+
+    def act_many(self, actions: List[Dict[str, str]], user_input: str) -> str:
+        """
+        Execute หลาย action พร้อมกันบน thread pool และคืนค่า observation รวม
+        ถ้ามี final_answer อยู่ด้วย จะสร้างคำตอบหลังจาก tool อื่นทำงานเสร็จแล้ว
+        """
+        tools = [a for a in actions if a["action"] != "final_answer"]
+        calls = [
+            (a["action"], self._take_dispatched(a["action"], a["query"]) or (lambda a=a: self._run_tool(a["action"], a["query"])))
+            for a in tools
+        ]
+        observations = self._record_parallel(run_parallel(calls, get_tool_executor(), self.tool_timeouts, self.max_parallel_actions))
+
+        if len(tools) < len(actions):
+            return self.act("final_answer", user_input, user_input)
+        return "\n".join(observations)
+
+    async def aact_many(self, actions: List[Dict[str, str]], user_input: str) -> str:
+        """act_many แบบ async"""
+        tools = [a for a in actions if a["action"] != "final_answer"]
+        calls = [
+            (a["action"], self._take_dispatched(a["action"], a["query"]) or (lambda a=a: self._arun_tool(a["action"], a["query"])))
+            for a in tools
+        ]
+        parallel = await arun_parallel(calls, self.max_parallel_actions, self.tool_timeouts)
+        observations = self._record_parallel(parallel)
+
+        if len(tools) < len(actions):
+            return await self.aact("final_answer", user_input, user_input)
+        return "\n".join(observations)
+
     # -------------------------
     # Final answer generation
     # -------------------------
-    def generate_final_answer(self, user_input: str) -> str:
-        """
-        Generate final answer based on all current observations (true ReAct pattern)
-        """
-        # Clean ข้อมูล observations โดยลบ HTML tags ออก
-        obs_texts = [re.sub(r"<[^>]+>", "", o) for o in self.observations]
-        # รวมข้อความทั้งหมดเป็นข้อความเดียว
-        obs_text = " ".join(obs_texts)
-        # ลบช่องว่างที่ไม่จำเป็นและ normalize ข้อความ
-        obs_text = re.sub(r"\s+", " ", obs_text).strip()
+    def _build_final_prompt(self, user_input: str) -> str:
+        # ข้อความรวมของ observations ที่ clean และจำกัดขนาดไว้แล้ว
+        obs_text = self.observations.text()
 
         # ตรวจสอบว่ามีข้อมูลจาก observations หรือไม่
         if not obs_text or obs_text.strip() == "":
             # กรณีไม่มีข้อมูลจาก observations ให้ตอบคำถามโดยตรง
-            prompt = f"""
+            return f"""
             Please provide a helpful, direct answer to this user question:
 
             {user_input}
 
             Provide a clear, informative response in 2-3 sentences.
             """
-        else:
-            # กรณีมีข้อมูลจาก observations ให้ใช้ข้อมูลนั้นในการตอบ
-            prompt = f"""
+        # กรณีมีข้อมูลจาก observations ให้ใช้ข้อมูลนั้นในการตอบ
+        return f"""
             Based on the information gathered, provide a clear final answer:
 
             Question: {user_input}
@@ -178,88 +586,336 @@ class ReActAgent:
             Provide a complete answer in 2-3 clear sentences.
             """
 
+    def _timed_callback(self, on_token: TokenCallback) -> TokenCallback:
+        # บันทึกเวลาของ token แรกก่อนส่งต่อให้ callback ของผู้เรียก
+        def emit(text: str):
+            self.timings.token()
+            on_token(text)
+        return emit
+
+    def generate_final_answer(self, user_input: str, on_token: Optional[TokenCallback] = None) -> str:
+        """
+        Generate final answer based on all current observations (true ReAct pattern)
+        - on_token: ถ้ากำหนด (หรือกำหนดไว้ใน run) จะ stream คำตอบทีละส่วนให้ callback นี้
+        """
+        prompt = self._build_final_prompt(user_input)
+        on_token = on_token or self.run_context.on_token
+        self.timings.start_generation()
         try:
             # เรียกใช้ Gemini AI เพื่อสร้างคำตอบสุดท้าย
-            response = gemini_client.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
+            if on_token is None:
+                final_answer = self._generate(
+                    prompt,
                     temperature=0.1,  # ใช้ temperature ต่ำเพื่อความแม่นยำ
                     max_output_tokens=2000  # จำกัดจำนวน token สูงสุด
                 )
-            )
-            
-            # ดึงข้อความคำตอบจาก response
-            final_answer = getattr(response, "text", None)
-            if not final_answer:
-                raise ValueError("No text returned from LLM")
-            
+            else:
+                final_answer = self._generate_stream(
+                    prompt, temperature=0.1, max_output_tokens=2000, on_token=self._timed_callback(on_token)
+                )
+
             # ส่งคืนคำตอบพร้อมกับ prefix "FINAL_ANSWER: "
             return f"FINAL_ANSWER: {final_answer}"
-                
+
+        except LLMUnavailableError as e:
+            # ส่งต่อให้ผู้เรียก (เช่น server ตอบ 503) แทนการคืนข้อความ error เป็นคำตอบ
+            self.log(f"LLM unavailable: {e}", level="error")
+            self.run_context.failed = True
+            raise
+        except StreamCancelled:
+            # ผู้อ่าน stream ไปแล้ว (ดู stream()) หยุด run โดยไม่สร้างคำตอบแทน
+            raise
         except Exception as e:
             # จัดการข้อผิดพลาดและบันทึก log
-            self.log(f"Error generating final answer: {type(e).__name__}: {e}")
+            self.log(f"Error generating final answer: {type(e).__name__}: {e}", level="error")
+            self.run_context.failed = True
             return f"FINAL_ANSWER: Unable to generate final answer due to error: {e}"
+        finally:
+            self.timings.finish()
 
-
+    async def agenerate_final_answer(self, user_input: str, on_token: Optional[TokenCallback] = None) -> str:
+        """generate_final_answer แบบ async"""
+        prompt = self._build_final_prompt(user_input)
+        on_token = on_token or self.run_context.on_token
+        self.timings.start_generation()
+        try:
+            if on_token is None:
+                final_answer = await self._agenerate(prompt, temperature=0.1, max_output_tokens=2000)
+            else:
+                final_answer = await self._agenerate_stream(
+                    prompt, temperature=0.1, max_output_tokens=2000, on_token=self._timed_callback(on_token)
+                )
+            return f"FINAL_ANSWER: {final_answer}"
+        except LLMUnavailableError as e:
+            self.log(f"LLM unavailable: {e}", level="error")
+            self.run_context.failed = True
+            raise
+        except Exception as e:
+            self.log(f"Error generating final answer: {type(e).__name__}: {e}", level="error")
+            self.run_context.failed = True
+            return f"FINAL_ANSWER: Unable to generate final answer due to error: {e}"
+        finally:
+            self.timings.finish()
 
     # -------------------------
     # Main agent flow
     # -------------------------
-    def run(self, user_input: str) -> str:
-        # เริ่มต้นการทำงานใหม่โดยเคลียร์ข้อมูลเก่า
-        self.observations = []
-        self.log_lines = []
+    def _start_run(self, user_input: str, on_token: Optional[TokenCallback], trace: Trace) -> RunContext:
+        # เริ่มต้นการทำงานใหม่ด้วย state ของ run นี้เท่านั้น
+        ctx = self._new_run(user_input, on_token)
+        ctx.trace = trace
+        activate_run(ctx)
         # สร้าง log header สำหรับการทำงานครั้งนี้
         self.log(f"# ReAct Agent Log")
         self.log(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        self.log(f"**User Query:** {user_input}\n")
+        self.log(f"**User Query:** {user_input}\n", question=user_input)
         self.log(f"## 🚀 Starting ReAct Agent Process\nMaximum Steps: {self.max_steps}\n")
-        
+        return ctx
+
+    @staticmethod
+    def _decision_actions(decision: Dict, user_input: str) -> List[Dict[str, str]]:
+        """
+        แปลง decision เป็น list ของ action
+        รองรับทั้ง {"action": ..., "query": ...} และ {"actions": [...]}
+        final_answer (ถ้ามี) จะถูกย้ายไปไว้ท้ายสุดเพียงตัวเดียว
+        """
+        raw = decision.get("actions")
+        if not isinstance(raw, list) or not raw:
+            raw = [decision]
+        actions = [
+            {"action": a.get("action", "final_answer"), "query": a.get("query", user_input)}
+            for a in raw if isinstance(a, dict)
+        ] or [{"action": "final_answer", "query": user_input}]
+        tools = [a for a in actions if a["action"] != "final_answer"]
+        if len(tools) < len(actions):
+            tools.append({"action": "final_answer", "query": user_input})
+        return tools
+
+    def _log_step(self, step: int, actions: List[Dict[str, str]]):
+        # บันทึก log สำหรับขั้นตอนนี้
+        self.log(f"# Step {step}/{self.max_steps}", step=step)
+        names = ", ".join(f"'{a['action']}'" for a in actions)
+        self.log(f"**Thought:** LLM decided to perform {names} action{'s' if len(actions) > 1 else ''}")
+        for a in actions:
+            self.log(f"**Action:** {a['action']}", step=step, action=a["action"])
+            self.log(f"**Query:** {a['query']}", step=step, action=a["action"], query=a["query"])
+
+    def _finish(self, obs: str, label: str) -> Optional[str]:
+        # ดึงคำตอบสุดท้ายจากผลการสังเกต (รูปแบบ ReAct แท้จริง)
+        if obs.startswith("FINAL_ANSWER: "):
+            answer = obs[14:]  # ลบ prefix "FINAL_ANSWER: " ออก
+            if self.parallel_time_saved:
+                self.log(f"**Parallel time saved:** {self.parallel_time_saved:.2f}s")
+            if self.observations.dropped:
+                self.log(f"**Observations dropped (over budget):** {self.observations.dropped}")
+            self.log(f"**Timing:** {self.timings.report()}", **self.timings.as_dict())
+            self.log(f"=== {label} ===\n{answer}\n")
+            return answer
+        return None
+
+    # -------------------------
+    # Pre-router (ข้าม reasoning เมื่อ retrieval ชัดเจน)
+    # -------------------------
+    # จำนวน reasoning call ที่ข้ามได้: step 1 (เลือก search_context) และ step 2 (เลือก final_answer)
+    ROUTED_LLM_CALLS_AVOIDED = 2
+
+    def _apply_route(self, decision: RouteDecision, route_span) -> bool:
+        """
+        บันทึกผลของ router และเพิ่มเอกสารเป็น observation ถ้ามั่นใจพอ
+        คืนค่า True เมื่อควรสร้างคำตอบสุดท้ายทันที
+        """
+        route_span.set(confidence=round(decision.confidence, 4), confident=decision.confident)
+        self.log(
+            f"**Router:** {decision.report()}, threshold {self.router.threshold:.2f}",
+            confidence=round(decision.confidence, 4),
+        )
+        if not decision.confident:
+            self.log("**Router:** not confident, continuing with the ReAct loop\n")
+            return False
+
+        obs = self._format_search_results(decision.documents)
+        self.observations.append(obs)
+        self.run_context.llm_calls_avoided = self.ROUTED_LLM_CALLS_AVOIDED
+        self.log(f"**Observation:** {obs}")
+        self.log(f"**Router:** answering from the knowledge base, LLM calls avoided: {self.llm_calls_avoided}\n")
+        return True
+
+    def _log_fallback(self):
+        # กรณีที่จบลูปโดยไม่มีการทำ final_answer action (fallback)
+        self.log("⚠️  Agent reached maximum steps without final_answer action", level="warning")
+        self.log("🔄  Forcing final answer generation...\n")
+
+    def _fail(self) -> str:
+        # กรณีพิเศษ: แม้แต่ generate_final_answer ก็ล้มเหลว
+        self.run_context.failed = True
+        error_msg = f"Unable to generate answer after {self.max_steps} steps"
+        self.log(f"❌ {error_msg}", level="error")
+        return error_msg
+
+    def run(self, user_input: str, on_token: Optional[TokenCallback] = None) -> str:
+        """
+        รัน agent และคืนค่าคำตอบสุดท้าย
+        - on_token: callback ที่รับคำตอบสุดท้ายทีละส่วนระหว่างที่ Gemini สร้าง
+        """
+        with start_trace("react_agent.run", self.trace_path, question=user_input) as trace:
+            ctx = self._start_run(user_input, on_token, trace)
+            try:
+                answer = self._cached_answer(user_input)
+                if answer is None:
+                    answer = self._run(user_input)
+                    self._remember_answer(user_input, answer)
+            finally:
+                self.last_run = ctx
+            current_span().set(**ctx.timings.as_dict())
+            return answer
+
+    def _cached_answer(self, user_input: str) -> Optional[str]:
+        """คืนค่าคำตอบจาก answer cache ถ้ามีคำถามเดียวกันหรือคล้ายพอ (ไม่เรียก LLM หรือ tool)"""
+        if self.answer_cache is None:
+            return None
+        self.run_context.kb_version = self.answer_cache.version()
+        with span("answer_cache", "cache") as s:
+            hit = self.answer_cache.lookup(user_input)
+            s.set(cache_hit=hit is not None)
+            if hit is None:
+                return None
+            s.set(similarity=round(hit.similarity, 4))
+
+        on_token = self.run_context.on_token
+        self.timings.start_generation()
+        if on_token is not None:
+            self._timed_callback(on_token)(hit.answer)
+        self.timings.finish()
+        self.log(
+            f"**Answer cache:** hit (similarity {hit.similarity:.2f}, cached question: {hit.question})",
+            similarity=round(hit.similarity, 4),
+        )
+        self.log(f"=== Cached Answer ===\n{hit.answer}\n")
+        return hit.answer
+
+    def _remember_answer(self, user_input: str, answer: str) -> None:
+        # เก็บเฉพาะคำตอบจริง ไม่เก็บข้อความแจ้งข้อผิดพลาด
+        ctx = self.run_context
+        if self.answer_cache is not None and not ctx.failed:
+            self.answer_cache.store(user_input, answer, version=ctx.kb_version)
+
+    def _run(self, user_input: str) -> str:
+        # ค้นหา knowledge base ล่วงหน้า ถ้ามั่นใจพอให้ตอบทันทีโดยไม่ต้องเข้า loop
+        if self.router is not None:
+            with span("router", "route") as s:
+                routed = self._apply_route(self.router.route(user_input), s)
+            if routed:
+                with span("final_answer", "act"):
+                    routed_answer = self._finish(self.generate_final_answer(user_input), "Final Answer")
+                if routed_answer is not None:
+                    return routed_answer
+
         # วนลูปทำงานตามจำนวนขั้นตอนสูงสุดที่กำหนด
         for step in range(1, self.max_steps + 1):
-            # ให้ LLM ตัดสินใจการกระทำต่อไปตามสถานการณ์ปัจจุบัน
-            decision = self.reason(user_input, self.observations, step)
-            action_type = decision.get("action", "final_answer")
-            query = decision.get("query", user_input)
-            
-            # บันทึก log สำหรับขั้นตอนนี้
-            self.log(f"# Step {step}/{self.max_steps}")
-            self.log(f"**Thought:** LLM decided to perform '{action_type}' action")
-            self.log(f"**Action:** {action_type}")
-            self.log(f"**Query:** {query}")
-
-            # ดำเนินการตามที่ LLM ตัดสินใจและรับผลการสังเกต
-            obs = self.act(action_type, query, user_input)
-            self.log(f"**Observation:** {obs}\n")
+            with span("step", "step", step=step):
+                # ให้ LLM ตัดสินใจการกระทำต่อไปตามสถานการณ์ปัจจุบัน
+                with span("reason", "reason"):
+                    decision = self.reason(user_input, self.observations, step)
+                actions = self._decision_actions(decision, user_input)
+                self._log_step(step, actions)
+
+                # ดำเนินการตามที่ LLM ตัดสินใจและรับผลการสังเกต (หลาย action จะรันพร้อมกัน)
+                with span("act", "act", actions=[a["action"] for a in actions]):
+                    if len(actions) == 1:
+                        obs = self.act(actions[0]["action"], actions[0]["query"], user_input)
+                    else:
+                        obs = self.act_many(actions, user_input)
+                self._discard_dispatched()
+                self.log(f"**Observation:** {obs}\n")
 
             # ตรวจสอบว่าได้คำตอบสุดท้ายแล้วหรือไม่
-            if action_type == "final_answer":
-                # ดึงคำตอบสุดท้ายจากผลการสังเกต (รูปแบบ ReAct แท้จริง)
-                if obs.startswith("FINAL_ANSWER: "):
-                    final_answer = obs[14:]  # ลบ prefix "FINAL_ANSWER: " ออก
-                    self.log(f"=== Final Answer ===\n{final_answer}\n")
-                    self.save_log()
+            if actions[-1]["action"] == "final_answer":
+                final_answer = self._finish(obs, "Final Answer")
+                if final_answer is not None:
                     return final_answer
                 break
 
-        # กรณีที่จบลูปโดยไม่มีการทำ final_answer action (fallback)
-        self.log("⚠️  Agent reached maximum steps without final_answer action")
-        self.log("🔄  Forcing final answer generation...\n")
-        
+        self._log_fallback()
+
         # บังคับสร้างคำตอบสุดท้าย
-        fallback_obs = self.generate_final_answer(user_input)
-        if fallback_obs.startswith("FINAL_ANSWER: "):
-            fallback_answer = fallback_obs[14:]  # ลบ prefix "FINAL_ANSWER: " ออก
-            self.log(f"=== Fallback Answer ===\n{fallback_answer}\n")
-            self.save_log()
-            return fallback_answer
-        else:
-            # กรณีพิเศษ: แม้แต่ generate_final_answer ก็ล้มเหลว
-            error_msg = f"Unable to generate answer after {self.max_steps} steps"
-            self.log(f"❌ {error_msg}")
-            self.save_log()
-            return error_msg
+        with span("fallback_answer", "act"):
+            fallback_answer = self._finish(self.generate_final_answer(user_input), "Fallback Answer")
+        return fallback_answer if fallback_answer is not None else self._fail()
+
+    async def arun(self, user_input: str, on_token: Optional[TokenCallback] = None) -> str:
+        """
+        run แบบ async: เรียก Gemini แบบ async และ tool ใน executor
+        event loop เดียวสามารถรันหลาย run พร้อมกันได้ (เช่น asyncio.gather ด้วย agent ตัวเดียว)
+        """
+        with start_trace("react_agent.arun", self.trace_path, question=user_input) as trace:
+            ctx = self._start_run(user_input, on_token, trace)
+            try:
+                answer = self._cached_answer(user_input)
+                if answer is None:
+                    answer = await self._arun(user_input)
+                    self._remember_answer(user_input, answer)
+            finally:
+                self.last_run = ctx
+            current_span().set(**ctx.timings.as_dict())
+            return answer
+
+    async def _arun(self, user_input: str) -> str:
+        if self.router is not None:
+            with span("router", "route") as s:
+                routed = self._apply_route(await run_in_tool_executor(self.router.route, user_input), s)
+            if routed:
+                with span("final_answer", "act"):
+                    routed_answer = self._finish(await self.agenerate_final_answer(user_input), "Final Answer")
+                if routed_answer is not None:
+                    return routed_answer
+
+        for step in range(1, self.max_steps + 1):
+            with span("step", "step", step=step):
+                with span("reason", "reason"):
+                    decision = await self.areason(user_input, self.observations, step)
+                actions = self._decision_actions(decision, user_input)
+                self._log_step(step, actions)
+
+                with span("act", "act", actions=[a["action"] for a in actions]):
+                    if len(actions) == 1:
+                        obs = await self.aact(actions[0]["action"], actions[0]["query"], user_input)
+                    else:
+                        obs = await self.aact_many(actions, user_input)
+                self._discard_dispatched()
+                self.log(f"**Observation:** {obs}\n")
+
+            if actions[-1]["action"] == "final_answer":
+                final_answer = self._finish(obs, "Final Answer")
+                if final_answer is not None:
+                    return final_answer
+                break
+
+        self._log_fallback()
+
+        with span("fallback_answer", "act"):
+            fallback_answer = self._finish(await self.agenerate_final_answer(user_input), "Fallback Answer")
+        return fallback_answer if fallback_answer is not None else self._fail()
+
+    def stream(self, user_input: str) -> Iterator[str]:
+        """
+        run แบบ generator: yield คำตอบสุดท้ายทีละส่วนทันทีที่ Gemini สร้าง
+        (agent ทำงานใน thread แยก เวลาอยู่ใน self.timings เมื่อ generator จบ)
+        ปิด generator ก่อนจบแล้ว run จะหยุดที่ข้อความส่วนถัดไป และ close() รอจน run หยุด
+        คำตอบที่ไม่ได้ stream (เช่นข้อความแจ้งข้อผิดพลาด) ถูก yield ทั้งก้อนเมื่อ run จบ
+        """
+        def produce(emit: TokenCallback) -> None:
+            emitted = False
+
+            def on_token(text: str) -> None:
+                nonlocal emitted
+                emitted = True
+                emit(text)
+
+            answer = self.run(user_input, on_token=on_token)
+            if not emitted and answer:
+                emit(answer)
+
+        return iter_callback(produce)
 
 
 # ------------------------
@@ -267,8 +923,8 @@ class ReActAgent:
 # ------------------------
 if __name__ == "__main__":
     agent = ReActAgent()
-    
+
     # Test with a question that might benefit from internal knowledge first
     question = "Employee Benefits"
     print("Testing with question:", question)
-    answer = agent.run(question)
\ No newline at end of file
+    answer = agent.run(question)
@@ -0,0 +1,104 @@
+# router.py
+"""
+Pre-router สำหรับ ReActAgent: ตัดสินใจโดยไม่ต้องเรียก LLM ว่าคำถามตอบได้จาก knowledge base หรือไม่
+
+- ค้นหา knowledge base ล่วงหน้า (speculative) ด้วยคำถามของผู้ใช้
+- ให้คะแนนความมั่นใจจาก
+  - coverage: สัดส่วนของคำสำคัญในคำถามที่ปรากฏในเอกสารอันดับ 1
+  - margin: คะแนนของอันดับ 1 ห่างจากอันดับ 2 มากแค่ไหน (0-1)
+- คำถามที่ต้องการข้อมูลล่าสุด (เช่น "latest", "today") จะไม่ถูก route เพราะ knowledge base ตอบไม่ได้
+ถ้าความมั่นใจถึง threshold agent จะสร้างคำตอบสุดท้ายจากเอกสารเหล่านี้ทันที
+ไม่เช่นนั้นจะเข้าสู่ ReAct loop ตามปกติ
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+import time
+
+from rag import rag_search_scored, rag_tokenize
+from tool_cache import tool_cache
+
+# คำที่ไม่มีความหมายสำหรับการวัด coverage
+STOPWORDS = frozenset(
+    "a about all an and any are as at be by can do does for from get has have how i in is it "
+    "many me much my of on or our please should tell the there this to we what when where which "
+    "who why will with you your".split()
+)
+
+# คำที่บอกว่าต้องการข้อมูลปัจจุบันจากภายนอก
+FRESHNESS_TERMS = frozenset(
+    "current currently latest news now price recent today tomorrow weather yesterday".split()
+)
+
+# น้ำหนักของ coverage และ margin ในคะแนนความมั่นใจ
+COVERAGE_WEIGHT = 0.7
+MARGIN_WEIGHT = 0.3
+
+
+@dataclass
+class RouteDecision:
+    """ผลการ route คำถามหนึ่งครั้ง"""
+    confidence: float
+    coverage: float = 0.0
+    margin: float = 0.0
+    documents: List[Dict[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+    confident: bool = False
+
+    def report(self) -> str:
+        return (
+            f"confidence {self.confidence:.2f} (coverage {self.coverage:.2f}, margin {self.margin:.2f}, "
+            f"{len(self.documents)} docs) in {self.seconds * 1000:.1f}ms"
+        )
+
+
+def score_retrieval(query: str, scored: List[Tuple[float, Dict[str, str]]]) -> Tuple[float, float, float]:
+    """
+    คำนวณความมั่นใจของผลการค้นหา
+    - query: คำถามของผู้ใช้
+    - scored: ผลการค้นหาแบบ (score, document) เรียงจากคะแนนมากไปน้อย
+    คืนค่า (confidence, coverage, margin) ในช่วง 0-1
+    """
+    if not scored or scored[0][0] <= 0:
+        return 0.0, 0.0, 0.0
+
+    terms = set(rag_tokenize(query))
+    if terms & FRESHNESS_TERMS:
+        return 0.0, 0.0, 0.0
+    keywords = terms - STOPWORDS or terms
+
+    top_score, top_doc = scored[0]
+    doc_terms = set(rag_tokenize(f"{top_doc['title']} {top_doc['content']}"))
+    coverage = len(keywords & doc_terms) / len(keywords)
+
+    second_score = scored[1][0] if len(scored) > 1 else 0.0
+    margin = (top_score - second_score) / top_score
+
+    return COVERAGE_WEIGHT * coverage + MARGIN_WEIGHT * margin, coverage, margin
+
+
+class RetrievalRouter:
+    """
+    Router ที่ค้นหา knowledge base ล่วงหน้าและตัดสินว่าผลลัพธ์มั่นใจพอหรือไม่
+    - threshold: ความมั่นใจขั้นต่ำ (0-1) ที่จะข้าม ReAct loop
+    - top_k: จำนวนเอกสารที่ค้นหา (ใช้เป็น observations เมื่อ route สำเร็จ)
+    - mode: โหมดการค้นหา ("bm25" หรือ "tfidf")
+    """
+
+    def __init__(self, threshold: float = 0.75, top_k: int = 2, mode: str = "bm25"):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.mode = mode
+
+    def route(self, query: str) -> RouteDecision:
+        """ค้นหาและให้คะแนนคำถาม (ผลการค้นหาใช้ cache กลางของ tool)"""
+        start = time.perf_counter()
+        scored = tool_cache.get_or_call("search_context_scored", rag_search_scored, query, top_k=self.top_k, mode=self.mode)
+        confidence, coverage, margin = score_retrieval(query, scored)
+        return RouteDecision(
+            confidence=confidence,
+            coverage=coverage,
+            margin=margin,
+            documents=[doc for _, doc in scored],
+            seconds=time.perf_counter() - start,
+            confident=confidence >= self.threshold,
+        )
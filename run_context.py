@@ -0,0 +1,64 @@
+# run_context.py
+"""
+state ของการทำงานหนึ่งครั้ง (request-scoped) แยกออกจาก agent
+
+agent หนึ่ง instance จึงถูกเรียกจากหลาย thread หรือหลาย task พร้อมกันได้:
+- RunContext เก็บทุกอย่างที่เปลี่ยนระหว่าง run (observations, log, timings, trace, ...)
+- activate_run(): ตั้ง RunContext เป็น run ปัจจุบันใน contextvar
+  (ส่งต่อไปยัง thread pool ของ tool ด้วย contextvars.copy_context เหมือน span ใน tracing.py)
+- current_run(owner): คืนค่า RunContext ของ agent นั้นใน context ปัจจุบัน
+  หลัง run จบ contextvar ยังชี้ที่ run ล่าสุดของ thread/task นั้น เพื่อให้อ่านผลลัพธ์ต่อได้
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from agent_logging import RunLog
+from observation_store import ObservationStore
+from streaming import StreamTimings, TokenCallback
+from tracing import Trace
+
+
+@dataclass
+class RunContext:
+    """
+    state ของ run หนึ่งครั้ง
+    - owner: agent ที่สร้าง run นี้
+    - question: คำถามของผู้ใช้
+    - log: log ของ run (ดู agent_logging.RunLog)
+    - timings: เวลา TTFT / เวลาสร้างคำตอบ
+    - observations: ผลการสังเกตที่ใช้สร้าง prompt (react_agent)
+    - on_token: callback สำหรับ stream คำตอบสุดท้าย
+    - trace: trace ของ run
+    - failed: run จบด้วยข้อความแจ้งข้อผิดพลาดแทนคำตอบ (ไม่ถูกเก็บใน answer cache)
+    - dispatched: tool ที่เริ่มไว้ระหว่าง stream decision ตาม (action, query) รอให้ act รับผล (react_agent)
+    - kb_version: version ของ knowledge base ตอนเริ่ม run (answer cache ไม่เก็บคำตอบถ้าเปลี่ยนระหว่าง run)
+    """
+    owner: Any
+    question: str = ""
+    log: Optional[RunLog] = None
+    timings: StreamTimings = field(default_factory=StreamTimings)
+    observations: Optional[ObservationStore] = None
+    on_token: Optional[TokenCallback] = None
+    trace: Optional[Trace] = None
+    parallel_time_saved: float = 0.0
+    llm_calls_avoided: int = 0
+    failed: bool = False
+    dispatched: Dict[Tuple[str, str], Any] = field(default_factory=dict)
+    kb_version: Any = None
+
+
+_current_run: ContextVar[Optional[RunContext]] = ContextVar("current_run", default=None)
+
+
+def activate_run(ctx: RunContext) -> None:
+    """ตั้ง ctx เป็น run ปัจจุบันของ context นี้ (ไม่ reset เมื่อจบ เพื่อให้อ่านผลของ run ล่าสุดได้)"""
+    _current_run.set(ctx)
+
+
+def current_run(owner: Any) -> Optional[RunContext]:
+    """คืนค่า run ปัจจุบัน (หรือล่าสุด) ของ owner ใน context นี้ (None ถ้าไม่มี)"""
+    ctx = _current_run.get()
+    if ctx is not None and ctx.owner is owner:
+        return ctx
+    return None
@@ -0,0 +1,445 @@
+# server.py
+"""
+HTTP front-end สำหรับ agent (ใช้ร่วมกันทั้ง main.py และ langgraph_version/main.py ผ่านคำสั่ง serve)
+
+- POST /query  {"question": "...", "session_id": "...", "stream": false}
+  คำถามเข้า queue ที่มีขนาดจำกัด แล้ว worker pool ดึงไปรันทีละคำถามต่อ worker
+  ตอบ {"answer", "latency_s", "queue_s"} หรือถ้า stream=true ส่งคำตอบทีละส่วน
+  แบบ chunked transfer encoding ทันทีที่ agent สร้าง
+- backpressure: queue เต็ม → 429 พร้อม Retry-After ทันที (ไม่รอ)
+  คำถามที่รอใน queue นานกว่า queue_timeout ถูกทิ้งก่อนรัน (shed) และตอบ 429 เช่นกัน
+  คำถามของ client ที่ตัดการเชื่อมต่อหรือหมดเวลา request_timeout (504) จะไม่ถูกรัน
+  ถ้ากำลัง stream อยู่ agent จะหยุดที่ส่วนถัดไปของคำตอบ และ worker รอจน agent หยุดจริง
+  ก่อนรับคำถามถัดไป (จำนวนงานที่รันอยู่จึงไม่เกิน workers)
+- LLM ไม่พร้อมใช้งาน (LLMUnavailableError จาก llm_governor) → 503 พร้อม Retry-After
+- GET /metrics  ค่าในรูปแบบ Prometheus text: queue depth, in-flight, จำนวน request ตาม status,
+  histogram ของ latency (รวมเวลารอ), เวลารอใน queue และเวลาถึงส่วนแรกของคำตอบ
+  และตัวนับของ backend (เช่น llm_governor) เป็น agent_llm_<name>
+- GET /health
+"""
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+
+from llm_governor import LLMUnavailableError
+
+# ขอบบนของ bucket ใน histogram (วินาที)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_END = object()   # คำตอบครบแล้ว
+_SHED = object()  # คำถามถูกทิ้งเพราะรอใน queue นานเกินไป
+
+
+@dataclass
+class AgentBackend:
+    """
+    ฟังก์ชันที่ server เรียกเพื่อตอบคำถาม (agent ต้องเรียกจากหลาย thread พร้อมกันได้)
+    - run: (question, session_id) → คำตอบ
+    - stream: (question, session_id) → iterator ของคำตอบทีละส่วน
+    - metrics: ถ้ากำหนด คืนค่าตัวนับเพิ่มเติม (เช่น LLMGovernor.stats) ที่แสดงใน /metrics
+    """
+    run: Callable[[str, Optional[str]], str]
+    stream: Callable[[str, Optional[str]], Iterator[str]]
+    metrics: Optional[Callable[[], Dict[str, object]]] = None
+
+
+class Histogram:
+    """histogram แบบสะสมตาม bucket (เหมือน Prometheus histogram)"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # ช่องสุดท้ายคือ +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def render(self, name: str, help_text: str) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{name}_sum {total:.6f}")
+        lines.append(f"{name}_count {count}")
+        return lines
+
+
+class ServerMetrics:
+    """ตัวนับและ histogram ของ server (อ่านผ่าน /metrics)"""
+
+    def __init__(self):
+        self.responses: Dict[int, int] = {}
+        self.rejected = 0
+        self.shed = 0
+        self.in_flight = 0
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self.first_chunk = Histogram()
+        self._lock = threading.Lock()
+
+    def count_response(self, status: int) -> None:
+        with self._lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+    def add(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def render(self, queue_depth: int, queue_capacity: int, workers: int) -> str:
+        with self._lock:
+            responses = sorted(self.responses.items())
+            gauges = [
+                ("agent_queue_depth", "Queries waiting for a worker", "gauge", queue_depth),
+                ("agent_queue_capacity", "Maximum number of waiting queries", "gauge", queue_capacity),
+                ("agent_workers", "Size of the worker pool", "gauge", workers),
+                ("agent_in_flight", "Queries being answered", "gauge", self.in_flight),
+                ("agent_rejected_total", "Queries rejected because the queue was full", "counter", self.rejected),
+                ("agent_shed_total", "Queries dropped after waiting longer than queue_timeout", "counter", self.shed),
+            ]
+        lines: List[str] = []
+        for name, help_text, kind, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        lines += ["# HELP agent_responses_total HTTP responses by status code", "# TYPE agent_responses_total counter"]
+        lines += [f'agent_responses_total{{status="{status}"}} {n}' for status, n in responses]
+        lines += self.latency.render("agent_request_seconds", "Time from enqueue to the end of the answer")
+        lines += self.queue_wait.render("agent_queue_wait_seconds", "Time spent waiting for a worker")
+        lines += self.first_chunk.render("agent_first_chunk_seconds", "Time from enqueue to the first answer chunk")
+        return "\n".join(lines) + "\n"
+
+
+class _Job:
+    """คำถามหนึ่งข้อใน queue ผลลัพธ์ (ส่วนของคำตอบ, _END, _SHED หรือ exception) ส่งกลับทาง results"""
+
+    def __init__(self, question: str, session_id: Optional[str], stream: bool):
+        self.question = question
+        self.session_id = session_id
+        self.stream = stream
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+        self.results: "queue.Queue" = queue.Queue()
+        self.cancelled = threading.Event()
+
+
+class AgentPool:
+    """
+    queue ที่มีขนาดจำกัดและ worker thread จำนวนคงที่ที่รันคำถามผ่าน backend
+    - workers: จำนวนคำถามที่รันพร้อมกัน
+    - max_queue: จำนวนคำถามที่รอได้ (เกินแล้ว submit คืนค่า None)
+    - queue_timeout: วินาทีที่คำถามรอใน queue ได้ก่อนถูกทิ้ง (None = ไม่จำกัด)
+    """
+
+    def __init__(
+        self,
+        backend: AgentBackend,
+        workers: int = 4,
+        max_queue: int = 64,
+        queue_timeout: Optional[float] = 30.0,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.metrics = ServerMetrics()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"agent-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """ให้ worker ทำงานที่ค้างใน queue ให้เสร็จแล้วหยุด"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def submit(self, question: str, session_id: Optional[str] = None, stream: bool = False) -> Optional[_Job]:
+        """ใส่คำถามลง queue โดยไม่รอ คืนค่า None ถ้า queue เต็ม"""
+        job = _Job(question, session_id, stream)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.metrics.add("rejected")
+            return None
+        return job
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def retry_after(self) -> int:
+        """ประมาณเวลา (วินาที) จนกว่า queue จะว่างพอ จากเวลาเฉลี่ยของคำถามที่ผ่านมา"""
+        service = self.metrics.latency.mean - self.metrics.queue_wait.mean
+        return max(1, math.ceil(self.queue_depth() * max(service, 0.0) / max(self.workers, 1)))
+
+    def render_metrics(self) -> str:
+        text = self.metrics.render(self.queue_depth(), self.max_queue, self.workers)
+        if self.backend.metrics is None:
+            return text
+        lines = []
+        for key, value in sorted(self.backend.metrics().items()):
+            name = f"agent_llm_{key}"
+            if isinstance(value, str):
+                # ค่าที่เป็นสถานะแสดงเป็น label (เช่น agent_llm_breaker_state{state="open"} 1)
+                lines += [f"# TYPE {name} gauge", f'{name}{{state="{value}"}} 1']
+            else:
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return text + "\n".join(lines) + "\n"
+
+    def _worker(self) -> None:
+        metrics = self.metrics
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled.is_set():
+                continue
+            job.started = time.perf_counter()
+            waited = job.started - job.enqueued
+            if self.queue_timeout is not None and waited > self.queue_timeout:
+                metrics.add("shed")
+                job.results.put(_SHED)
+                continue
+            metrics.queue_wait.observe(waited)
+            metrics.add("in_flight")
+            try:
+                self._answer(job)
+            except Exception as e:
+                job.results.put(e)
+            finally:
+                metrics.add("in_flight", -1)
+                metrics.latency.observe(time.perf_counter() - job.enqueued)
+
+    def _answer(self, job: _Job) -> None:
+        if not job.stream:
+            job.results.put(self.backend.run(job.question, job.session_id))
+            self.metrics.first_chunk.observe(time.perf_counter() - job.enqueued)
+            job.results.put(_END)
+            return
+
+        chunks = self.backend.stream(job.question, job.session_id)
+        try:
+            for i, text in enumerate(chunks):
+                if job.cancelled.is_set():
+                    return  # client ไปแล้ว ไม่ต้องสร้างคำตอบต่อ (close() ด้านล่างรอจน agent หยุด)
+                if i == 0:
+                    self.metrics.first_chunk.observe(time.perf_counter() - job.enqueued)
+                job.results.put(text)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        job.results.put(_END)
+
+
+class AgentHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer ที่ส่งคำถามเข้า AgentPool (request_timeout = วินาทีที่รอผลแต่ละส่วน)"""
+
+    daemon_threads = True
+
+    def __init__(self, address, pool: AgentPool, request_timeout: float = 120.0):
+        super().__init__(address, _Handler)
+        self.pool = pool
+        self.request_timeout = request_timeout
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 จำเป็นสำหรับ chunked transfer encoding
+    protocol_version = "HTTP/1.1"
+    server: AgentHTTPServer
+
+    def log_message(self, format, *args) -> None:
+        pass  # ดูสถิติได้จาก /metrics
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._send(200, self.server.pool.render_metrics().encode("utf-8"), "text/plain; version=0.0.4")
+        elif path == "/health":
+            self._send_json(200, {"status": "ok", "queue_depth": self.server.pool.queue_depth()})
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0] != "/query":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            question = body.get("question") or body.get("query")
+        except (ValueError, AttributeError):
+            self._send_json(400, {"error": "body must be a JSON object"})
+            return
+        if not isinstance(question, str) or not question.strip():
+            self._send_json(400, {"error": "missing \"question\""})
+            return
+
+        pool = self.server.pool
+        job = pool.submit(question, body.get("session_id"), stream=bool(body.get("stream")))
+        if job is None:
+            self._send_busy("queue is full")
+        elif job.stream:
+            self._stream(job)
+        else:
+            self._answer(job)
+
+    def _next(self, job: _Job):
+        """รอผลส่วนถัดไปของ job (None ถ้าหมดเวลา)"""
+        try:
+            return job.results.get(timeout=self.server.request_timeout)
+        except queue.Empty:
+            job.cancelled.set()
+            return None
+
+    def _answer(self, job: _Job) -> None:
+        result = self._next(job)
+        if result is not None and result is not _SHED and not isinstance(result, Exception):
+            self._next(job)  # _END
+        if not self._send_error_result(result):
+            finished = time.perf_counter()
+            self._send_json(200, {
+                "answer": result,
+                "latency_s": round(finished - job.enqueued, 4),
+                "queue_s": round((job.started or finished) - job.enqueued, 4),
+            })
+
+    def _stream(self, job: _Job) -> None:
+        result = self._next(job)
+        if self._send_error_result(result):
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.server.pool.metrics.count_response(200)
+        try:
+            while result is not _END:
+                if result is None or result is _SHED or isinstance(result, Exception):
+                    # ส่ง status ไปแล้ว: ปิดการเชื่อมต่อโดยไม่มี chunk สุดท้ายเพื่อบอกว่าคำตอบไม่ครบ
+                    self.close_connection = True
+                    return
+                if result:
+                    data = result.encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                result = self._next(job)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            job.cancelled.set()
+            self.close_connection = True
+
+    def _send_error_result(self, result) -> bool:
+        """ตอบ error ถ้า result ไม่ใช่คำตอบ (คืนค่า True ถ้าส่ง error ไปแล้ว)"""
+        if result is None:
+            self._send_json(504, {"error": "timed out waiting for the answer"})
+        elif result is _SHED:
+            self._send_busy("waited too long in the queue")
+        elif isinstance(result, LLMUnavailableError):
+            retry_after = max(1, math.ceil(result.retry_after or self.server.pool.retry_after()))
+            self._send_json(503, {"error": f"LLM unavailable: {result}"}, {"Retry-After": str(retry_after)})
+        elif isinstance(result, Exception):
+            self._send_json(500, {"error": f"{type(result).__name__}: {result}"})
+        else:
+            return False
+        return True
+
+    def _send_busy(self, reason: str) -> None:
+        self._send_json(429, {"error": f"server busy: {reason}"}, {"Retry-After": str(self.server.pool.retry_after())})
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.pool.metrics.count_response(status)
+
+
+def make_server(
+    backend: AgentBackend,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 4,
+    max_queue: int = 64,
+    queue_timeout: Optional[float] = 30.0,
+    request_timeout: float = 120.0,
+) -> AgentHTTPServer:
+    """สร้าง server พร้อม worker pool ที่เริ่มทำงานแล้ว (เรียก serve_forever() เพื่อรับ request)"""
+    pool = AgentPool(backend, workers=workers, max_queue=max_queue, queue_timeout=queue_timeout)
+    pool.start()
+    return AgentHTTPServer((host, port), pool, request_timeout=request_timeout)
+
+
+def run_server(backend: AgentBackend, **options) -> None:
+    """รัน server จนกว่าจะกด Ctrl+C (options เหมือน make_server)"""
+    server = make_server(backend, **options)
+    host, port = server.server_address[:2]
+    pool = server.pool
+    print(f"Serving on http://{host}:{port} ({pool.workers} workers, queue {pool.max_queue})")
+    print("POST /query, GET /metrics, GET /health - Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+        pool.stop()
+
+
+def add_serve_arguments(parser: argparse.ArgumentParser) -> None:
+    """เพิ่ม argument ของคำสั่ง serve ให้กับ parser"""
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="queries answered at the same time (default: 4)")
+    parser.add_argument("--max-queue", type=int, default=64, help="queries that may wait for a worker (default: 64)")
+    parser.add_argument("--queue-timeout", type=float, default=30.0,
+                        help="seconds a query may wait before it is shed with 429 (default: 30)")
+    parser.add_argument("--request-timeout", type=float, default=120.0,
+                        help="seconds to wait for each part of an answer before 504 (default: 120)")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="answer repeated and near-duplicate questions from an answer cache (see answer_cache.py)")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="use the offline stand-ins from benchmarks/ instead of Gemini and web search")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="latency of each fake LLM call")
+
+
+def server_options(args: argparse.Namespace) -> Dict:
+    """แปลง argument ของคำสั่ง serve เป็น options ของ run_server"""
+    return {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "max_queue": args.max_queue,
+        "queue_timeout": args.queue_timeout,
+        "request_timeout": args.request_timeout,
+    }
@@ -0,0 +1,133 @@
+# streaming.py
+"""
+เครื่องมือสำหรับ token streaming ที่ใช้ร่วมกันทั้ง react_agent และ langgraph_version
+
+- StreamTimings: จับเวลา time-to-first-token (TTFT) และเวลาสร้างคำตอบของแต่ละคำถาม
+  แยก latency ที่ผู้ใช้รู้สึก (รอ token แรก) ออกจาก latency ทั้งหมด
+- iter_callback: แปลงฟังก์ชันที่ส่ง token ผ่าน callback ให้เป็น generator
+  ปิด generator ก่อนจบ (เช่น client ตัดการเชื่อมต่อ) แล้ว callback จะ raise StreamCancelled
+  เพื่อหยุดงานที่เหลือ และ close() รอจน thread ที่สร้างข้อความหยุดจริง
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+import queue
+import threading
+import time
+
+# callback ที่รับข้อความทีละส่วน
+TokenCallback = Callable[[str], None]
+
+
+class StreamCancelled(Exception):
+    """ผู้อ่าน stream ปิด generator ไปแล้ว ไม่ต้องสร้างข้อความต่อ"""
+
+
+@dataclass
+class StreamTimings:
+    """
+    เวลาของคำถามหนึ่งครั้ง (ค่าจาก time.perf_counter)
+    - started: เวลาที่เริ่มรับคำถาม
+    - generation_started: เวลาที่เริ่มเรียก LLM เพื่อสร้างคำตอบสุดท้าย
+    - first_token: เวลาที่ได้ข้อความส่วนแรกของคำตอบ
+    - finished: เวลาที่ได้คำตอบครบ
+    """
+    started: float = field(default_factory=time.perf_counter)
+    generation_started: Optional[float] = None
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    chunks: int = 0
+
+    def start_generation(self) -> None:
+        """บันทึกเวลาเริ่มสร้างคำตอบ (ไม่เปลี่ยนถ้าได้ token แรกไปแล้ว)"""
+        if self.first_token is None:
+            self.generation_started = time.perf_counter()
+
+    def token(self) -> None:
+        """บันทึกว่าได้รับข้อความหนึ่งส่วน"""
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self) -> None:
+        """บันทึกเวลาที่คำตอบเสร็จ (กรณีไม่ได้ stream ถือว่า token แรกมาพร้อมคำตอบทั้งหมด)"""
+        self.finished = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = self.finished
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """วินาทีจากรับคำถามถึง token แรกของคำตอบ"""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def generation_seconds(self) -> Optional[float]:
+        """วินาทีที่ใช้สร้างคำตอบสุดท้าย (ตั้งแต่เรียก LLM จนได้คำตอบครบ)"""
+        if self.finished is None or self.generation_started is None:
+            return None
+        return self.finished - self.generation_started
+
+    @property
+    def total_seconds(self) -> Optional[float]:
+        """วินาทีจากรับคำถามถึงได้คำตอบครบ"""
+        return None if self.finished is None else self.finished - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 4)
+
+        return {
+            "ttft_s": rounded(self.ttft),
+            "generation_s": rounded(self.generation_seconds),
+            "total_s": rounded(self.total_seconds),
+            "chunks": self.chunks,
+        }
+
+    def report(self) -> str:
+        def fmt(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value:.2f}s"
+
+        return (
+            f"first token {fmt(self.ttft)}, generation {fmt(self.generation_seconds)}, "
+            f"total {fmt(self.total_seconds)} ({self.chunks} chunks)"
+        )
+
+
+def iter_callback(fn: Callable[[TokenCallback], Any]) -> Iterator[str]:
+    """
+    รัน fn(callback) ใน thread แยกแล้ว yield ข้อความที่ส่งเข้า callback ทันทีที่ได้รับ
+    exception จาก fn จะถูกส่งต่อหลังจาก yield ข้อความครบแล้ว
+    ถ้าผู้อ่านปิด generator ก่อนจบ callback จะ raise StreamCancelled ในครั้งถัดไป
+    และ close() จะรอจน fn จบ (งานที่เริ่มไปแล้ว เช่น tool หรือ LLM ที่กำลังรอ ต้องเสร็จก่อน)
+    """
+    items: "queue.Queue" = queue.Queue()
+    done = object()
+    errors = []
+    cancelled = threading.Event()
+
+    def emit(text: str) -> None:
+        if cancelled.is_set():
+            raise StreamCancelled("stream closed by the reader")
+        items.put(text)
+
+    def worker():
+        try:
+            fn(emit)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            items.put(done)
+
+    thread = threading.Thread(target=worker, name="token-stream", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        # ปิดก่อนจบ: หยุด fn ที่ token ถัดไปและรอให้หยุดจริง ไม่ทิ้ง thread ไว้รันต่อ
+        cancelled.set()
+        thread.join()
+    if errors:
+        raise errors[0]
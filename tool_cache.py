@@ -0,0 +1,209 @@
+# tool_cache.py
+"""
+Cache ผลลัพธ์ของ tool ที่ใช้ร่วมกันทั้ง agent_actions (react_agent) และ langgraph_version.tools
+
+- key คือชื่อ tool + arguments ที่ normalize แล้ว (ตัวพิมพ์เล็ก, ช่องว่างเดียว)
+- TTL กำหนดแยกตาม tool และจำกัดจำนวนรายการด้วย LRU
+- single-flight: ถ้ามีการเรียก key เดียวกันพร้อมกันหลาย thread จะเรียก tool จริงเพียงครั้งเดียว
+  และทุก thread ได้ผลลัพธ์เดียวกัน
+- ClientPool: เก็บ client (เช่น DDGS) ไว้ใช้ซ้ำต่อ thread แทนการสร้างใหม่ทุกครั้ง
+- run_in_tool_executor: รัน tool ที่ blocking จาก coroutine บน thread pool ของ tool
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import contextvars
+import functools
+import json
+import threading
+import time
+
+from rag import add_kb_listener
+from tracing import current_span
+
+
+def _normalize(value: Any) -> Any:
+    # string: ตัดช่องว่างหัวท้าย, ตัวพิมพ์เล็ก และรวมช่องว่างซ้ำ
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+class _InFlight:
+    """ผลลัพธ์ของการเรียกที่กำลังทำงานอยู่ (ใช้ให้ thread อื่นรอผลเดียวกัน)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolResultCache:
+    """
+    Cache ผลลัพธ์ของ tool พร้อม TTL ต่อ tool และ single-flight
+    - ttls: TTL (วินาที) แยกตามชื่อ tool
+    - default_ttl: TTL ของ tool ที่ไม่ได้ระบุใน ttls
+    - max_entries: จำนวนรายการสูงสุด (เกินแล้วลบรายการที่ใช้ล่าสุดนานที่สุด)
+    ผลลัพธ์ที่คืนจาก cache เป็น object เดียวกันทุกครั้ง ผู้เรียกไม่ควรแก้ไข
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, default_ttl: float = 300, max_entries: int = 2048):
+        self.ttls = {_normalize(name): ttl for name, ttl in (ttls or {}).items()}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(tool_name: str, *args, **kwargs) -> str:
+        """สร้าง key จากชื่อ tool และ arguments ที่ normalize แล้ว"""
+        return json.dumps(
+            [_normalize(tool_name), [_normalize(a) for a in args],
+             {k: _normalize(v) for k, v in sorted(kwargs.items())}],
+            ensure_ascii=False, default=str,
+        )
+
+    def get_or_call(self, tool_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        คืนผลลัพธ์จาก cache หรือเรียก fn(*args, **kwargs) แล้วเก็บผลลัพธ์
+        exception จาก fn จะไม่ถูก cache และถูกส่งต่อให้ทุก thread ที่รอ key เดียวกัน
+        """
+        key = self.make_key(tool_name, *args, **kwargs)
+        ttl = self.ttls.get(_normalize(tool_name), self.default_ttl)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    current_span().set(cache_hit=True)
+                    return entry[1]
+                del self._entries[key]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[key] = call
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        current_span().set(cache_hit=False, coalesced=not leader)
+
+        if not leader:
+            # รอผลจาก thread ที่เรียก tool จริงอยู่
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + ttl, call.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return call.result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def clear(self) -> None:
+        """ลบทุกรายการใน cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, *tool_names: str) -> int:
+        """ลบรายการของ tool ที่ระบุ (เช่นเมื่อข้อมูลต้นทางเปลี่ยน) คืนค่าจำนวนรายการที่ลบ"""
+        names = {_normalize(name) for name in tool_names}
+        with self._lock:
+            stale = [key for key in self._entries if json.loads(key)[0] in names]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        """ตัวนับ hit/miss/coalesced ของ cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+            }
+
+
+class ClientPool:
+    """
+    เก็บ client ไว้ใช้ซ้ำ (หนึ่งตัวต่อ thread เพราะ client ส่วนใหญ่ไม่ thread-safe)
+    - factory: ฟังก์ชันสร้าง client ใหม่
+    เรียก reset() เมื่อ client เกิดข้อผิดพลาด เพื่อให้สร้างใหม่ในครั้งถัดไป
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self._local = threading.local()
+
+    def get(self) -> Any:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self.factory()
+            self._local.client = client
+        return client
+
+    def reset(self) -> None:
+        client = getattr(self._local, "client", None)
+        self._local.client = None
+        close = getattr(client, "__exit__", None)
+        if close is not None:
+            try:
+                close(None, None, None)
+            except Exception:
+                pass
+
+
+# cache กลางที่ใช้ร่วมกันทั้ง 2 implementation
+# ผลการค้นหาเว็บเปลี่ยนบ่อยกว่า knowledge base จึงใช้ TTL สั้นกว่า
+tool_cache = ToolResultCache(ttls={"web_search": 300, "search_context": 3600, "search_context_scored": 3600, "search_passages": 3600})
+
+# tool ที่ค้นหาใน knowledge base: ผลลัพธ์ถูกล้างทันทีที่ knowledge base ถูก index ใหม่ (ไม่ต้องรอ TTL)
+KB_TOOLS = ("search_context", "search_context_scored", "search_passages")
+add_kb_listener(lambda path, snapshot: tool_cache.invalidate(*KB_TOOLS))
+
+
+# thread pool สำหรับ tool ที่ถูกเรียกจาก async code
+# แยกจาก default executor ของ asyncio (ขนาดเล็ก) เพื่อรองรับ run พร้อมกันจำนวนมาก
+TOOL_EXECUTOR_WORKERS = 64
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """คืนค่า thread pool กลางสำหรับรัน tool (สร้างเมื่อใช้ครั้งแรก)"""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool")
+    return _tool_executor
+
+
+async def run_in_tool_executor(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """เรียก fn(*args, **kwargs) บน tool executor โดยไม่ block event loop (ส่งต่อ context เช่น span ปัจจุบัน)"""
+    # import ที่นี่: ถ้ามี coroutine ทำงานอยู่ asyncio ถูก import แล้ว (import ที่ระดับ module ช้า)
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_tool_executor(), call)
@@ -0,0 +1,336 @@
+# tracing.py
+"""
+Tracing แบบมีโครงสร้างสำหรับทั้ง react_agent และ langgraph_version
+
+- span ซ้อนกันเป็นลำดับชั้น run -> step -> reason/act -> llm/tool
+  โดยเก็บ span ปัจจุบันใน contextvar (ส่งต่อข้าม thread/task ได้ด้วย contextvars.copy_context)
+- เวลาเป็น monotonic (time.perf_counter_ns) พร้อม attribute เช่นขนาด prompt/response,
+  จำนวน token และ cache hit
+- ส่งออกเป็น JSONL (หนึ่งบรรทัดต่อ span) หรือ Chrome trace (เปิดใน chrome://tracing หรือ Perfetto)
+- ถ้าไม่มี trace ที่ทำงานอยู่ span() จะไม่บันทึกอะไร (overhead ต่ำ)
+
+Command line:
+    python tracing.py summary traces.jsonl [more.jsonl ...]   # latency percentiles ต่อ stage
+    python tracing.py chrome traces.jsonl -o trace.json       # แปลงเป็น Chrome trace
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+
+@dataclass
+class Span:
+    """ช่วงเวลาหนึ่งของการทำงาน (เวลาเป็น nanoseconds จาก perf_counter_ns)"""
+    name: str
+    kind: str
+    trace_id: str
+    span_id: int
+    parent_id: Optional[int] = None
+    start_ns: int = 0
+    end_ns: Optional[int] = None
+    thread: int = 0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attrs) -> None:
+        """เพิ่ม attribute ให้ span"""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """span ที่ใช้เมื่อไม่มี trace ทำงานอยู่ (ไม่บันทึกอะไร)"""
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    span ทั้งหมดของการรันหนึ่งครั้ง
+    - trace_id: id ของ trace (สร้างให้อัตโนมัติ)
+    """
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new_span(self, name: str, kind: str, parent_id: Optional[int], attrs: Dict[str, Any]) -> Span:
+        s = Span(
+            name=name,
+            kind=kind,
+            trace_id=self.trace_id,
+            span_id=next(self._ids),
+            parent_id=parent_id,
+            start_ns=time.perf_counter_ns(),
+            thread=threading.get_ident(),
+            attrs=attrs,
+        )
+        # span ถูกสร้างจากหลาย thread พร้อมกันได้ (tool ที่รันแบบขนาน)
+        with self._lock:
+            self.spans.append(s)
+        return s
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s.to_dict() for s in self.spans]
+
+    def write_jsonl(self, path: str) -> None:
+        """เขียน span ทั้งหมดต่อท้ายไฟล์ JSONL (หลาย trace ใช้ไฟล์เดียวกันได้)"""
+        write_jsonl(path, self.to_dicts())
+
+    def write_chrome(self, path: str) -> None:
+        """เขียน trace เป็นไฟล์ Chrome trace"""
+        write_chrome(path, self.to_dicts())
+
+
+# trace และ span ที่ทำงานอยู่ใน context ปัจจุบัน
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_write_lock = threading.Lock()
+
+
+def current_span():
+    """คืนค่า span ปัจจุบัน (หรือ span เปล่าถ้าไม่มี trace) เพื่อเพิ่ม attribute"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    """คืนค่า id ของ trace ที่กำลังทำงาน (None ถ้าไม่มี) เช่นเพื่อผูก log record กับ trace"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def _reset(var: ContextVar, token) -> None:
+    # generator ที่ถูกปิดจาก context อื่น (เช่นตอน garbage collect) จะ reset ไม่ได้
+    try:
+        var.reset(token)
+    except ValueError:
+        pass
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs) -> Iterator[Any]:
+    """
+    บันทึก span ซ้อนใต้ span ปัจจุบัน
+    - name: ชื่อ span (เช่นชื่อ tool)
+    - kind: ประเภทของ stage ("run", "step", "reason", "act", "llm", "tool", ...)
+    exception ที่เกิดขึ้นจะถูกบันทึกเป็น attribute "error" แล้วส่งต่อ
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    s = trace.new_span(name, kind, parent.span_id if parent else None, attrs)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.perf_counter_ns()
+        _reset(_current_span, token)
+
+
+@contextmanager
+def start_trace(name: str, path: Optional[str] = None, **attrs) -> Iterator[Trace]:
+    """
+    เริ่ม trace ใหม่พร้อม root span ประเภท "run"
+    - name: ชื่อของ root span
+    - path: ไฟล์ JSONL ที่จะเขียน span ต่อท้ายเมื่อ trace จบ (None = เก็บในหน่วยความจำเท่านั้น)
+    """
+    trace = Trace()
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, "run", **attrs):
+            yield trace
+    finally:
+        _reset(_current_span, span_token)
+        _reset(_current_trace, trace_token)
+        if path:
+            trace.write_jsonl(path)
+
+
+# -------------------------
+# การบันทึก attribute ของ LLM call
+# -------------------------
+def record_llm_usage(s, response: Any) -> None:
+    """
+    บันทึกจำนวน token จาก response ของ LLM (ถ้ามี)
+    รองรับทั้ง Gemini SDK (usage_metadata.prompt_token_count)
+    และ LangChain message (usage_metadata["input_tokens"])
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    if isinstance(usage, dict):
+        s.set(prompt_tokens=usage.get("input_tokens"), response_tokens=usage.get("output_tokens"))
+    else:
+        s.set(
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            response_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+
+# -------------------------
+# Export
+# -------------------------
+def write_jsonl(path: str, spans: Iterable[Dict[str, Any]]) -> None:
+    """เขียน span ต่อท้ายไฟล์ JSONL (thread-safe ภายใน process)"""
+    lines = "".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in spans)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _write_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def read_jsonl(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """อ่าน span จากไฟล์ JSONL หลายไฟล์ (ข้ามบรรทัดที่เสีย)"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def write_chrome(path: str, spans: Iterable[Dict[str, Any]]) -> None:
+    """
+    เขียน span เป็นไฟล์ Chrome trace (event แบบ "X")
+    แต่ละ trace แสดงเป็น process แยก และแต่ละ thread เป็นแถวแยก
+    """
+    pids: Dict[str, int] = {}
+    events = []
+    for s in spans:
+        if s.get("end_ns") is None:
+            continue
+        pid = pids.setdefault(s["trace_id"], len(pids) + 1)
+        events.append({
+            "name": s["name"],
+            "cat": s["kind"],
+            "ph": "X",
+            "ts": s["start_ns"] / 1000,
+            "dur": (s["end_ns"] - s["start_ns"]) / 1000,
+            "pid": pid,
+            "tid": s["thread"],
+            "args": s.get("attrs") or {},
+        })
+    for trace_id, pid in pids.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"trace {trace_id[:8]}"}})
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+# -------------------------
+# Summary
+# -------------------------
+def _percentile(ordered: List[float], p: float) -> float:
+    # nearest-rank percentile ของ list ที่เรียงแล้ว
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(spans: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    รวม span ตาม stage (kind + name) และคำนวณ latency percentiles
+    คืนค่าเป็น list ของ dict เรียงตามเวลารวมจากมากไปน้อย
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        if s.get("duration_ms") is not None:
+            groups.setdefault((s["kind"], s["name"]), []).append(s)
+
+    rows = []
+    for (kind, name), items in groups.items():
+        durations = sorted(s["duration_ms"] for s in items)
+        cache_hits = sum(1 for s in items if (s.get("attrs") or {}).get("cache_hit"))
+        errors = sum(1 for s in items if (s.get("attrs") or {}).get("error"))
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "count": len(durations),
+            "total_ms": sum(durations),
+            "mean_ms": sum(durations) / len(durations),
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "p99_ms": _percentile(durations, 99),
+            "max_ms": durations[-1],
+            "cache_hits": cache_hits,
+            "errors": errors,
+        })
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def format_summary(rows: List[Dict[str, Any]]) -> str:
+    """แปลงผลจาก summarize เป็นตาราง"""
+    header = f"{'kind':<8} {'name':<28} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'cache':>6} {'err':>4}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['kind']:<8} {r['name'][:28]:<28} {r['count']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+            f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['cache_hits']:>6} {r['errors']:>4}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or convert agent traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="per-stage latency percentiles across traces")
+    summary_parser.add_argument("traces", nargs="+", help="JSONL trace files")
+    summary_parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+
+    chrome_parser = subparsers.add_parser("chrome", help="convert JSONL traces to a Chrome trace file")
+    chrome_parser.add_argument("traces", nargs="+", help="JSONL trace files")
+    chrome_parser.add_argument("-o", "--output", required=True, help="output .json file")
+
+    args = parser.parse_args()
+    if args.command == "summary":
+        rows = summarize(read_jsonl(args.traces))
+        print(json.dumps(rows, indent=2) if args.json else format_summary(rows))
+    else:
+        write_chrome(args.output, read_jsonl(args.traces))
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()